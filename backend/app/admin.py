@@ -0,0 +1,74 @@
+import dataclasses
+import hmac
+from typing import Annotated
+
+from fastapi import APIRouter
+from fastapi.params import Header
+
+import config
+from game.game import GameSystem, StateFlushStats
+from game.system import Latency, PipeStats, SystemInfo, registry
+from lstypes.admin import (
+    LatencyOut,
+    PipeStatsOut,
+    QueueStatsOut,
+    StateFlushStatsOut,
+    SystemInfoOut,
+    SystemsOut,
+)
+from lstypes.error import ServiceCode, raise_service_error
+
+router = APIRouter()
+
+
+def _check_admin(token: str | None):
+    # Without a configured token the admin endpoints do not exist at all.
+    if not config.ADMIN_TOKEN:
+        raise_service_error(404, ServiceCode.NOT_FOUND, "Not found")
+    if token is None or not hmac.compare_digest(token, config.ADMIN_TOKEN):
+        raise_service_error(401, ServiceCode.UNAUTHORIZED, "Not authenticated")
+
+
+def _latency_out(latency: Latency) -> LatencyOut:
+    return LatencyOut(**dataclasses.asdict(latency))
+
+
+def _system_out(info: SystemInfo) -> SystemInfoOut:
+    return SystemInfoOut(
+        **{
+            **dataclasses.asdict(info),
+            "queue": QueueStatsOut(**dataclasses.asdict(info.queue)),
+        }
+    )
+
+
+def _pipe_out(stats: PipeStats) -> PipeStatsOut:
+    return PipeStatsOut(
+        **{
+            **dataclasses.asdict(stats),
+            "queue_delay": _latency_out(stats.queue_delay),
+            "handling": _latency_out(stats.handling),
+        }
+    )
+
+
+def _state_flushes_out(stats: StateFlushStats) -> StateFlushStatsOut:
+    return StateFlushStatsOut(
+        **{**dataclasses.asdict(stats), "latency": _latency_out(stats.latency)}
+    )
+
+
+@router.get("/api/v0/admin/systems")
+async def get_systems(
+    x_admin_token: Annotated[str | None, Header()] = None,
+) -> SystemsOut:
+    _check_admin(x_admin_token)
+    return SystemsOut(
+        counts=registry.counts(),
+        systems=[_system_out(info) for info in registry.snapshot()],
+        pipes=[_pipe_out(stats) for stats in registry.pipe_stats()],
+        state_flushes=[
+            _state_flushes_out(game.state_flush_stats())
+            for game in registry.systems(GameSystem)
+        ],
+    )
@@ -15,6 +15,7 @@ from structlog import BoundLogger
 import config
 import game.user
 from app.ws import WebSocketController
+from game.llm_log import llm_log_writer
 from game.logger import gl_log
 from lstypes.error import ServiceCode, ServiceError, raise_service_error
 from lstypes.user import FullUserOut
@@ -152,6 +153,9 @@ async def livespan(_app: FastAPI):
         dsn=config.POSTGRES_URL, init=init_connection
     ) as pg_pool:
         universe = Universe(pg_pool)
+        universe.start_archiver()
+        universe.start_hibernator()
+        llm_log_writer.start(pg_pool)
         ws_controller = WebSocketController(pg_pool)
 
         limiter = TokenBucketLimiter(
@@ -176,6 +180,7 @@ async def livespan(_app: FastAPI):
 
             await limiter.stop_gc()
             await universe.stop()
+            await llm_log_writer.stop()
             state = None
 
 
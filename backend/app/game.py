@@ -1,12 +1,15 @@
 import typing
 from typing import Literal, Annotated
 
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Header, Response
 from pydantic import BaseModel, Field
 from fastapi.websockets import WebSocket
 
+import config
+
 from app.dependencies import Conn, AuthDep, U, W, UserDep, Log, lazy_ws_auth
-from game.chat import ChatSystem
+from game.chat import ChatSystem, search_messages
+from game.llm_log import get_llm_logs
 from lstypes.error import (
     ServiceCode,
     raise_for_service_error,
@@ -16,9 +19,9 @@ from lstypes.error import (
 )
 from lstypes.player import PlayerOut
 from game.game import GameSystem
-from lstypes.chat import ChatSegmentOut
-from lstypes.game import GameOut, GameStatus, StateOut
-from lstypes.message import MessageKind, MessageOut
+from lstypes.chat import ChatDeltaOut, ChatSegmentOut
+from lstypes.game import GameOut, GameStatus, LLMLogPageOut, StateOut
+from lstypes.message import MessageKind, MessageOut, MessageSearchOut
 
 router = APIRouter()
 
@@ -231,15 +234,7 @@ async def _get_or_load_game_system(
     conn: Conn,
     game: GameOut,
 ) -> GameSystem:
-    game_system = GameSystem.of(game.id)
-    if game_system is not None:
-        return game_system
-
-    game_system = await GameSystem.create_new(
-        conn, game, db_pool=getattr(universe, "pg_pool", None)
-    )
-    universe.add_game(game_system)
-    return game_system
+    return await universe.load_game_system(conn, game)
 
 
 def _require_joined_player(game_system: GameSystem, user_id: int):
@@ -264,6 +259,14 @@ async def _get_chat_info(conn: Conn, game_id: int, chat_id: int):
     )
 
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
 @router.get("/api/v0/game/{game_id}/state")
 async def get_game_state(
     game_id: int,
@@ -286,10 +289,20 @@ async def get_game_chat_segment(
     user: AuthDep,
     universe: U,
     log: Log,
+    response: Response,
     before: int | None = None,
     after: int | None = None,
-    limit: Annotated[int, Query(ge=1, le=500)] = 50,
-) -> ChatSegmentOut:
+    since: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=config.CHAT_PAGE_MAX_MESSAGES)] = 50,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> ChatSegmentOut | ChatDeltaOut:
+    if since is not None and (before is not None or after is not None):
+        raise_service_error(
+            400,
+            ServiceCode.MUTUALLY_EXCLUSIVE_OPTIONS,
+            "since cannot be combined with before or after",
+        )
+
     game = unwrap(await universe.get_game(conn, game_id, requester_id=user.id, log=log))
     game_system = await _get_or_load_game_system(universe, conn, game)
     _require_joined_player(game_system, user.id)
@@ -307,6 +320,15 @@ async def get_game_chat_segment(
         raise_service_error(401, ServiceCode.CANNOT_ACCESS_CHAT, "Cannot access chat")
 
     chat_system = unwrap(await ChatSystem.load_by_id(conn, chat_id, log=log))
+    # Different pages of the same chat version are different responses.
+    query = "-".join("" if v is None else str(v) for v in (before, after, since))
+    etag = f'"{chat_system.id}-{chat_system.version}-{query}-{limit}"'
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    if since is not None:
+        return unwrap(await chat_system.get_changes(conn, since, limit, log=log))
     return unwrap(
         await chat_system.get_messages(
             conn,
@@ -318,6 +340,64 @@ async def get_game_chat_segment(
     )
 
 
+@router.get("/api/v0/game/{game_id}/search")
+async def search_game_messages(
+    game_id: int,
+    conn: Conn,
+    user: AuthDep,
+    universe: U,
+    log: Log,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    chat_id: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: Annotated[str | None, Query(pattern=r"^[0-9.e+-]+:[0-9]+$")] = None,
+) -> MessageSearchOut:
+    game = unwrap(await universe.get_game(conn, game_id, requester_id=user.id, log=log))
+    game_system = await _get_or_load_game_system(universe, conn, game)
+    _require_joined_player(game_system, user.id)
+
+    is_host = user.id == game_system.host_id
+    if chat_id is not None:
+        chat_info = await _get_chat_info(conn, game_id, chat_id)
+        if chat_info is None:
+            raise_service_error(404, ServiceCode.CHAT_NOT_FOUND, "Chat not found")
+        if (
+            chat_info["owner_id"] is not None
+            and chat_info["owner_id"] != user.id
+            and not is_host
+        ):
+            raise_service_error(
+                401, ServiceCode.CANNOT_ACCESS_CHAT, "Cannot access chat"
+            )
+
+    return await search_messages(
+        conn,
+        game_id,
+        q,
+        limit,
+        chat_id=chat_id,
+        reader_id=None if is_host else user.id,
+        cursor=cursor,
+    )
+
+
+@router.get("/api/v0/game/{game_id}/llm-logs")
+async def get_game_llm_logs(
+    game_id: int,
+    conn: Conn,
+    user: AuthDep,
+    universe: U,
+    log: Log,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    before: int | None = None,
+) -> LLMLogPageOut:
+    game = unwrap(await universe.get_game(conn, game_id, requester_id=user.id, log=log))
+    game_system = await _get_or_load_game_system(universe, conn, game)
+    _require_joined_player(game_system, user.id)
+    _require_host(game_system, user.id)
+    return await get_llm_logs(conn, game_id, limit, before=before)
+
+
 @router.post("/api/v0/game/{game_id}/chat/{chat_id}/send")
 async def send_game_chat_message(
     game_id: int,
@@ -542,6 +622,7 @@ async def websocket_endpoint(
     game_id: int,
     conn: Conn,
     user: UserDep,
+    universe: U,
     ws_controller: W,
     log: Log,
     lazy_auth: bool = False,
@@ -557,9 +638,10 @@ async def websocket_endpoint(
     else:
         await websocket.accept()
 
-    game = GameSystem.of(game_id)
-    if game is None:
+    game_out = await universe.get_game(conn, game_id, requester_id=user.id, log=log)
+    if isinstance(game_out, ServiceError):
         raise HTTPException(status_code=404, detail="Game not found")
+    game = await universe.load_game_system(conn, game_out)
 
     player_out = await game.get_player(conn, user.id, log=log)
     if not isinstance(player_out, ServiceError):
@@ -18,6 +18,7 @@ from app.auth import router as auth_router
 from app.user import router as user_router
 from app.game import router as game_router
 from app.world import router as world_router
+from app.admin import router as admin_router
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from starlette.requests import Request
@@ -36,6 +37,7 @@ app.include_router(auth_router)
 app.include_router(user_router)
 app.include_router(game_router)
 app.include_router(world_router)
+app.include_router(admin_router)
 
 def _route_key(request: Request) -> str:
     """
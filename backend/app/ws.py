@@ -9,7 +9,7 @@ from game.universe import (
     Universe,
     UniverseNewWorldEvent,
     UniverseWorldUpdateEvent,
-    UniverseGameEvent,
+    UniverseGameLoadedEvent,
 )
 from game.game import (
     GameSystem,
@@ -19,6 +19,7 @@ from game.game import (
     PlayerJoinedEvent,
     PlayerKickedEvent,
 )
+from game.system import Subscription, SystemLagged
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from lstypes.game import GameStatus
 from fastapi.encoders import jsonable_encoder
@@ -35,6 +36,7 @@ class WebSocketController:
         self.pg_pool = pg_pool
         self.user_to_ws: dict[int, dict[int, WebSocket]] = {}
         self.pending_disconnect: dict[tuple[int, int], asyncio.Task] = {}
+        self.game_listeners: dict[int, tuple[GameSystem, asyncio.Task]] = {}
         self.disconnect_timeout = DISCONNECT_TIMEOUT
         self.heartbeat_timeout = HEARTBEAT_TIMEOUT
         self.log = log
@@ -100,6 +102,7 @@ class WebSocketController:
 
         async with self._lock:
             self.user_to_ws.setdefault(game_id, {})[user_id] = websocket
+            self._ensure_game_listener(game_id)
 
         try:
             await self.ws_loop(game_id, user_id, websocket)
@@ -204,11 +207,113 @@ class WebSocketController:
         async with self._lock:
             self.user_to_ws.pop(game_id, None)
 
+    def _ensure_game_listener(self, game_id: int, replay: bool = False):
+        game = GameSystem.of(game_id)
+        if game is None:
+            return
+        listener = self.game_listeners.get(game_id)
+        if listener is not None and listener[0] is game and not listener[1].done():
+            return
+        # With `replay`, events emitted since the game was loaded are not lost.
+        events = game.subscribe(replay=replay)
+        task = asyncio.create_task(
+            self.listen_game(game, events), name=f"ws_listen_game{game_id}"
+        )
+        self.game_listeners[game_id] = (game, task)
+
+    async def listen_game(self, game: GameSystem, events: Subscription[GameEvent]):
+        """
+        Reads events of one game straight from its GameSystem, instead of
+        waiting for them to be forwarded through the Universe.
+        """
+        try:
+            async for ev in events:
+                if isinstance(ev, SystemLagged):
+                    await self.log.awarning(
+                        "WebSocket listener lagged", game_id=game.id, missed=ev.missed
+                    )
+                    await self.send_json_all(
+                        {
+                            "type": "Lagged",
+                            "payload": {"game_id": game.id, "missed": ev.missed},
+                        },
+                        game.id,
+                    )
+                    continue
+                await self.send_game_event(ev)
+        except Exception as e:
+            await self.log.aerror("Game listen task failed: %s", e, game_id=game.id)
+            raise
+        finally:
+            listener = self.game_listeners.get(game.id)
+            if listener is not None and listener[0] is game:
+                self.game_listeners.pop(game.id, None)
+
+    async def send_game_event(self, ev: GameEvent):
+        await self.log.ainfo("Received %s", ev)
+
+        match ev:
+            case PlayerJoinedEvent(game_id=gid, player=player_out):
+                await self.send_json_all(
+                    {
+                        "type": type(ev).__name__,
+                        "payload": jsonable_encoder(ev),
+                    },
+                    gid,
+                )
+
+            case PlayerLeftEvent(game_id=gid, player=player_out):
+                await self.disconnect(
+                    game_id=gid, user_id=player_out.user.id, purge=True
+                )
+                await self.send_json_all(
+                    {
+                        "type": type(ev).__name__,
+                        "payload": jsonable_encoder(ev),
+                    },
+                    gid,
+                )
+
+            case PlayerKickedEvent(game_id=gid, player=player_out):
+                await self.disconnect(
+                    game_id=gid, user_id=player_out.user.id, purge=True
+                )
+                await self.send_json_all(
+                    {
+                        "type": type(ev).__name__,
+                        "payload": jsonable_encoder(ev),
+                    },
+                    gid,
+                )
+
+            case GameStatusEvent(game_id=gid, new_status=new_s):
+                if new_s == GameStatus.ARCHIVED:
+                    await self.remove_game(gid)
+
+                await self.send_json_all(
+                    {
+                        "type": type(ev).__name__,
+                        "payload": {
+                            "game_id": gid,
+                            "new_status": new_s.value,
+                        },
+                    },
+                    gid,
+                )
+
+            case _:
+                gid = ev.game_id
+                await self.send_json_all(
+                    {
+                        "type": type(ev).__name__,
+                        "payload": jsonable_encoder(ev),
+                    },
+                    gid,
+                )
+
     async def listen(self, universe: Universe):
         try:
             async for event in universe.listen():
-                await self.log.ainfo("Received %s", event)
-
                 match event:
                     case UniverseNewWorldEvent(world=world):
                         ...
@@ -216,65 +321,18 @@ class WebSocketController:
                     case UniverseWorldUpdateEvent(world=world):
                         ...
 
-                    case UniverseGameEvent(event=ev):
-                        match ev:
-                            case PlayerJoinedEvent(game_id=gid, player=player_out):
-                                await self.send_json_all(
-                                    {
-                                        "type": type(ev).__name__,
-                                        "payload": jsonable_encoder(ev),
-                                    },
-                                    gid,
-                                )
-
-                            case PlayerLeftEvent(game_id=gid, player=player_out):
-                                await self.disconnect(
-                                    game_id=gid, user_id=player_out.user.id, purge=True
-                                )
-                                await self.send_json_all(
-                                    {
-                                        "type": type(ev).__name__,
-                                        "payload": jsonable_encoder(ev),
-                                    },
-                                    gid,
-                                )
-
-                            case PlayerKickedEvent(game_id=gid, player=player_out):
-                                await self.disconnect(
-                                    game_id=gid, user_id=player_out.user.id, purge=True
-                                )
-                                await self.send_json_all(
-                                    {
-                                        "type": type(ev).__name__,
-                                        "payload": jsonable_encoder(ev),
-                                    },
-                                    gid,
-                                )
-
-                            case GameStatusEvent(game_id=gid, new_status=new_s):
-                                if new_s == GameStatus.ARCHIVED:
-                                    await self.remove_game(gid)
-
-                                await self.send_json_all(
-                                    {
-                                        "type": type(ev).__name__,
-                                        "payload": {
-                                            "game_id": gid,
-                                            "new_status": new_s.value,
-                                        },
-                                    },
-                                    gid,
-                                )
-
-                            case _:
-                                gid = ev.game_id
-                                await self.send_json_all(
-                                    {
-                                        "type": type(ev).__name__,
-                                        "payload": jsonable_encoder(ev),
-                                    },
-                                    gid,
-                                )
+                    case UniverseGameLoadedEvent(game_id=gid):
+                        # A game that was hibernated and loaded again is a
+                        # new system, so its clients need a new listener.
+                        async with self._lock:
+                            if gid in self.user_to_ws:
+                                self._ensure_game_listener(gid, replay=True)
+
+                    case SystemLagged(missed=missed):
+                        await self.log.awarning(
+                            "WebSocket manager lagged behind the universe",
+                            missed=missed,
+                        )
 
                     case _:
                         await self.log.awarning(
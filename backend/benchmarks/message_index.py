@@ -0,0 +1,86 @@
+"""
+Compare chat message index implementations.
+
+    python -m benchmarks.message_index [sizes...]
+
+For every size the index is filled with that many messages, then a
+fraction of them is deleted and a series of chat segment reads (the
+access pattern of `ChatSystem.get_messages`) is timed.
+"""
+
+import datetime
+import random
+import sys
+import time
+import tracemalloc
+
+from game.chat import ArrayMessageIndex, LinkedMessageIndex, StoredMessage
+from lstypes.message import MessageKind
+
+SIZES = [10_000, 100_000, 1_000_000]
+READS = 10_000
+SEGMENT = 50
+
+
+def _messages(n: int) -> list[StoredMessage]:
+    now = datetime.datetime.now()
+    return [
+        StoredMessage(i, None, MessageKind.PUBLIC_INFO, "", None, now, None)
+        for i in range(n)
+    ]
+
+
+def _segment(index, before: int):
+    messages = list(index.walk_backward(before, SEGMENT))
+    messages.reverse()
+    if messages:
+        index.prev_id(messages[0].id)
+        index.next_id(messages[-1].id)
+
+
+def bench(index_class, messages: list[StoredMessage]) -> dict[str, float]:
+    rng = random.Random(0)
+    result = {}
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = index_class()
+    for msg in messages:
+        index.append(msg)
+    result["append_s"] = time.perf_counter() - start
+    # Only the index itself: messages are allocated before tracing starts.
+    result["index_mb"] = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+
+    victims = rng.sample(range(len(messages)), len(messages) // 10)
+    start = time.perf_counter()
+    for id_ in victims:
+        index.delete(id_)
+    result["delete_s"] = time.perf_counter() - start
+
+    cursors = [rng.randrange(len(messages)) for _ in range(READS)]
+    start = time.perf_counter()
+    for before in cursors:
+        _segment(index, before)
+    result["read_us"] = (time.perf_counter() - start) / READS * 1e6
+    return result
+
+
+def main(sizes: list[int]):
+    print(
+        f"{'size':>9} {'index':>7} {'append s':>9} {'delete s':>9} "
+        f"{'read us':>8} {'index MB':>9}"
+    )
+    indexes = [("linked", LinkedMessageIndex), ("array", ArrayMessageIndex)]
+    for size in sizes:
+        messages = _messages(size)
+        for name, cls in indexes:
+            r = bench(cls, messages)
+            print(
+                f"{size:>9} {name:>7} {r['append_s']:>9.3f} {r['delete_s']:>9.3f} "
+                f"{r['read_us']:>8.1f} {r['index_mb']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,83 @@
+"""
+Memory used by cached chat messages.
+
+    python -m benchmarks.message_memory [messages]
+
+Builds a chat of realistic messages (a few senders, a third of them
+carrying an `llm_message` in metadata) in two ways and reports the
+retained bytes per message:
+
+- `MessageOut` dataclasses in the linked-list index, the way chats were
+  cached before;
+- `StoredMessage` records in the array index, the way they are cached now.
+
+Every message is decoded from a fresh row inside the measured region, as
+it would be when loaded from Postgres.
+"""
+
+import datetime
+import json
+import sys
+import tracemalloc
+
+from game.chat import ArrayMessageIndex, LinkedMessageIndex, StoredMessage
+from lstypes.message import MessageKind, MessageOut
+
+SENDERS = [1001, 1002, 1003, 1004]
+SPECIALS = [None, None, "dm_summary", "narration"]
+KINDS = [MessageKind.PLAYER, MessageKind.PUBLIC_INFO, MessageKind.PRIVATE_INFO]
+
+
+def _row(i: int) -> dict:
+    text = f"Message {i}: " + "the party walks into the tavern. " * 8
+    metadata = None
+    if i % 3 == 0:
+        metadata = json.dumps(
+            {"llm_message": {"role": "assistant", "content": text}, "turn": i}
+        )
+    return {
+        "id": i,
+        "chat_id": 1,
+        # Decoded rows carry their own int and str objects.
+        "sender_id": int(str(SENDERS[i % len(SENDERS)])),
+        "kind": KINDS[i % len(KINDS)],
+        "text": text,
+        "special": "".join(SPECIALS[i % len(SPECIALS)] or "") or None,
+        "sent_at": datetime.datetime(2025, 1, 1) + datetime.timedelta(seconds=i),
+        "metadata": metadata,
+    }
+
+
+def _message_out(row: dict) -> MessageOut:
+    metadata = row["metadata"]
+    return MessageOut(
+        id=row["id"],
+        chat_id=row["chat_id"],
+        sender_id=row["sender_id"],
+        kind=row["kind"],
+        text=row["text"],
+        special=row["special"],
+        sent_at=row["sent_at"],
+        metadata=None if metadata is None else json.loads(metadata),
+    )
+
+
+def measure(index, make, n: int) -> float:
+    tracemalloc.start()
+    for i in range(n):
+        index.append(make(_row(i)))
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained / n
+
+
+def main(n: int):
+    before = measure(LinkedMessageIndex(), _message_out, n)
+    after = measure(ArrayMessageIndex(), StoredMessage.from_row, n)
+    print(f"messages:                 {n}")
+    print(f"MessageOut + linked list: {before:8.0f} bytes/message")
+    print(f"StoredMessage + array:    {after:8.0f} bytes/message")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -27,6 +27,7 @@ def load_secret(name: str, *, required: bool = True) -> str | None:
 
 PROXY_API_KEY: str | None = load_secret("PROXY_API_KEY", required=False)
 JWT_SECRET: str | None = load_secret("JWT_SECRET", required=False)
+ADMIN_TOKEN: str | None = load_secret("ADMIN_TOKEN", required=False)
 OAUTH2_GITHUB_CLIENT_ID: str | None = load_secret(
     "OAUTH2_GITHUB_CLIENT_ID", required=False
 )
@@ -44,7 +45,14 @@ else:
 DM_MODEL: str = os.environ.get("DM_MODEL", "gpt-4o-mini")
 PLAYER_MODEL: str = os.environ.get("PLAYER_MODEL", "gpt-4o-mini")
 CHARACTER_MODEL: str = os.environ.get("CHARACTER_MODEL", PLAYER_MODEL)
-LLM_LOG_LIMIT: int = int(os.environ.get("LLM_LOG_LIMIT", "200"))
+LLM_LOG_BATCH_SIZE: int = int(os.environ.get("LLM_LOG_BATCH_SIZE", "200"))
+LLM_LOG_BUFFER_LIMIT: int = int(os.environ.get("LLM_LOG_BUFFER_LIMIT", "10000"))
+LLM_LOG_FLUSH_SECONDS: float = float(os.environ.get("LLM_LOG_FLUSH_SECONDS", "1"))
+LLM_ACTION_CONCURRENCY: int = int(os.environ.get("LLM_ACTION_CONCURRENCY", "4"))
+LLM_ACTION_TIMEOUT_SECONDS: float = float(
+    os.environ.get("LLM_ACTION_TIMEOUT_SECONDS", "30")
+)
+LLM_NARRATIVE_CONCURRENCY: int = int(os.environ.get("LLM_NARRATIVE_CONCURRENCY", "8"))
 LOG_STACKTRACE: bool = os.environ.get("LOG_STACKTRACE", "false").lower() == "true"
 
 if "POSTGRES_URL" in os.environ or ENVIRONMENT == "dev":
@@ -60,6 +68,36 @@ else:
     )
 
 KICK_PLAYER_AFTER_SECONDS: float = 10.0
+EVENT_QUEUE_CAPACITY: int = int(os.environ.get("EVENT_QUEUE_CAPACITY", "1024"))
+MAX_LOADED_GAMES: int | None = int(os.environ.get("MAX_LOADED_GAMES", "0")) or None
+MAX_LOADED_CHATS: int | None = int(os.environ.get("MAX_LOADED_CHATS", "0")) or None
+CHAT_WINDOW_SIZE: int = int(os.environ.get("CHAT_WINDOW_SIZE", "100"))
+# Most messages one request can read from a chat
+CHAT_PAGE_MAX_MESSAGES: int = int(os.environ.get("CHAT_PAGE_MAX_MESSAGES", "500"))
+CHAT_MESSAGE_INDEX: typing.Literal["array", "linked"] = os.environ.get(
+    "CHAT_MESSAGE_INDEX", "array"
+)
+CHAT_CACHE_MAX_CHATS: int = int(os.environ.get("CHAT_CACHE_MAX_CHATS", "256"))
+CHAT_CACHE_MAX_MESSAGES: int = int(os.environ.get("CHAT_CACHE_MAX_MESSAGES", "50000"))
+CHAT_CHANGE_LOG_SIZE: int = int(os.environ.get("CHAT_CHANGE_LOG_SIZE", "1000"))
+GAME_ARCHIVE_INTERVAL_SECONDS: float = float(
+    os.environ.get("GAME_ARCHIVE_INTERVAL_SECONDS", "600")
+)
+GAME_STATE_FLUSH_INTERVAL_SECONDS: float = float(
+    os.environ.get("GAME_STATE_FLUSH_INTERVAL_SECONDS", "2")
+)
+GAME_STATE_FLUSH_MAX_BACKOFF_SECONDS: float = float(
+    os.environ.get("GAME_STATE_FLUSH_MAX_BACKOFF_SECONDS", "60")
+)
+GAME_IDLE_SECONDS: float = float(os.environ.get("GAME_IDLE_SECONDS", "1800"))
+GAME_HIBERNATE_INTERVAL_SECONDS: float = float(
+    os.environ.get("GAME_HIBERNATE_INTERVAL_SECONDS", "60")
+)
+GAME_ARCHIVE_BATCH_SIZE: int = int(os.environ.get("GAME_ARCHIVE_BATCH_SIZE", "20"))
+GAME_ARCHIVE_COOLDOWN_SECONDS: float = float(
+    os.environ.get("GAME_ARCHIVE_COOLDOWN_SECONDS", "3600")
+)
+EDIT_COALESCE_SECONDS: float = float(os.environ.get("EDIT_COALESCE_SECONDS", "0.25"))
 
 SELF_URL: str = os.environ.get("SELF_URL", "http://localhost:8000")
 FRONTEND_URL: str = os.environ.get("FRONTEND_URL", "http://localhost:8081")
@@ -0,0 +1,215 @@
+"""
+Cold storage for games that are over.
+
+The messages of a finished game's chats (with their LLM transcript
+entries), its chat suggestions, its LLM logs and its state are moved
+into a single zlib-compressed JSON document in `game_archives`. Chats themselves stay
+in place, so ids handed out to clients remain valid. Loading the game
+again (`GameSystem.create_new`) puts everything back first.
+"""
+
+import datetime
+import json
+import typing
+import zlib
+
+import asyncpg
+
+from game.logger import gl_log
+from lstypes.game import GameStatus
+
+ARCHIVABLE_STATUSES = (GameStatus.FINISHED, GameStatus.ARCHIVED)
+
+
+async def find_archivable_games(
+    conn: asyncpg.Connection, limit: int, exclude: list[int]
+) -> list[int]:
+    """Ids of finished games that are not archived yet, except `exclude`."""
+    rows = await conn.fetch(
+        """
+        SELECT g.id FROM games g
+        WHERE g.status IN ('finished', 'archived')
+          AND g.id <> ALL($1::int[])
+          AND NOT EXISTS (SELECT 1 FROM game_archives a WHERE a.game_id = g.id)
+        ORDER BY g.id
+        LIMIT $2
+        """,
+        exclude,
+        limit,
+    )
+    return [row["id"] for row in rows]
+
+
+async def archive_game(
+    conn: asyncpg.Connection,
+    game_id: int,
+    log=gl_log,
+    *,
+    is_loaded: typing.Callable[[int], bool] | None = None,
+) -> bool:
+    """
+    Move a finished game into the archive. Returns False if the game is
+    not finished, already archived, or loaded according to `is_loaded`.
+    That is checked once the games row is locked: a load that started
+    earlier is seen, and one that starts later waits in `rehydrate_game`.
+    """
+    async with conn.transaction():
+        status = await conn.fetchval(
+            "SELECT status FROM games WHERE id = $1 FOR UPDATE", game_id
+        )
+        if status not in ARCHIVABLE_STATUSES:
+            return False
+        if is_loaded is not None and is_loaded(game_id):
+            return False
+        if await conn.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM game_archives WHERE game_id = $1)", game_id
+        ):
+            return False
+
+        document = await conn.fetchval(
+            """
+            SELECT jsonb_build_object(
+                'state', g.state,
+                'messages', COALESCE((
+                    SELECT jsonb_agg(
+                        to_jsonb(m) - 'search'
+                            || jsonb_build_object('llm_message', l.payload)
+                        ORDER BY m.id
+                    )
+                    FROM messages m
+                    JOIN chats c ON c.id = m.chat_id
+                    LEFT JOIN llm_messages l ON l.message_id = m.id
+                    WHERE c.game_id = g.id
+                ), '[]'::jsonb),
+                'suggestions', COALESCE((
+                    SELECT jsonb_agg(
+                        jsonb_build_object('chat_id', s.chat_id, 'suggestion', s.suggestion)
+                        ORDER BY s.id
+                    )
+                    FROM chat_suggestions s
+                    JOIN chats c ON c.id = s.chat_id
+                    WHERE c.game_id = g.id
+                ), '[]'::jsonb),
+                'llm_logs', COALESCE((
+                    SELECT jsonb_agg(to_jsonb(l) - 'game_id' ORDER BY l.id)
+                    FROM llm_logs l
+                    WHERE l.game_id = g.id
+                ), '[]'::jsonb)
+            )::text
+            FROM games g WHERE g.id = $1
+            """,
+            game_id,
+        )
+        data = zlib.compress(document.encode())
+        await conn.execute(
+            "INSERT INTO game_archives (game_id, data, archived_at) VALUES ($1, $2, $3)",
+            game_id,
+            data,
+            datetime.datetime.now(),
+        )
+        # llm_messages go with their messages.
+        deleted = await conn.execute(
+            """
+            DELETE FROM messages
+            WHERE chat_id IN (SELECT id FROM chats WHERE game_id = $1)
+            """,
+            game_id,
+        )
+        await conn.execute(
+            """
+            DELETE FROM chat_suggestions
+            WHERE chat_id IN (SELECT id FROM chats WHERE game_id = $1)
+            """,
+            game_id,
+        )
+        await conn.execute("DELETE FROM llm_logs WHERE game_id = $1", game_id)
+        await conn.execute(
+            "UPDATE games SET state = '{}'::jsonb WHERE id = $1", game_id
+        )
+
+    await log.ainfo(
+        "Archived game",
+        game_id=game_id,
+        messages=int(deleted.split()[-1]),
+        raw_bytes=len(document),
+        archived_bytes=len(data),
+    )
+    return True
+
+
+async def rehydrate_game(conn: asyncpg.Connection, game_id: int, log=gl_log) -> bool:
+    """
+    Put an archived game back into the hot tables. Returns False if the
+    game is not archived.
+    """
+    async with conn.transaction():
+        # Wait for an archive of this game that is still in progress.
+        await conn.execute("SELECT FROM games WHERE id = $1 FOR UPDATE", game_id)
+        data = await conn.fetchval(
+            "DELETE FROM game_archives WHERE game_id = $1 RETURNING data", game_id
+        )
+        if data is None:
+            return False
+        archive = json.loads(zlib.decompress(data))
+
+        await conn.execute(
+            """
+            INSERT INTO messages (id, chat_id, sender_id, kind, text, special, metadata, sent_at)
+            SELECT m.id, m.chat_id, u.id, m.kind, m.text, m.special, m.metadata, m.sent_at
+            FROM jsonb_to_recordset($1::jsonb) AS m(
+                id INTEGER, chat_id INTEGER, sender_id INTEGER, kind message_kind,
+                text TEXT, special TEXT, metadata JSONB, sent_at TIMESTAMPTZ
+            )
+            -- Senders may have been removed while the game was archived.
+            LEFT JOIN users u ON u.id = m.sender_id
+            """,
+            archive["messages"],
+        )
+        await conn.execute(
+            """
+            INSERT INTO llm_messages (message_id, payload)
+            SELECT m.id, m.llm_message
+            FROM jsonb_to_recordset($1::jsonb) AS m(id INTEGER, llm_message JSONB)
+            WHERE m.llm_message IS NOT NULL AND m.llm_message <> 'null'::jsonb
+            """,
+            archive["messages"],
+        )
+        await conn.execute(
+            """
+            INSERT INTO chat_suggestions (chat_id, suggestion)
+            SELECT s.chat_id, s.suggestion
+            FROM ROWS FROM (
+                jsonb_to_recordset($1::jsonb) AS (chat_id INTEGER, suggestion TEXT)
+            ) WITH ORDINALITY AS s(chat_id, suggestion, n)
+            ORDER BY s.n
+            """,
+            archive["suggestions"],
+        )
+        # Ids are kept, so pages of the log stay where they were.
+        await conn.execute(
+            """
+            INSERT INTO llm_logs (
+                id, game_id, player_id, turn, scope, model,
+                prompt, response, error, created_at
+            )
+            SELECT l.id, $2, l.player_id, l.turn, l.scope, l.model,
+                   l.prompt, NULLIF(l.response, 'null'::jsonb), l.error, l.created_at
+            FROM jsonb_to_recordset($1::jsonb) AS l(
+                id BIGINT, player_id INTEGER, turn INTEGER, scope TEXT, model TEXT,
+                prompt JSONB, response JSONB, error TEXT, created_at TIMESTAMPTZ
+            )
+            """,
+            # Archives written before LLM logs were archived have none.
+            archive.get("llm_logs", []),
+            game_id,
+        )
+        await conn.execute(
+            "UPDATE games SET state = $2 WHERE id = $1", game_id, archive["state"]
+        )
+
+    await log.ainfo(
+        "Rehydrated archived game",
+        game_id=game_id,
+        messages=len(archive["messages"]),
+    )
+    return True
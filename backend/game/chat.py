@@ -1,14 +1,33 @@
+import bisect
+import collections
 import dataclasses
 import datetime
+import itertools
+import json
+import sys
+import time
 import typing
 
 import asyncpg
 
+import config
 from game.logger import gl_log
 from lstypes.error import ServiceCode, ServiceError, error
-from lstypes.message import MessageOut, MessageKind, MessageOutWithNeighbors
-from game.system import System
-from lstypes.chat import ChatType, ChatInterfaceType, ChatInterface, ChatSegmentOut
+from lstypes.message import (
+    MessageKind,
+    MessageOut,
+    MessageOutWithNeighbors,
+    MessageSearchHit,
+    MessageSearchOut,
+)
+from game.system import System, Backpressure
+from lstypes.chat import (
+    ChatDeltaOut,
+    ChatInterface,
+    ChatInterfaceType,
+    ChatSegmentOut,
+    ChatType,
+)
 
 
 @dataclasses.dataclass
@@ -36,27 +55,150 @@ class ChatUpdatedSuggestions(ChatEvent):
     suggestions: list[str]
 
 
+def chat_event_key(event: ChatEvent) -> typing.Hashable | None:
+    """
+    Events that only carry the latest value of something can replace
+    each other while they wait in a queue: only the newest text of an
+    edited message and the newest suggestion list matter.
+    """
+    match event:
+        case ChatMessageEditEvent(chat_id=chat_id, message=message):
+            return "edit", chat_id, message.id
+        case ChatUpdatedSuggestions(chat_id=chat_id):
+            return "suggestions", chat_id
+    return None
+
+
+class StoredMessage:
+    """
+    Compact in-memory form of a cached chat message.
+
+    The chat id is implied by the owning chat and metadata is kept as
+    JSON text, decoded only when a `MessageOut` is built for an API
+    response or an event. Kinds and `special` markers repeat a lot within
+    a chat, so they are stored as shared `MessageKind` members and
+    interned strings.
+    """
+
+    __slots__ = ("_metadata", "id", "kind", "sender_id", "sent_at", "special", "text")
+
+    def __init__(
+        self,
+        id_: int,
+        sender_id: int | None,
+        kind: MessageKind | str,
+        text: str,
+        special: str | None,
+        sent_at: datetime.datetime,
+        metadata_json: str | None,
+    ):
+        self.id = id_
+        self.sender_id = sender_id
+        # Connections without the enum codec hand the kind over as text.
+        self.kind = MessageKind(kind)
+        self.text = text
+        self.special = None if special is None else sys.intern(special)
+        self.sent_at = sent_at
+        self._metadata = metadata_json
+
+    @staticmethod
+    def from_row(row: typing.Mapping[str, typing.Any]) -> StoredMessage:
+        """From a row selected with `_STORED_MESSAGE_COLUMNS`."""
+        return StoredMessage(
+            row["id"],
+            row["sender_id"],
+            row["kind"],
+            row["text"],
+            row["special"],
+            row["sent_at"],
+            row["metadata"],
+        )
+
+    @staticmethod
+    def from_out(msg: MessageOut) -> StoredMessage:
+        return StoredMessage(
+            msg.id,
+            msg.sender_id,
+            msg.kind,
+            msg.text,
+            msg.special,
+            msg.sent_at,
+            None if msg.metadata is None else json.dumps(msg.metadata),
+        )
+
+    @property
+    def metadata(self) -> dict[str, typing.Any] | None:
+        return None if self._metadata is None else json.loads(self._metadata)
+
+    def to_out(self, chat_id: int) -> MessageOut:
+        return MessageOut(
+            id=self.id,
+            chat_id=chat_id,
+            sender_id=self.sender_id,
+            kind=self.kind,
+            text=self.text,
+            special=self.special,
+            sent_at=self.sent_at,
+            metadata=self.metadata,
+        )
+
+
+class MessageIndex(typing.Protocol):
+    """
+    Ordered set of the cached messages of a chat, keyed by message id.
+
+    `walk_forward` yields up to `count` messages after `start_id`
+    (exclusive), `walk_backward` up to `count` messages ending at
+    `start_id` (inclusive), newest first. With `start_id=None` they
+    start from the oldest or the newest message; an unknown `start_id`
+    yields nothing.
+    """
+
+    def __len__(self) -> int: ...
+
+    def __contains__(self, id_: int) -> bool: ...
+
+    def get(self, id_: int) -> StoredMessage | None: ...
+
+    def append(self, msg: StoredMessage): ...
+
+    def prepend_many(self, msgs: list[StoredMessage]): ...
+
+    def edit(self, msg: StoredMessage) -> bool: ...
+
+    def delete(self, id_: int) -> StoredMessage | None: ...
+
+    def prev_id(self, id_: int) -> int | None: ...
+
+    def next_id(self, id_: int) -> int | None: ...
+
+    def walk_forward(
+        self, start_id: int | None, count: int
+    ) -> typing.Iterator[StoredMessage]: ...
+
+    def walk_backward(
+        self, start_id: int | None, count: int
+    ) -> typing.Iterator[StoredMessage]: ...
+
+
+def with_neighbors(index: MessageIndex, msg: MessageOut) -> MessageOutWithNeighbors:
+    return MessageOutWithNeighbors(
+        msg=msg,
+        prev_id=index.prev_id(msg.id),
+        next_id=index.next_id(msg.id),
+    )
+
+
 @dataclasses.dataclass
 class MessageRef:
-    msg: MessageOut | None
+    msg: StoredMessage | None
     prev: MessageRef | None = None
     next: MessageRef | None = None
 
-    def to_message_out_with_neighbors(self) -> MessageOutWithNeighbors:
-        prev_id = None
-        next_id = None
-        if self.prev is not None and self.prev.msg is not None:
-            prev_id = self.prev.msg.id
-        if self.next is not None and self.next.msg is not None:
-            next_id = self.next.msg.id
-        return MessageOutWithNeighbors(
-            msg=self.msg,
-            prev_id=prev_id,
-            next_id=next_id,
-        )
 
+class LinkedMessageIndex:
+    """`MessageIndex` as a doubly linked list with an id -> node dict."""
 
-class MessageIndex:
     def __init__(self):
         self.head = MessageRef(None)
         self.tail = MessageRef(None)
@@ -64,23 +206,41 @@ class MessageIndex:
         self.tail.prev = self.head
         self.index: dict[int, MessageRef] = {}
 
-    def append(self, msg: MessageOut) -> MessageRef:
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, id_: int) -> bool:
+        return id_ in self.index
+
+    def get(self, id_: int) -> StoredMessage | None:
+        ref = self.index.get(id_)
+        return ref.msg if ref is not None else None
+
+    def append(self, msg: StoredMessage):
         ref = MessageRef(msg)
         ref.prev = self.tail.prev
         ref.next = self.tail
         ref.prev.next = ref
         self.tail.prev = ref
         self.index[msg.id] = ref
-        return ref
 
-    def edit(self, msg: MessageOut) -> bool:
+    def prepend_many(self, msgs: list[StoredMessage]):
+        for msg in reversed(msgs):
+            ref = MessageRef(msg)
+            ref.prev = self.head
+            ref.next = self.head.next
+            ref.next.prev = ref
+            self.head.next = ref
+            self.index[msg.id] = ref
+
+    def edit(self, msg: StoredMessage) -> bool:
         if msg.id not in self.index:
             return False
         ref = self.index[msg.id]
         ref.msg = msg
         return True
 
-    def delete(self, id_: int) -> MessageOut | None:
+    def delete(self, id_: int) -> StoredMessage | None:
         if id_ not in self.index:
             return None
         ref = self.index[id_]
@@ -90,9 +250,17 @@ class MessageIndex:
         del self.index[id_]
         return ref.msg
 
+    def prev_id(self, id_: int) -> int | None:
+        ref = self.index[id_].prev
+        return ref.msg.id if ref is not None and ref.msg is not None else None
+
+    def next_id(self, id_: int) -> int | None:
+        ref = self.index[id_].next
+        return ref.msg.id if ref is not None and ref.msg is not None else None
+
     def walk_forward(
         self, start_id: int | None, count: int
-    ) -> typing.Generator[MessageRef, None, None]:
+    ) -> typing.Generator[StoredMessage, None, None]:
         if start_id is None:
             ref = self.head.next
         elif start_id not in self.index:
@@ -102,12 +270,12 @@ class MessageIndex:
         for _ in range(count):
             if ref is None or ref is self.tail:
                 break
-            yield ref
+            yield ref.msg
             ref = ref.next
 
     def walk_backward(
         self, start_id: int | None, count: int
-    ) -> typing.Generator[MessageRef, None, None]:
+    ) -> typing.Generator[StoredMessage, None, None]:
         if start_id is None:
             ref = self.tail.prev
         elif start_id not in self.index:
@@ -117,16 +285,316 @@ class MessageIndex:
         for _ in range(count):
             if ref is None or ref is self.head:
                 break
-            yield ref
+            yield ref.msg
             ref = ref.prev
 
 
+class ArrayMessageIndex:
+    """
+    `MessageIndex` as two parallel arrays sorted by message id.
+
+    Lookups bisect the id array. Deleting only leaves a tombstone
+    (`None` in place of the message); the arrays are compacted once
+    tombstones make up more than half of them. Message ids only grow,
+    so appends stay at the end and pages of older history are spliced
+    in at the front in one go.
+    """
+
+    COMPACT_MIN_TOMBSTONES = 64
+
+    def __init__(self):
+        self._ids: list[int] = []
+        self._messages: list[StoredMessage | None] = []
+        self._tombstones = 0
+
+    def __len__(self) -> int:
+        return len(self._ids) - self._tombstones
+
+    def __contains__(self, id_: int) -> bool:
+        return self._find(id_) is not None
+
+    def get(self, id_: int) -> StoredMessage | None:
+        pos = self._find(id_)
+        return self._messages[pos] if pos is not None else None
+
+    def _find(self, id_: int) -> int | None:
+        pos = bisect.bisect_left(self._ids, id_)
+        if (
+            pos < len(self._ids)
+            and self._ids[pos] == id_
+            and self._messages[pos] is not None
+        ):
+            return pos
+        return None
+
+    def append(self, msg: StoredMessage):
+        if self._ids and msg.id <= self._ids[-1]:
+            pos = bisect.bisect_left(self._ids, msg.id)
+            if pos < len(self._ids) and self._ids[pos] == msg.id:
+                if self._messages[pos] is None:
+                    self._tombstones -= 1
+                self._messages[pos] = msg
+                return
+            self._ids.insert(pos, msg.id)
+            self._messages.insert(pos, msg)
+            return
+        self._ids.append(msg.id)
+        self._messages.append(msg)
+
+    def prepend_many(self, msgs: list[StoredMessage]):
+        if self._ids and msgs and msgs[-1].id >= self._ids[0]:
+            for msg in msgs:
+                self.append(msg)
+            return
+        self._ids[:0] = [msg.id for msg in msgs]
+        self._messages[:0] = msgs
+
+    def edit(self, msg: StoredMessage) -> bool:
+        pos = self._find(msg.id)
+        if pos is None:
+            return False
+        self._messages[pos] = msg
+        return True
+
+    def delete(self, id_: int) -> StoredMessage | None:
+        pos = self._find(id_)
+        if pos is None:
+            return None
+        msg = self._messages[pos]
+        self._messages[pos] = None
+        self._tombstones += 1
+        if (
+            self._tombstones >= self.COMPACT_MIN_TOMBSTONES
+            and self._tombstones * 2 > len(self._ids)
+        ):
+            self.compact()
+        return msg
+
+    def compact(self):
+        live = [
+            (id_, msg) for id_, msg in zip(self._ids, self._messages) if msg is not None
+        ]
+        self._ids = [id_ for id_, _ in live]
+        self._messages = [msg for _, msg in live]
+        self._tombstones = 0
+
+    def prev_id(self, id_: int) -> int | None:
+        pos = self._find(id_)
+        if pos is None:
+            raise KeyError(id_)
+        for msg in self._backward_from(pos - 1):
+            return msg.id
+        return None
+
+    def next_id(self, id_: int) -> int | None:
+        pos = self._find(id_)
+        if pos is None:
+            raise KeyError(id_)
+        for msg in self._forward_from(pos + 1):
+            return msg.id
+        return None
+
+    def _forward_from(self, pos: int) -> typing.Iterator[StoredMessage]:
+        messages = self._messages
+        for i in range(pos, len(messages)):
+            if (msg := messages[i]) is not None:
+                yield msg
+
+    def _backward_from(self, pos: int) -> typing.Iterator[StoredMessage]:
+        messages = self._messages
+        for i in range(pos, -1, -1):
+            if (msg := messages[i]) is not None:
+                yield msg
+
+    def walk_forward(
+        self, start_id: int | None, count: int
+    ) -> typing.Iterator[StoredMessage]:
+        if start_id is None:
+            pos = 0
+        elif (pos := self._find(start_id)) is None:
+            return iter(())
+        else:
+            pos += 1
+        return itertools.islice(self._forward_from(pos), count)
+
+    def walk_backward(
+        self, start_id: int | None, count: int
+    ) -> typing.Iterator[StoredMessage]:
+        if start_id is None:
+            pos = len(self._ids) - 1
+        elif (pos := self._find(start_id)) is None:
+            return iter(())
+        return itertools.islice(self._backward_from(pos), count)
+
+
+def new_message_index() -> MessageIndex:
+    if config.CHAT_MESSAGE_INDEX == "linked":
+        return LinkedMessageIndex()
+    return ArrayMessageIndex()
+
+
+@dataclasses.dataclass
+class NewMessage:
+    kind: MessageKind
+    text: str
+    sender_id: int | None = None
+    special: str | None = None
+    metadata: dict[str, typing.Any] | None = None
+    sent_at: datetime.datetime | None = None
+
+
+@dataclasses.dataclass
+class ChatHeader:
+    owner_id: int | None
+    interface: ChatInterface
+
+    @staticmethod
+    def from_row(row: typing.Mapping[str, typing.Any]) -> ChatHeader:
+        return ChatHeader(
+            owner_id=row["owner_id"],
+            interface=ChatInterface(
+                type=row["interface_type"], deadline=row["deadline"]
+            ),
+        )
+
+
+_SUGGESTIONS = """ARRAY(
+    SELECT suggestion FROM chat_suggestions s WHERE s.chat_id = chats.id ORDER BY s.id
+) AS suggestions"""
+
+_STORED_MESSAGE_COLUMNS = (
+    "id, sender_id, kind, text, special, sent_at, metadata::text AS metadata"
+)
+
+
 class ChatSystem(System[ChatEvent]):
-    def __init__(self, id_: int):
-        super().__init__(id_)
-        self.index = MessageIndex()
+    """
+    Only a window of the most recent messages is loaded with the chat.
+    Older messages are paged in from the database when a reader walks
+    past the start of the window, and stay cached afterwards, so the
+    in-memory part of the index is always a contiguous suffix of the
+    history: every message with id >= `loaded_from` is in `index`.
+
+    The chat header (owner and interface) is cached as well. Code that
+    changes a chat row must call `invalidate_header`.
+
+    Messages that are streamed in pieces (LLM output) start as drafts:
+    they get a real message id and are shown and edited like any other
+    message, but exist only in memory until `finalize_draft` writes the
+    final version with a single INSERT. Deleting a draft never touches
+    the database. Drafts that are not finalized are lost with the chat.
+
+    Every change a reader can see (messages, suggestions, interface)
+    increments `version`. The last changes are kept in a short log so
+    that `get_changes` can tell a client what happened since the version
+    it has. Versions start from the load time in microseconds, so those
+    handed out by an earlier instance of the same chat are always older
+    than anything this one can answer.
+    """
+
+    @staticmethod
+    def registry_limit() -> int | None:
+        return config.MAX_LOADED_CHATS
+
+    def __init__(self, id_: int, header: ChatHeader | None = None):
+        super().__init__(
+            id_,
+            capacity=config.EVENT_QUEUE_CAPACITY,
+            backpressure=Backpressure.COALESCE,
+            coalesce_key=chat_event_key,
+        )
+        self.header = header
+        self.index = new_message_index()
+        self.drafts: dict[int, MessageOut] = {}
+        self.base_version = time.time_ns() // 1000
+        self.version = self.base_version
+        # Latest change of each message (None for the chat itself), as
+        # (version, deleted), least recently changed first.
+        self._changes: collections.OrderedDict[int | None, tuple[int, bool]] = (
+            collections.OrderedDict()
+        )
+        # Changes up to this version may have been evicted from the log.
+        self._changes_floor = self.base_version
+        self.has_older = False
+        self.loaded_from: int | None = None
         self.suggestions = []
 
+    async def _load_recent(self, conn: asyncpg.Connection):
+        rows = await conn.fetch(
+            f"""
+            SELECT {_STORED_MESSAGE_COLUMNS}
+            FROM messages
+            WHERE chat_id = $1
+            ORDER BY id DESC
+            LIMIT $2
+            """,
+            self.id,
+            config.CHAT_WINDOW_SIZE + 1,
+        )
+        self._set_recent(rows)
+
+    def _set_recent(self, rows: list[typing.Mapping[str, typing.Any]]):
+        """Fill the window from up to CHAT_WINDOW_SIZE + 1 rows, newest first."""
+        self.has_older = len(rows) > config.CHAT_WINDOW_SIZE
+        rows = rows[: config.CHAT_WINDOW_SIZE]
+        self.index.prepend_many([StoredMessage.from_row(row) for row in reversed(rows)])
+        self.loaded_from = rows[-1]["id"] if rows else None
+
+    async def _page_in(
+        self, conn: asyncpg.Connection, before_message_id: int | None, count: int
+    ):
+        """
+        Make sure that `count` messages ending at `before_message_id`
+        (inclusive; the newest message if None) are in memory, or that
+        the window reaches the start of the history. `count` is capped
+        at one more than CHAT_PAGE_MAX_MESSAGES.
+        """
+        if not self.has_older:
+            return
+        count = min(count, config.CHAT_PAGE_MAX_MESSAGES + 1)
+
+        if before_message_id is None or before_message_id in self.index:
+            have = sum(1 for _ in self.index.walk_backward(before_message_id, count))
+            if have >= count:
+                return
+            down_to = self.loaded_from
+            extra = count - have
+        elif before_message_id < self.loaded_from:
+            down_to = before_message_id
+            extra = count
+        else:
+            return
+
+        # Everything between the cursor and the window, plus `extra`
+        # messages before the cursor. One more row than needed tells
+        # whether anything older is left.
+        rows = await conn.fetch(
+            f"""
+            SELECT {_STORED_MESSAGE_COLUMNS}
+            FROM messages
+            WHERE chat_id = $1 AND id >= $3 AND id < $2
+            UNION ALL
+            (
+                SELECT {_STORED_MESSAGE_COLUMNS}
+                FROM messages
+                WHERE chat_id = $1 AND id < $3
+                ORDER BY id DESC
+                LIMIT $4
+            )
+            ORDER BY id
+            """,
+            self.id,
+            self.loaded_from,
+            down_to,
+            extra + 1,
+        )
+        self.has_older = sum(1 for row in rows if row["id"] < down_to) > extra
+        if self.has_older:
+            rows = rows[1:]
+        self.index.prepend_many([StoredMessage.from_row(row) for row in rows])
+        if rows:
+            self.loaded_from = rows[0]["id"]
+
     @staticmethod
     async def create_or_load(
         conn: asyncpg.Connection,
@@ -134,52 +602,117 @@ class ChatSystem(System[ChatEvent]):
         kind: ChatType,
         owner_id: int | None = None,
         interface_type: ChatInterfaceType = ChatInterfaceType.FULL,
-        log=gl_log,
-    ) -> ChatSystem | ServiceError:
-        id_ = await conn.fetchval(
-            """
-            SELECT id FROM chats
-            WHERE game_id = $1 AND chat_type = $2 AND owner_id = $3
-            """,
-            game_id,
-            kind,
-            owner_id,
+    ) -> ChatSystem:
+        [chat_system] = await ChatSystem.create_or_load_many(
+            conn, game_id, [(kind, owner_id, interface_type)]
         )
+        return chat_system
 
-        if id_ is None:
-            id_ = await conn.fetchval(
-                """
+    @staticmethod
+    async def create_or_load_many(
+        conn: asyncpg.Connection,
+        game_id: int,
+        chats: list[tuple[ChatType, int | None, ChatInterfaceType]],
+    ) -> list[ChatSystem]:
+        """
+        `create_or_load` for several chats of a game at once: one statement
+        finds or creates every chat, another reads the recent messages of
+        all of them. Chats are given as (kind, owner, interface for a new
+        chat) and returned in the same order; a chat asked for twice is
+        returned twice.
+        """
+        if not chats:
+            return []
+        # Each chat goes into the statement once, or it would be created
+        # once per copy.
+        unique: dict[tuple[ChatType, int | None], ChatInterfaceType] = {}
+        for kind, owner_id, interface_type in chats:
+            unique.setdefault((kind, owner_id), interface_type)
+        kinds = [kind for kind, _ in unique]
+        owners = [owner_id for _, owner_id in unique]
+        rows = await conn.fetch(
+            f"""
+            WITH wanted AS (
+                SELECT w.chat_type::chat_type AS chat_type, w.owner_id,
+                       w.interface_type::chat_interface_type AS interface_type, w.n
+                FROM unnest($2::text[], $3::int[], $4::text[])
+                    WITH ORDINALITY AS w(chat_type, owner_id, interface_type, n)
+            ),
+            found AS (
+                SELECT DISTINCT ON (w.n) w.n, chats.id, chats.owner_id,
+                       chats.interface_type, chats.deadline, {_SUGGESTIONS}
+                FROM wanted w
+                JOIN chats ON chats.game_id = $1
+                    AND chats.chat_type = w.chat_type
+                    AND chats.owner_id IS NOT DISTINCT FROM w.owner_id
+                -- Room chats used to be duplicated; the newest one is in use.
+                ORDER BY w.n, chats.id DESC
+            ),
+            created AS (
                 INSERT INTO chats (game_id, chat_type, owner_id, interface_type)
-                VALUES ($1, $2, $3, $4) RETURNING id
-                """,
-                game_id,
-                kind,
-                owner_id,
-                interface_type,
+                SELECT $1, w.chat_type, w.owner_id, w.interface_type
+                FROM wanted w
+                WHERE w.n NOT IN (SELECT n FROM found)
+                ORDER BY w.n
+                RETURNING id, chat_type, owner_id, interface_type, deadline
             )
-
-            if id_ is None:
-                return await error(
-                    ServiceCode.SERVER_ERROR, "Failed to create chat", log=log
-                )
-
-        chat_system = ChatSystem(id_)
-
-        messages = await conn.fetch(
-            """
-            SELECT id, chat_id, sender_id, kind, text, special, sent_at, metadata
-            FROM messages
-            WHERE chat_id = $1
-            ORDER BY id
+            SELECT n, id, owner_id, interface_type, deadline, suggestions FROM found
+            UNION ALL
+            SELECT w.n, c.id, c.owner_id, c.interface_type, c.deadline,
+                   ARRAY[]::text[]
+            FROM created c
+            JOIN wanted w ON w.chat_type = c.chat_type
+                AND w.owner_id IS NOT DISTINCT FROM c.owner_id
+            ORDER BY n
             """,
-            id_,
+            game_id,
+            [kind.value for kind in kinds],
+            owners,
+            [interface.value for interface in unique.values()],
         )
 
-        for row in messages:
-            message = ChatSystem.message_out_from_row(row)
-            chat_system.index.append(message)
+        loaded: list[ChatSystem] = []
+        fresh: dict[int, ChatSystem] = {}
+        for row in rows:
+            existing = ChatSystem.of(row["id"])
+            if existing is not None:
+                # Loaded on demand earlier; from now on the game owns it.
+                loaded_chats.release(existing.id)
+                loaded.append(existing)
+                continue
+            chat_system = fresh.get(row["id"])
+            if chat_system is None:
+                chat_system = ChatSystem(row["id"], ChatHeader.from_row(row))
+                chat_system.suggestions = list(row["suggestions"])
+                fresh[chat_system.id] = chat_system
+            loaded.append(chat_system)
+        by_key = dict(zip(unique, loaded, strict=True))
+        result = [by_key[kind, owner_id] for kind, owner_id, _ in chats]
+
+        if fresh:
+            windows = await conn.fetch(
+                f"""
+                SELECT c.chat_id, m.*
+                FROM unnest($1::int[]) AS c(chat_id)
+                CROSS JOIN LATERAL (
+                    SELECT {_STORED_MESSAGE_COLUMNS}
+                    FROM messages
+                    WHERE chat_id = c.chat_id
+                    ORDER BY id DESC
+                    LIMIT $2
+                ) m
+                ORDER BY c.chat_id, m.id DESC
+                """,
+                list(fresh),
+                config.CHAT_WINDOW_SIZE + 1,
+            )
+            by_chat: dict[int, list[asyncpg.Record]] = {id_: [] for id_ in fresh}
+            for row in windows:
+                by_chat[row["chat_id"]].append(row)
+            for chat_id, chat_rows in by_chat.items():
+                fresh[chat_id]._set_recent(chat_rows)
 
-        return chat_system
+        return result
 
     @staticmethod
     def message_out_from_row(row: dict[str, typing.Any]) -> MessageOut:
@@ -208,6 +741,11 @@ class ChatSystem(System[ChatEvent]):
         if sent_at is None:
             sent_at = datetime.datetime.now()
 
+        if not self.index:
+            # Deletes may have emptied the window; the new message still
+            # needs its real predecessor as a neighbour.
+            await self._page_in(conn, None, 1)
+
         message_id = await conn.fetchval(
             """
             INSERT INTO messages (chat_id, sender_id, kind, text, special, metadata, sent_at)
@@ -238,9 +776,6 @@ class ChatSystem(System[ChatEvent]):
             metadata=metadata,
         )
 
-        ref = self.index.append(message)
-        message = ref.to_message_out_with_neighbors()
-
         await log.ainfo(
             "Sent message",
             chat_id=self.id,
@@ -248,10 +783,141 @@ class ChatSystem(System[ChatEvent]):
             message_kind=message_kind,
         )
 
+        return self._message_added(message)
+
+    async def send_messages_bulk(
+        self, conn: asyncpg.Connection, messages: list[NewMessage], log=gl_log
+    ) -> list[MessageOutWithNeighbors] | ServiceError:
+        return await send_messages_bulk(
+            conn, [(self, message) for message in messages], log=log
+        )
+
+    def _changed(self, message_id: int | None = None, deleted: bool = False):
+        self.version += 1
+        # A reader only needs the latest change of a message, so streamed
+        # edits take one entry instead of flooding the log.
+        self._changes.pop(message_id, None)
+        self._changes[message_id] = (self.version, deleted)
+        if len(self._changes) > config.CHAT_CHANGE_LOG_SIZE:
+            _, (self._changes_floor, _) = self._changes.popitem(last=False)
+
+    def _message_added(self, message: MessageOut) -> MessageOutWithNeighbors:
+        self._changed(message.id)
+        self.index.append(StoredMessage.from_out(message))
+        message = with_neighbors(self.index, message)
+        # Pending edits happened before this message and must reach
+        # clients before it does.
+        self.flush_coalesced()
         self.emit(ChatMessageSentEvent(chat_id=self.id, message=message))
+        return message
+
+    def _message_edited(self, message: MessageOut):
+        self._changed(message.id)
+        # Messages older than the window are not cached, nothing to update.
+        self.index.edit(StoredMessage.from_out(message))
+
+        # Streaming LLM output edits the same message many times a second;
+        # clients only need its latest text once per tick.
+        self.emit_coalesced(
+            ChatMessageEditEvent(chat_id=self.id, message=message),
+            key=("edit", message.id),
+            tick=config.EDIT_COALESCE_SECONDS,
+        )
+
+    def _message_deleted(self, message: MessageOut):
+        self._changed(message.id, deleted=True)
+        self.index.delete(message.id)
+        self.discard_coalesced(("edit", message.id))
+        self.flush_coalesced()
+        self.emit(ChatMessageDeletedEvent(chat_id=self.id, message=message))
+
+    async def start_draft(
+        self,
+        conn: asyncpg.Connection,
+        message_kind: MessageKind,
+        text: str,
+        sender_id: int | None,
+        special: str | None = None,
+        metadata: dict[str, typing.Any] | None = None,
+        log=gl_log,
+    ) -> MessageOutWithNeighbors | ServiceError:
+        """
+        Like `send_message`, but only reserves the message id. The row is
+        written by `finalize_draft`; until then `edit_message` and
+        `delete_message` work on the in-memory draft.
+        """
+        if not self.index:
+            await self._page_in(conn, None, 1)
+
+        message_id = await conn.fetchval(
+            "SELECT nextval(pg_get_serial_sequence('messages', 'id'))"
+        )
+        if message_id is None:
+            return await error(
+                ServiceCode.SERVER_ERROR, "Failed to start draft message", log=log
+            )
+
+        message = MessageOut(
+            id=message_id,
+            chat_id=self.id,
+            sender_id=sender_id,
+            kind=message_kind,
+            text=text,
+            special=special,
+            sent_at=datetime.datetime.now(),
+            metadata=metadata,
+        )
+        self.drafts[message_id] = message
+
+        await log.ainfo(
+            "Started draft message",
+            chat_id=self.id,
+            message_id=message_id,
+            message_kind=message_kind,
+        )
+
+        return self._message_added(message)
+
+    async def finalize_draft(
+        self,
+        conn: asyncpg.Connection,
+        message_id: int,
+        llm_message: dict[str, typing.Any] | None = None,
+        log=gl_log,
+    ) -> MessageOut | None:
+        """
+        Write the current version of a draft to the database. Returns
+        None if there is no such draft, e.g. it was deleted meanwhile.
+
+        `llm_message` is the transcript entry the model produced for this
+        message. It is stored apart from the message, see
+        `get_llm_messages`.
+        """
+        if message_id not in self.drafts:
+            return None
 
+        [message] = await finalize_drafts_bulk(conn, [(self, message_id)], log=log)
+        if llm_message is not None:
+            await conn.execute(
+                "INSERT INTO llm_messages (message_id, payload) VALUES ($1, $2)",
+                message.id,
+                llm_message,
+            )
         return message
 
+    async def get_llm_messages(
+        self, conn: asyncpg.Connection, message_ids: list[int]
+    ) -> dict[int, dict[str, typing.Any]]:
+        """LLM transcript entries stored for the given messages, by id."""
+        rows = await conn.fetch(
+            """
+            SELECT message_id, payload FROM llm_messages
+            WHERE message_id = ANY($1::int[])
+            """,
+            message_ids,
+        )
+        return {row["message_id"]: row["payload"] for row in rows}
+
     async def edit_message(
         self,
         conn: asyncpg.Connection,
@@ -261,6 +927,14 @@ class ChatSystem(System[ChatEvent]):
         metadata: dict[str, typing.Any] | None = None,
         log=gl_log,
     ) -> MessageOut | ServiceError:
+        if message_id in self.drafts:
+            message = dataclasses.replace(
+                self.drafts[message_id], text=text, special=special, metadata=metadata
+            )
+            self.drafts[message_id] = message
+            self._message_edited(message)
+            return message
+
         message = await conn.fetchrow(
             """
             UPDATE messages
@@ -283,15 +957,19 @@ class ChatSystem(System[ChatEvent]):
         await log.ainfo("Edited message", chat_id=self.id, message_id=message_id)
 
         message = self.message_out_from_row(message)
-
-        assert self.index.edit(message)
-
-        self.emit(ChatMessageEditEvent(chat_id=self.id, message=message))
+        self._message_edited(message)
         return message
 
     async def delete_message(
         self, conn: asyncpg.Connection, message_id: int, log=gl_log
     ) -> MessageOut | ServiceError:
+        if (message := self.drafts.pop(message_id, None)) is not None:
+            await log.ainfo(
+                "Discarded draft message", chat_id=self.id, message_id=message_id
+            )
+            self._message_deleted(message)
+            return message
+
         message = await conn.fetchrow(
             """
             DELETE
@@ -309,11 +987,90 @@ class ChatSystem(System[ChatEvent]):
         await log.ainfo("Deleted message", chat_id=self.id, message_id=message_id)
 
         message = self.message_out_from_row(message)
+        self._message_deleted(message)
+        return message
+
+    async def get_header(
+        self, conn: asyncpg.Connection, log=gl_log
+    ) -> ChatHeader | ServiceError:
+        if self.header is None:
+            row = await conn.fetchrow(
+                "SELECT owner_id, interface_type, deadline FROM chats WHERE id = $1",
+                self.id,
+            )
+            if row is None:
+                return await error(ServiceCode.SERVER_ERROR, "Chat not found", log=log)
+            self.header = ChatHeader.from_row(row)
+        return self.header
+
+    def invalidate_header(self):
+        self.header = None
+        self._changed()
+
+    async def get_changes(
+        self, conn: asyncpg.Connection, since: int, limit: int, log=gl_log
+    ) -> ChatDeltaOut | ServiceError:
+        """
+        What changed after version `since`: messages that were sent or
+        edited (in their current form) and ids of deleted ones. If the
+        change log no longer reaches back to `since`, or there are more
+        than `limit` changed messages, the result is a reset carrying
+        the latest segment instead.
+        """
+        header = await self.get_header(conn, log=log)
+        if isinstance(header, ServiceError):
+            return header
+
+        changed: dict[int, bool] | None = None
+        if self._changes_floor <= since <= self.version:
+            changed = {
+                message_id: deleted
+                for message_id, (version, deleted) in self._changes.items()
+                if version > since and message_id is not None
+            }
+
+        if changed is None or len(changed) > limit:
+            segment = await self.get_messages(conn, limit, log=log)
+            if isinstance(segment, ServiceError):
+                return segment
+            return ChatDeltaOut(
+                chat_id=self.id,
+                version=self.version,
+                reset=True,
+                messages=[],
+                deleted_ids=[],
+                suggestions=self.suggestions,
+                interface=header.interface,
+                segment=segment,
+            )
 
-        assert self.index.delete(message_id) is not None
+        messages = []
+        uncached = []
+        for message_id in sorted(changed):
+            if changed[message_id]:
+                continue
+            if (stored := self.index.get(message_id)) is not None:
+                messages.append(stored.to_out(self.id))
+            else:
+                uncached.append(message_id)
+        if uncached:
+            # Edits of messages older than the cached window.
+            rows = await conn.fetch(
+                f"SELECT {_STORED_MESSAGE_COLUMNS} FROM messages WHERE id = ANY($1)",
+                uncached,
+            )
+            messages.extend(StoredMessage.from_row(row).to_out(self.id) for row in rows)
+            messages.sort(key=lambda msg: msg.id)
 
-        self.emit(ChatMessageDeletedEvent(chat_id=self.id, message=message))
-        return message
+        return ChatDeltaOut(
+            chat_id=self.id,
+            version=self.version,
+            reset=False,
+            messages=messages,
+            deleted_ids=sorted(id_ for id_, deleted in changed.items() if deleted),
+            suggestions=self.suggestions,
+            interface=header.interface,
+        )
 
     async def get_messages(
         self,
@@ -324,6 +1081,7 @@ class ChatSystem(System[ChatEvent]):
         after_message_id: int | None = None,
         log=gl_log,
     ) -> ChatSegmentOut | ServiceError:
+        limit = min(limit, config.CHAT_PAGE_MAX_MESSAGES)
         log = log.bind(
             limit=limit,
             before_message_id=before_message_id,
@@ -337,23 +1095,13 @@ class ChatSystem(System[ChatEvent]):
                 log=log,
             )
 
-        chat_info = await conn.fetchrow(
-            """
-            SELECT c.id as chat_id,
-                   c.owner_id,
-                   c.interface_type,
-                   c.deadline
-            FROM chats AS c
-            WHERE c.id = $1
-            """,
-            self.id,
-        )
-
-        if not chat_info:
-            return await error(ServiceCode.SERVER_ERROR, "Chat not found", log=gl_log)
+        header = await self.get_header(conn, log=log)
+        if isinstance(header, ServiceError):
+            return header
 
         if after_message_id is not None:
-            if after_message_id not in self.index.index:
+            await self._page_in(conn, after_message_id, 1)
+            if after_message_id not in self.index:
                 return await error(
                     ServiceCode.MESSAGE_NOT_FOUND,
                     "Message with id 'after_message_id' not found",
@@ -361,7 +1109,11 @@ class ChatSystem(System[ChatEvent]):
                 )
             messages = list(self.index.walk_forward(after_message_id, limit))
         elif before_message_id is not None:
+            # One more message than requested, so that `previous_id` of
+            # the segment is known.
+            await self._page_in(conn, before_message_id, limit + 1)
             messages = list(self.index.walk_backward(before_message_id, limit))
+            messages.reverse()
             if not messages:
                 return await error(
                     ServiceCode.MESSAGE_NOT_FOUND,
@@ -369,64 +1121,63 @@ class ChatSystem(System[ChatEvent]):
                     log=gl_log,
                 )
         else:
+            await self._page_in(conn, None, limit + 1)
             messages = list(self.index.walk_backward(None, limit))
-
-        messages.sort(key=lambda ref: ref.msg.id)
+            messages.reverse()
 
         if not messages:
             return ChatSegmentOut(
-                chat_id=chat_info["chat_id"],
-                chat_owner=chat_info["owner_id"],
-                interface=ChatInterface(
-                    type=chat_info["interface_type"],
-                    deadline=chat_info["deadline"],
-                ),
+                chat_id=self.id,
+                chat_owner=header.owner_id,
+                interface=header.interface,
                 previous_id=None,
                 next_id=None,
                 messages=[],
                 suggestions=self.suggestions,
+                version=self.version,
             )
 
         return ChatSegmentOut(
-            chat_id=chat_info["chat_id"],
-            chat_owner=chat_info["owner_id"],
-            interface=ChatInterface(
-                type=chat_info["interface_type"],
-                deadline=chat_info["deadline"],
-            ),
-            previous_id=(
-                messages[0].prev.msg.id
-                if messages and messages[0].prev and messages[0].prev.msg
-                else None
-            ),
-            next_id=(
-                messages[-1].next.msg.id
-                if messages and messages[-1].next and messages[-1].next.msg
-                else None
-            ),
-            messages=[m.msg for m in messages],
+            chat_id=self.id,
+            chat_owner=header.owner_id,
+            interface=header.interface,
+            previous_id=self.index.prev_id(messages[0].id),
+            next_id=self.index.next_id(messages[-1].id),
+            messages=[msg.to_out(self.id) for msg in messages],
             suggestions=self.suggestions,
+            version=self.version,
         )
 
-    async def add_suggestion(self, suggestion: str):
-        self.suggestions.append(suggestion)
+    async def set_suggestions(
+        self,
+        suggestions: typing.Iterable[str],
+        conn: asyncpg.Connection | None = None,
+    ) -> bool:
+        """
+        Replace the suggestion list with one event. Nothing is emitted or
+        written if the list did not change. With `conn`, the list is also
+        stored in `chat_suggestions`, so it survives reloading the chat.
+        """
+        suggestions = list(suggestions)
+        if suggestions == self.suggestions:
+            return False
+        self.suggestions = suggestions
+        self._changed()
         self.emit(
             ChatUpdatedSuggestions(
                 chat_id=self.id,
                 suggestions=self.suggestions,
             )
         )
+        if conn is not None:
+            await persist_suggestions(conn, [self])
+        return True
+
+    async def add_suggestion(self, suggestion: str):
+        await self.set_suggestions([*self.suggestions, suggestion])
 
     async def clear_suggestions(self):
-        if not self.suggestions:
-            return
-        self.suggestions = []
-        self.emit(
-            ChatUpdatedSuggestions(
-                chat_id=self.id,
-                suggestions=self.suggestions,
-            )
-        )
+        await self.set_suggestions([])
 
     @staticmethod
     async def load_by_id(
@@ -434,28 +1185,292 @@ class ChatSystem(System[ChatEvent]):
         chat_id: int,
         log=gl_log,
     ) -> ChatSystem | ServiceError:
+        """
+        Return the live chat with this id, or load it. Chats loaded here
+        are not owned by any game and are kept in `loaded_chats`.
+        """
         existing = ChatSystem.of(chat_id)
         if existing is not None:
+            loaded_chats.touch(chat_id)
+            await loaded_chats.evict()
             return existing
 
-        exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM chats WHERE id = $1)", chat_id
+        row = await conn.fetchrow(
+            f"""
+            SELECT owner_id, interface_type, deadline, {_SUGGESTIONS}
+            FROM chats WHERE id = $1
+            """,
+            chat_id,
         )
-        if not exists:
+        if row is None:
             return await error(
                 ServiceCode.SERVER_ERROR, "Chat not found", chat_id=chat_id, log=log
             )
 
-        chat_system = ChatSystem(chat_id)
-        messages = await conn.fetch(
-            """
-            SELECT id, chat_id, sender_id, kind, text, special, sent_at, metadata
-            FROM messages
-            WHERE chat_id = $1
-            ORDER BY id
-            """,
-            chat_id,
-        )
-        for row in messages:
-            chat_system.index.append(ChatSystem.message_out_from_row(row))
+        existing = ChatSystem.of(chat_id)
+        if existing is not None:
+            return existing
+
+        chat_system = ChatSystem(chat_id, ChatHeader.from_row(row))
+        chat_system.suggestions = list(row["suggestions"])
+        await chat_system._load_recent(conn)
+        await loaded_chats.add(chat_system)
         return chat_system
+
+
+class LoadedChats:
+    """
+    LRU of chats loaded on demand, e.g. to read the history of a player
+    who already left the game. Such chats are owned by nobody else, so
+    they are stopped when evicted. The budget counts both chats and the
+    messages cached in them, since paging in old history grows a chat.
+    """
+
+    def __init__(self, max_chats: int, max_messages: int):
+        self.max_chats = max_chats
+        self.max_messages = max_messages
+        self._chats: collections.OrderedDict[int, ChatSystem] = (
+            collections.OrderedDict()
+        )
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._chats
+
+    def messages(self) -> int:
+        return sum(len(chat.index) for chat in self._chats.values())
+
+    def touch(self, chat_id: int):
+        if chat_id in self._chats:
+            self._chats.move_to_end(chat_id)
+
+    def release(self, chat_id: int) -> ChatSystem | None:
+        return self._chats.pop(chat_id, None)
+
+    async def add(self, chat: ChatSystem):
+        self._chats[chat.id] = chat
+        self._chats.move_to_end(chat.id)
+        await self.evict()
+
+    async def evict(self):
+        while len(self._chats) > 1 and (
+            len(self._chats) > self.max_chats or self.messages() > self.max_messages
+        ):
+            _, chat = self._chats.popitem(last=False)
+            self.evicted += 1
+            await chat.stop()
+
+
+loaded_chats = LoadedChats(config.CHAT_CACHE_MAX_CHATS, config.CHAT_CACHE_MAX_MESSAGES)
+
+
+async def send_messages_bulk(
+    conn: asyncpg.Connection,
+    batch: list[tuple[ChatSystem, NewMessage]],
+    log=gl_log,
+) -> list[MessageOutWithNeighbors] | ServiceError:
+    """
+    Send messages to any number of chats with a single INSERT. Messages
+    get ids in batch order, and their events are emitted together once
+    all rows are written.
+    """
+    if not batch:
+        return []
+
+    for chat in {id(chat): chat for chat, _ in batch}.values():
+        if not chat.index:
+            await chat._page_in(conn, None, 1)
+
+    now = datetime.datetime.now()
+    sent_at = [message.sent_at or now for _, message in batch]
+    rows = await conn.fetch(
+        """
+        INSERT INTO messages (chat_id, sender_id, kind, text, special, metadata, sent_at)
+        SELECT chat_id, sender_id, kind::message_kind, text, special, metadata::jsonb, sent_at
+        FROM unnest(
+            $1::int[], $2::int[], $3::text[], $4::text[], $5::text[], $6::text[],
+            $7::timestamptz[]
+        ) WITH ORDINALITY AS m(chat_id, sender_id, kind, text, special, metadata, sent_at, n)
+        ORDER BY n
+        RETURNING id
+        """,
+        [chat.id for chat, _ in batch],
+        [message.sender_id for _, message in batch],
+        [message.kind.value for _, message in batch],
+        [message.text for _, message in batch],
+        [message.special for _, message in batch],
+        [
+            None if message.metadata is None else json.dumps(message.metadata)
+            for _, message in batch
+        ],
+        sent_at,
+    )
+
+    if len(rows) != len(batch):
+        return await error(ServiceCode.SERVER_ERROR, "Failed to send messages", log=log)
+
+    # Ids come from the sequence in insertion order.
+    ids = sorted(row["id"] for row in rows)
+    results = [
+        chat._message_added(
+            MessageOut(
+                id=id_,
+                chat_id=chat.id,
+                sender_id=message.sender_id,
+                kind=message.kind,
+                text=message.text,
+                special=message.special,
+                sent_at=message_sent_at,
+                metadata=message.metadata,
+            )
+        )
+        for (chat, message), id_, message_sent_at in zip(batch, ids, sent_at)
+    ]
+
+    await log.ainfo(
+        "Sent messages",
+        chat_ids=sorted({chat.id for chat, _ in batch}),
+        message_count=len(results),
+    )
+    return results
+
+
+async def finalize_drafts_bulk(
+    conn: asyncpg.Connection,
+    batch: list[tuple[ChatSystem, int]],
+    log=gl_log,
+) -> list[MessageOut]:
+    """
+    Write the current versions of drafts of any number of chats with a
+    single INSERT, like `send_messages_bulk` does for new messages.
+    Drafts that no longer exist, e.g. were deleted meanwhile, are skipped.
+    """
+    messages = [
+        message
+        for chat, message_id in batch
+        if (message := chat.drafts.pop(message_id, None)) is not None
+    ]
+    if not messages:
+        return []
+
+    await conn.execute(
+        """
+        INSERT INTO messages (id, chat_id, sender_id, kind, text, special, metadata, sent_at)
+        SELECT id, chat_id, sender_id, kind::message_kind, text, special, metadata::jsonb, sent_at
+        FROM unnest(
+            $1::int[], $2::int[], $3::int[], $4::text[], $5::text[], $6::text[],
+            $7::text[], $8::timestamptz[]
+        ) AS m(id, chat_id, sender_id, kind, text, special, metadata, sent_at)
+        """,
+        [message.id for message in messages],
+        [message.chat_id for message in messages],
+        [message.sender_id for message in messages],
+        [message.kind.value for message in messages],
+        [message.text for message in messages],
+        [message.special for message in messages],
+        [
+            None if message.metadata is None else json.dumps(message.metadata)
+            for message in messages
+        ],
+        [message.sent_at for message in messages],
+    )
+
+    await log.ainfo(
+        "Finalized draft messages",
+        chat_ids=sorted({message.chat_id for message in messages}),
+        message_ids=[message.id for message in messages],
+    )
+    return messages
+
+
+async def persist_suggestions(conn: asyncpg.Connection, chats: list[ChatSystem]):
+    """Store the current suggestion lists of `chats` in one statement."""
+    if not chats:
+        return
+    pairs = [(chat.id, suggestion) for chat in chats for suggestion in chat.suggestions]
+    await conn.execute(
+        """
+        WITH cleared AS (
+            DELETE FROM chat_suggestions WHERE chat_id = ANY($1::int[])
+        )
+        INSERT INTO chat_suggestions (chat_id, suggestion)
+        SELECT chat_id, suggestion
+        FROM unnest($2::int[], $3::text[]) WITH ORDINALITY AS s(chat_id, suggestion, n)
+        ORDER BY n
+        """,
+        [chat.id for chat in chats],
+        [chat_id for chat_id, _ in pairs],
+        [suggestion for _, suggestion in pairs],
+    )
+
+
+async def search_messages(
+    conn: asyncpg.Connection,
+    game_id: int,
+    query: str,
+    limit: int,
+    chat_id: int | None = None,
+    reader_id: int | None = None,
+    cursor: str | None = None,
+) -> MessageSearchOut:
+    """
+    Full-text search over the messages of a game, best matches first.
+
+    With `reader_id` only chats without an owner and those owned by the
+    reader are searched. `cursor` is `next_cursor` of the previous page,
+    the "rank:id" of its last hit.
+    """
+    after_rank, after_id = None, None
+    if cursor is not None:
+        rank, _, id_ = cursor.partition(":")
+        after_rank, after_id = float(rank), int(id_)
+    rows = await conn.fetch(
+        """
+        -- The text is escaped first, so the only markup in the headline
+        -- is the highlighting.
+        SELECT hits.*, ts_headline(
+            'simple',
+            replace(replace(replace(replace(replace(
+                hits.text, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+                '"', '&quot;'), '''', '&#39;'),
+            hits.q
+        ) AS headline
+        FROM (
+            SELECT m.id, m.chat_id, m.sender_id, m.kind, m.text, m.special,
+                   m.metadata, m.sent_at, ts_rank(m.search, q) AS rank, q
+            FROM messages m
+            JOIN chats c ON c.id = m.chat_id,
+                 websearch_to_tsquery('simple', $2) q
+            WHERE c.game_id = $1
+              AND m.search @@ q
+              AND ($3::int IS NULL OR m.chat_id = $3)
+              AND ($4::int IS NULL OR c.owner_id IS NULL OR c.owner_id = $4)
+        ) hits
+        WHERE $5::real IS NULL OR (hits.rank, hits.id) < ($5::real, $6::int)
+        ORDER BY hits.rank DESC, hits.id DESC
+        LIMIT $7
+        """,
+        game_id,
+        query,
+        chat_id,
+        reader_id,
+        after_rank,
+        after_id,
+        limit + 1,
+    )
+    hits = [
+        MessageSearchHit(
+            message=ChatSystem.message_out_from_row(row),
+            rank=row["rank"],
+            headline=row["headline"],
+        )
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = hits[-1]
+        next_cursor = f"{last.rank!r}:{last.message.id}"
+    return MessageSearchOut(hits=hits, next_cursor=next_cursor)
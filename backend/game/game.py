@@ -1,9 +1,11 @@
 import asyncio
 import contextlib
+import copy
 import dataclasses
 import datetime
 import json
 import time
+import weakref
 
 import asyncpg
 
@@ -25,7 +27,14 @@ from game.logic import (
     summarize_action,
     LLMLogEntry,
 )
-from game.chat import ChatSystem
+from game.archive import ARCHIVABLE_STATUSES, rehydrate_game
+from game.chat import (
+    ChatSystem,
+    NewMessage,
+    finalize_drafts_bulk,
+    persist_suggestions,
+    send_messages_bulk,
+)
 from game.inference import (
     CHARACTER_MODEL,
     DM_MODEL,
@@ -38,10 +47,11 @@ from game.inference import (
     extract_tool_call_args,
     extract_tool_calls,
 )
+from game.llm_log import llm_log_writer
 from game.logger import gl_log
 from game.utils import Timer, AsyncReentrantLock, get_conn
 from lstypes.chat import ChatType, ChatInterfaceType
-from game.system import System
+from game.system import Latency, System, SystemLagged
 from lstypes.error import ServiceCode, ServiceError, error
 from lstypes.game import GameStatus, GameOut, StateOut
 from lstypes.player import PlayerOut
@@ -140,11 +150,52 @@ class PendingAction:
     received_at: float = dataclasses.field(default_factory=time.monotonic)
 
 
+@dataclasses.dataclass
+class TurnOutcome:
+    turn: int
+    world: dict
+    summary: str
+    # What each player remembers of the turn, in the order of the actions.
+    narratives: dict[int, str]
+
+
+@dataclasses.dataclass
+class StateFlushStats:
+    game_id: int
+    # Deferred writes asked for with `_schedule_persist`
+    requested: int = 0
+    # Requests folded into a write that was already scheduled
+    coalesced: int = 0
+    # Writes that reached the database, and how many of them were full
+    flushes: int = 0
+    full_writes: int = 0
+    # Flushes that found nothing to write
+    skipped: int = 0
+    failures: int = 0
+    # Writes scheduled again after a deferred write failed
+    retries: int = 0
+    latency: Latency = dataclasses.field(default_factory=Latency)
+
+
 ACTION_BATCH_SECONDS = 1.0
 AUTO_ACTION_INTERVAL = 30.0
 PLAYER_MEMORY_LIMIT = 20
 LLM_MEMORY_CONTEXT = 6
 
+# Narrative streams running at once across all games, per event loop.
+_narrative_slots: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, asyncio.Semaphore
+] = weakref.WeakKeyDictionary()
+
+
+def _narrative_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _narrative_slots.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(config.LLM_NARRATIVE_CONCURRENCY)
+        _narrative_slots[loop] = semaphore
+    return semaphore
+
 CHARACTER_SYSTEM_PROMPT = (
     "Ты — помощник по созданию персонажа для фэнтезийной ролевой игры. "
     "Собери следующие поля: имя (name), концепция (concept), сила (strength, 1-10), "
@@ -216,6 +267,10 @@ DM_QA_SYSTEM_PROMPT = (
 
 
 class GameSystem(System[GameEvent]):
+    @staticmethod
+    def registry_limit() -> int | None:
+        return config.MAX_LOADED_GAMES
+
     @staticmethod
     async def create_new(
         conn: asyncpg.Connection,
@@ -228,7 +283,27 @@ class GameSystem(System[GameEvent]):
         game_name = g.name
         max_players = g.max_players
 
-        room_chat = await ChatSystem.create_or_load(conn, g.id, ChatType.ROOM, None)
+        if status in ARCHIVABLE_STATUSES:
+            await rehydrate_game(conn, g.id)
+
+        # Every chat of the game, with its recent messages, in two queries.
+        player_chat_types = (
+            ChatType.CHARACTER_CREATION,
+            ChatType.GAME,
+            ChatType.ADVICE,
+        )
+        chat_specs = [(ChatType.ROOM, None, ChatInterfaceType.FULL)] + [
+            (chat_type, player.user.id, ChatInterfaceType.FOREIGN)
+            for player in g.players
+            if not player.is_spectator
+            for chat_type in player_chat_types
+        ]
+        room_chat, *loaded = await ChatSystem.create_or_load_many(
+            conn, g.id, chat_specs
+        )
+        preloaded: dict[int, dict[ChatType, ChatSystem]] = {}
+        for (chat_type, owner_id, _), chat in zip(chat_specs[1:], loaded):
+            preloaded.setdefault(owner_id, {})[chat_type] = chat
 
         host_id: int | None = g.host_id
         num_non_spectators = 0
@@ -265,9 +340,19 @@ class GameSystem(System[GameEvent]):
             game_state,
             db_pool=db_pool,
         )
+        # Legacy or partial states are normalized in memory; write them back
+        # in full once, everything after that is patched in place.
+        game_system._state_rewrite = game_state != raw_state
 
         for player in game_system.player_states.values():
-            await game_system.update_chats_for_player(conn, player)
+            await game_system.update_chats_for_player(
+                conn, player, preloaded=preloaded.get(player.user.id)
+            )
+
+        # The game may have been hibernated, or the server restarted, while
+        # it was being played.
+        if status == GameStatus.PLAYING:
+            game_system._start_game_loop()
 
         return game_system
 
@@ -286,7 +371,7 @@ class GameSystem(System[GameEvent]):
         *,
         db_pool: asyncpg.Pool | None = None,
     ):
-        super().__init__(id_)
+        super().__init__(id_, broadcast=config.EVENT_QUEUE_CAPACITY)
         self.status = status
         self.public = public
         self.game_name = game_name
@@ -305,10 +390,25 @@ class GameSystem(System[GameEvent]):
         self.pending_actions: list[PendingAction] = []
         self.action_event = asyncio.Event()
         self.action_lock = asyncio.Lock()
+        self.narrative_tasks: dict[int, asyncio.Task] = {}
+        self.turns_in_flight = 0
+        self.last_active = time.monotonic()
         self._tool_manager: ToolManager | None = None
         self._tool_defs: list[dict[str, object]] = []
         self._tool_names: set[str] = set()
         self._tooling_error: str | None = None
+        # What changed in `state` since the last `_persist_state`.
+        self._dirty_paths: set[tuple[str, ...]] = set()
+        self._state_appends: dict[tuple[str, ...], list] = {}
+        self._state_rewrite = True
+        # Chats whose suggestions changed since the last state write.
+        self._dirty_suggestions: dict[int, ChatSystem] = {}
+        self.state_flushes = StateFlushStats(id_)
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self._last_flush = 0.0
+        # Deferred writes that failed in a row; the next retry backs off.
+        self._flush_errors = 0
         self.add_pipe(
             self.forward_chat_events(self.game_chat, ChatType.ROOM, None),
             name=f"forward_room_chat_game{self.id}",
@@ -320,7 +420,14 @@ class GameSystem(System[GameEvent]):
         player: Player,
         force_stop: bool = False,
         log=gl_log,
+        *,
+        preloaded: dict[ChatType, ChatSystem] | None = None,
     ) -> Player:
+        """
+        Load or stop the chats of a player. Chats in `preloaded` (see
+        `create_new`) are used instead of being loaded one by one.
+        """
+        preloaded = preloaded or {}
         if force_stop or player.is_spectator:
             if player.character_chat is not None:
                 await player.character_chat.stop()
@@ -335,13 +442,8 @@ class GameSystem(System[GameEvent]):
             player.advice_chat = None
         else:
             if player.character_chat is None:
-                player.character_chat = await ChatSystem.create_or_load(
-                    conn,
-                    self.id,
-                    ChatType.CHARACTER_CREATION,
-                    player.user.id,
-                    ChatInterfaceType.FOREIGN,
-                    log=log,
+                player.character_chat = await self._load_player_chat(
+                    conn, player, ChatType.CHARACTER_CREATION, preloaded
                 )
                 self.add_pipe(
                     self.forward_chat_events(
@@ -355,13 +457,8 @@ class GameSystem(System[GameEvent]):
                     conn, player, chat=player.character_chat, log=log
                 )
             if player.player_chat is None:
-                player.player_chat = await ChatSystem.create_or_load(
-                    conn,
-                    self.id,
-                    ChatType.GAME,
-                    player.user.id,
-                    ChatInterfaceType.FOREIGN,
-                    log=log,
+                player.player_chat = await self._load_player_chat(
+                    conn, player, ChatType.GAME, preloaded
                 )
                 self.add_pipe(
                     self.forward_chat_events(
@@ -370,13 +467,8 @@ class GameSystem(System[GameEvent]):
                     name=f"forward_game_chat_game{self.id}_player{player.user.id}",
                 )
             if player.advice_chat is None:
-                player.advice_chat = await ChatSystem.create_or_load(
-                    conn,
-                    self.id,
-                    ChatType.ADVICE,
-                    player.user.id,
-                    ChatInterfaceType.FOREIGN,
-                    log=log,
+                player.advice_chat = await self._load_player_chat(
+                    conn, player, ChatType.ADVICE, preloaded
                 )
                 self.add_pipe(
                     self.forward_chat_events(
@@ -386,11 +478,34 @@ class GameSystem(System[GameEvent]):
                 )
         return player
 
+    async def _load_player_chat(
+        self,
+        conn: asyncpg.Connection,
+        player: Player,
+        chat_type: ChatType,
+        preloaded: dict[ChatType, ChatSystem],
+    ) -> ChatSystem:
+        chat = preloaded.get(chat_type)
+        if chat is None:
+            chat = await ChatSystem.create_or_load(
+                conn,
+                self.id,
+                chat_type,
+                player.user.id,
+                ChatInterfaceType.FOREIGN,
+            )
+        return chat
+
     async def stop(self):
         if self.game_loop_task is not None:
             self.game_loop_task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await self.game_loop_task
+        # The final write below replaces a scheduled one or a retry.
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._flush_pending_state()
         await self.game_chat.stop()
         for player in self.player_states.values():
             if player.character_chat is not None:
@@ -401,14 +516,60 @@ class GameSystem(System[GameEvent]):
                 await player.advice_chat.stop()
         await super().stop()
 
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def is_idle(self, idle_seconds: float) -> bool:
+        """
+        Whether the game can be hibernated: nobody used it for `idle_seconds`,
+        no turn is in flight, and it is either over or has no joined players.
+        """
+        if time.monotonic() - self.last_active < idle_seconds:
+            return False
+        if (
+            self.turns_in_flight
+            or self.lock.locked()
+            or self.action_lock.locked()
+            or self.pending_actions
+            or self.narrative_tasks
+        ):
+            return False
+        if self.status in ARCHIVABLE_STATUSES:
+            return True
+        return not any(
+            player.is_joined or player.kick_task is not None
+            for player in self.player_states.values()
+        )
+
     async def forward_chat_events(
         self,
         chat_: ChatSystem,
         chat_type: ChatType,
         owner_id: int | None,
     ):
+        """
+        Re-emit the events of one chat of the game as `GameChatEvent`s.
+
+        This is the one hop left between a chat and the game's subscribers,
+        and it is kept on purpose. The chat's own queue coalesces edits of
+        the same message, which a shared broadcast buffer would not. The
+        hop also adds the chat id and owner that WebSocket clients are
+        filtered by, and it is where player messages are handed to the
+        character creation and advice handlers. Listeners of the game
+        read one broadcast buffer instead of subscribing to every chat and
+        following players as they join.
+        """
         async for event in chat_.listen():
-            self.emit(
+            if isinstance(event, SystemLagged):
+                await gl_log.awarning(
+                    "Game lagged behind chat events",
+                    game_id=self.id,
+                    chat_id=chat_.id,
+                    missed=event.missed,
+                )
+                continue
+
+            await self.emit_wait(
                 GameChatEvent(
                     game_id=self.id,
                     chat_id=chat_.id,
@@ -601,6 +762,7 @@ class GameSystem(System[GameEvent]):
 
                 await log.ainfo("Player removed from the game")
                 self.player_states.pop(player_id)
+                self.cancel_narrative(player_id)
                 self.num_non_spectators -= 1
                 await self.update_chats_for_player(
                     conn, player, force_stop=True, log=log
@@ -955,15 +1117,18 @@ class GameSystem(System[GameEvent]):
 
             await log.ainfo("Game started")
 
-            self.state = ensure_game_state(self.state)
+            self._normalize_state()
             await self._announce_game_start(conn)
 
-            self.game_loop_task = asyncio.create_task(
-                self.game_loop(), name=f"game_loop_game{self.id}"
-            )
+            self._start_game_loop()
 
             return None
 
+    def _start_game_loop(self):
+        self.game_loop_task = asyncio.create_task(
+            self.game_loop(), name=f"game_loop_game{self.id}"
+        )
+
     async def terminate(
         self,
         conn: asyncpg.Connection,
@@ -1109,10 +1274,6 @@ class GameSystem(System[GameEvent]):
                     return ac
                 advice_chats.append(ac)
 
-        llm_logs = []
-        if requester_id == self.host_id:
-            llm_logs = self.state.get("llm_logs", [])
-
         return StateOut(
             game=game,
             status=self.status,
@@ -1120,7 +1281,6 @@ class GameSystem(System[GameEvent]):
             game_chat=game_chat,
             player_chats=player_chats,
             advice_chats=advice_chats,
-            llm_logs=llm_logs,
         )
 
     async def send_message(
@@ -1155,9 +1315,26 @@ class GameSystem(System[GameEvent]):
             return result
         return None
 
+    def _normalize_state(self):
+        state = ensure_game_state(self.state)
+        if state != self.state:
+            self.state = state
+            self._state_rewrite = True
+
+    def _mark_dirty(self, *path: str):
+        self._dirty_paths.add(path)
+        self._state_appends.pop(path, None)
+
+    def _append_to_state(self, key: str, item):
+        self.state.setdefault(key, []).append(item)
+        if (key,) not in self._dirty_paths:
+            self._state_appends.setdefault((key,), []).append(item)
+
     def _ensure_player_state(self, player_id: int):
         players = self.state.setdefault("players", {})
-        players.setdefault(str(player_id), {"memory": []})
+        if str(player_id) not in players:
+            players[str(player_id)] = {"memory": []}
+            self._mark_dirty("players", str(player_id))
 
     def _get_character(self, player_id: int) -> CharacterProfile | None:
         data = self.state.get("characters", {}).get(str(player_id))
@@ -1167,6 +1344,7 @@ class GameSystem(System[GameEvent]):
 
     def _set_character(self, player_id: int, profile: CharacterProfile):
         self.state.setdefault("characters", {})[str(player_id)] = profile.to_dict()
+        self._mark_dirty("characters", str(player_id))
         self._ensure_player_state(player_id)
 
     def _remember_for_player(self, player_id: int, text: str):
@@ -1175,6 +1353,7 @@ class GameSystem(System[GameEvent]):
         memory.append(text)
         if len(memory) > PLAYER_MEMORY_LIMIT:
             del memory[:-PLAYER_MEMORY_LIMIT]
+        self._mark_dirty("players", str(player_id))
 
     def _llm_enabled(self) -> bool:
         return config.LLM_ENABLED
@@ -1285,17 +1464,14 @@ class GameSystem(System[GameEvent]):
         self,
         tool_name: str,
         llm_params: dict[str, object],
+        world_state: dict,
     ) -> dict[str, object]:
+        """Run a Lua tool against `world_state`, updating it in place."""
         tooling = self._get_tooling()
         if tooling is None:
             return {"error": "Tooling is not configured"}
         manager, _, _ = tooling
 
-        world_state = self.state.get("world")
-        if not isinstance(world_state, dict):
-            world_state = {}
-            self.state["world"] = world_state
-
         try:
             new_world_state, output = await manager.run_tool(
                 tool_name=tool_name,
@@ -1308,7 +1484,6 @@ class GameSystem(System[GameEvent]):
 
         if isinstance(new_world_state, dict):
             world_state.update(new_world_state)
-            self.state["world"] = world_state
         else:
             new_world_state = world_state
 
@@ -1354,7 +1529,6 @@ class GameSystem(System[GameEvent]):
         turn: int | None = None,
         error_text: str | None = None,
     ):
-        logs = self.state.setdefault("llm_logs", [])
         entry = LLMLogEntry(
             scope=scope,
             model=model,
@@ -1364,10 +1538,7 @@ class GameSystem(System[GameEvent]):
             turn=turn if turn is not None else int(self.state.get("turn", 0)),
             error=error_text,
         )
-        logs.append(entry.to_dict())
-        limit = max(0, config.LLM_LOG_LIMIT)
-        if limit and len(logs) > limit:
-            del logs[:-limit]
+        llm_log_writer.append(self.id, entry)
 
     def _format_player_memory(self, player_id: int) -> str:
         self._ensure_player_state(player_id)
@@ -1400,11 +1571,176 @@ class GameSystem(System[GameEvent]):
             return CHARACTER_QUESTIONS[5].suggestions
         return ["Удиви меня", "Не уверен", "Дай подумать"]
 
-    async def _persist_state(self, conn: asyncpg.Connection):
-        await conn.execute(
-            "UPDATE games SET state = $2 WHERE id = $1", self.id, self.state
+    async def _set_suggestions(self, chat: ChatSystem, suggestions: list[str]):
+        """
+        Show new suggestions right away, and store them with the next
+        coalesced state write rather than on every step of a dialogue.
+        """
+        if await chat.set_suggestions(suggestions):
+            self._dirty_suggestions[chat.id] = chat
+            self._schedule_persist()
+
+    def _schedule_persist(self):
+        """
+        Ask for the state to be written soon. Writes are coalesced: at most
+        one per GAME_STATE_FLUSH_INTERVAL_SECONDS, on a connection of the
+        game's own pool. Durability points (the end of a turn, `stop`) call
+        `_persist_state` directly instead.
+        """
+        self.state_flushes.requested += 1
+        if self.db_pool is None:
+            return
+        if self._flush_task is not None and not self._flush_task.done():
+            self.state_flushes.coalesced += 1
+            return
+        self._flush_task = asyncio.create_task(
+            self._flush_state_later(), name=f"state_flush_game{self.id}"
+        )
+
+    async def _flush_state_later(self, delay: float | None = None):
+        if delay is None:
+            delay = (
+                self._last_flush
+                + config.GAME_STATE_FLUSH_INTERVAL_SECONDS
+                - time.monotonic()
+            )
+        await asyncio.sleep(max(0.0, delay))
+        # Changes made while this write runs need a write of their own.
+        self._flush_task = None
+        if not await self._persist_state_pooled():
+            self._retry_persist()
+
+    def _retry_persist(self):
+        """
+        Schedule the write again after it failed. The changes it was to
+        write are still marked dirty. The delay doubles with every failure
+        in a row, up to GAME_STATE_FLUSH_MAX_BACKOFF_SECONDS.
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        delay = min(
+            config.GAME_STATE_FLUSH_INTERVAL_SECONDS * 2 ** (self._flush_errors - 1),
+            config.GAME_STATE_FLUSH_MAX_BACKOFF_SECONDS,
+        )
+        self.state_flushes.retries += 1
+        self._flush_task = asyncio.create_task(
+            self._flush_state_later(delay), name=f"state_flush_game{self.id}"
         )
 
+    async def _flush_pending_state(self):
+        if self.db_pool is not None and (
+            self._state_rewrite
+            or self._dirty_paths
+            or self._state_appends
+            or self._dirty_suggestions
+        ):
+            await self._persist_state_pooled()
+
+    async def _persist_state_pooled(self) -> bool:
+        """Write the state on a connection of the pool. Returns success."""
+        acquired = False
+        try:
+            async with self.db_pool.acquire() as conn:
+                acquired = True
+                await self._persist_state(conn)
+        except (asyncpg.PostgresError, OSError) as e:
+            # `_persist_state` counts the failures of the write itself.
+            if not acquired:
+                self.state_flushes.failures += 1
+            self._flush_errors += 1
+            await gl_log.aerror("Failed to persist game state: %s", e, game_id=self.id)
+            return False
+        self._flush_errors = 0
+        return True
+
+    def state_flush_stats(self) -> StateFlushStats:
+        return dataclasses.replace(
+            self.state_flushes, latency=dataclasses.replace(self.state_flushes.latency)
+        )
+
+    async def _persist_state(self, conn: asyncpg.Connection):
+        # A scheduled write would have nothing left to do.
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        stats = self.state_flushes
+        # Writes of the same game must not overtake each other.
+        async with self._flush_lock:
+            self._last_flush = time.monotonic()
+            try:
+                written = await self._write_state_changes(conn)
+                await self._write_suggestion_changes(conn)
+            except Exception:
+                stats.failures += 1
+                raise
+            if written is None:
+                stats.skipped += 1
+                return
+            stats.flushes += 1
+            if written == "full":
+                stats.full_writes += 1
+            stats.latency.observe(time.monotonic() - self._last_flush)
+
+    async def _write_suggestion_changes(self, conn: asyncpg.Connection):
+        chats, self._dirty_suggestions = self._dirty_suggestions, {}
+        try:
+            await persist_suggestions(conn, list(chats.values()))
+        except BaseException:
+            self._dirty_suggestions = chats | self._dirty_suggestions
+            raise
+
+    async def _write_state_changes(self, conn: asyncpg.Connection) -> str | None:
+        """
+        Write the changes made to `state` since the last call. Changed
+        sub-trees are replaced with `jsonb_set` and appends to lists are
+        concatenated, so a turn writes what it changed rather than the whole
+        history. The full state is only written after it was replaced or when
+        the stored state is missing a parent of a changed path.
+        """
+        rewrite, self._state_rewrite = self._state_rewrite, False
+        dirty, self._dirty_paths = self._dirty_paths, set()
+        appends, self._state_appends = self._state_appends, {}
+        try:
+            if not rewrite and (dirty or appends):
+                expr = "state"
+                args: list = [self.id]
+                for path in sorted(dirty):
+                    args += [list(path), self._state_at(path)]
+                    n = len(args)
+                    expr = f"jsonb_set({expr}, ${n - 1}::text[], ${n}::jsonb)"
+                for path, items in appends.items():
+                    args += [list(path), items]
+                    n = len(args)
+                    expr = (
+                        f"jsonb_set({expr}, ${n - 1}::text[], "
+                        f"COALESCE(state #> ${n - 1}::text[], '[]'::jsonb) || ${n}::jsonb)"
+                    )
+                parents = sorted({path[0] for path in dirty if len(path) > 1})
+                args.append(parents)
+                result = await conn.execute(
+                    f"UPDATE games SET state = {expr} "
+                    f"WHERE id = $1 AND state ?& ${len(args)}::text[]",
+                    *args,
+                )
+                rewrite = result == "UPDATE 0"
+                if not rewrite:
+                    return "patch"
+            if rewrite:
+                await conn.execute(
+                    "UPDATE games SET state = $2 WHERE id = $1", self.id, self.state
+                )
+                return "full"
+            return None
+        except BaseException:
+            self._state_rewrite = True
+            raise
+
+    def _state_at(self, path: tuple[str, ...]):
+        value = self.state
+        for key in path:
+            value = value[key]
+        return value
+
     async def _require_character_on_ready(
         self,
         conn: asyncpg.Connection,
@@ -1451,7 +1787,7 @@ class GameSystem(System[GameEvent]):
             session = CharacterCreationSession(use_llm=self._llm_enabled())
             self.character_sessions[player.user.id] = session
 
-        if session.completed or chat.index.index:
+        if session.completed or chat.index:
             return
 
         if session.use_llm and self._llm_enabled():
@@ -1460,11 +1796,9 @@ class GameSystem(System[GameEvent]):
                     {"role": "system", "content": CHARACTER_SYSTEM_PROMPT},
                     {"role": "assistant", "content": CHARACTER_OPENING_PROMPT},
                 ]
-                await chat.clear_suggestions()
-                for suggestion in self._character_suggestions_from_text(
-                    CHARACTER_OPENING_PROMPT
-                ):
-                    await chat.add_suggestion(suggestion)
+                await self._set_suggestions(
+                    chat, self._character_suggestions_from_text(CHARACTER_OPENING_PROMPT)
+                )
                 await chat.send_message(
                     conn,
                     MessageKind.CHARACTER_CREATION,
@@ -1475,9 +1809,7 @@ class GameSystem(System[GameEvent]):
             return
 
         question = CHARACTER_QUESTIONS[session.step]
-        await chat.clear_suggestions()
-        for suggestion in question.suggestions:
-            await chat.add_suggestion(suggestion)
+        await self._set_suggestions(chat, question.suggestions)
         await chat.send_message(
             conn,
             MessageKind.CHARACTER_CREATION,
@@ -1509,7 +1841,6 @@ class GameSystem(System[GameEvent]):
                     session = CharacterCreationSession(use_llm=self._llm_enabled())
                     self.character_sessions[player_id] = session
                     if restart_requested:
-                        await chat.clear_suggestions()
                         if session.use_llm and self._llm_enabled():
                             session.messages = [
                                 {"role": "system", "content": CHARACTER_SYSTEM_PROMPT},
@@ -1518,10 +1849,12 @@ class GameSystem(System[GameEvent]):
                                     "content": CHARACTER_OPENING_PROMPT,
                                 },
                             ]
-                            for suggestion in self._character_suggestions_from_text(
-                                CHARACTER_OPENING_PROMPT
-                            ):
-                                await chat.add_suggestion(suggestion)
+                            await self._set_suggestions(
+                                chat,
+                                self._character_suggestions_from_text(
+                                    CHARACTER_OPENING_PROMPT
+                                ),
+                            )
                             await chat.send_message(
                                 conn,
                                 MessageKind.CHARACTER_CREATION,
@@ -1530,8 +1863,7 @@ class GameSystem(System[GameEvent]):
                             )
                         else:
                             question = CHARACTER_QUESTIONS[session.step]
-                            for suggestion in question.suggestions:
-                                await chat.add_suggestion(suggestion)
+                            await self._set_suggestions(chat, question.suggestions)
                             await chat.send_message(
                                 conn,
                                 MessageKind.CHARACTER_CREATION,
@@ -1565,8 +1897,8 @@ class GameSystem(System[GameEvent]):
 
                 if result.character is not None:
                     self._set_character(player_id, result.character)
-                    await self._persist_state(conn)
-                    await chat.clear_suggestions()
+                    self._schedule_persist()
+                    await self._set_suggestions(chat, [])
                     await chat.send_message(
                         conn,
                         MessageKind.CHARACTER_CREATION,
@@ -1577,9 +1909,7 @@ class GameSystem(System[GameEvent]):
                     return
 
                 if result.next_question is not None:
-                    await chat.clear_suggestions()
-                    for suggestion in result.next_question.suggestions:
-                        await chat.add_suggestion(suggestion)
+                    await self._set_suggestions(chat, result.next_question.suggestions)
                     await chat.send_message(
                         conn,
                         MessageKind.CHARACTER_CREATION,
@@ -1625,152 +1955,160 @@ class GameSystem(System[GameEvent]):
         else:
             session.messages.append({"role": "user", "content": message.strip()})
 
-        placeholder = await chat.send_message(
+        placeholder = await chat.start_draft(
             conn,
             MessageKind.CHARACTER_CREATION,
             "...",
             sender_id=None,
         )
 
-        full_content = ""
-        tool_calls_list = []
-
         try:
-            stream = await create_chat_completion_stream(
-                model=CHARACTER_MODEL,
-                messages=session.messages,
-                tools=[CHARACTER_PROFILE_TOOL],
-                tool_choice="auto",
-                temperature=0.4,
-            )
+            full_content = ""
+            tool_calls_list = []
 
-            last_update = time.monotonic()
+            try:
+                stream = await create_chat_completion_stream(
+                    model=CHARACTER_MODEL,
+                    messages=session.messages,
+                    tools=[CHARACTER_PROFILE_TOOL],
+                    tool_choice="auto",
+                    temperature=0.4,
+                )
 
-            async for chunk in stream:
-                if not chunk.choices:
-                    continue
+                last_update = time.monotonic()
 
-                delta = chunk.choices[0].delta
-                if delta.content:
-                    full_content += delta.content
-                    if time.monotonic() - last_update > 0.3:
-                        await chat.edit_message(conn, placeholder.msg.id, full_content)
-                        last_update = time.monotonic()
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
 
-                if delta.tool_calls:
-                    for tc in delta.tool_calls:
-                        index = tc.index
-                        while len(tool_calls_list) <= index:
-                            tool_calls_list.append(
-                                {
-                                    "id": "",
-                                    "function": {"name": "", "arguments": ""},
-                                    "type": "function",
-                                }
-                            )
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        full_content += delta.content
+                        if time.monotonic() - last_update > 0.3:
+                            await chat.edit_message(conn, placeholder.msg.id, full_content)
+                            last_update = time.monotonic()
 
-                        if tc.id:
-                            tool_calls_list[index]["id"] = tc.id
-                        if tc.function:
-                            if tc.function.name:
-                                tool_calls_list[index]["function"][
-                                    "name"
-                                ] += tc.function.name
-                            if tc.function.arguments:
-                                tool_calls_list[index]["function"][
-                                    "arguments"
-                                ] += tc.function.arguments
+                    if delta.tool_calls:
+                        for tc in delta.tool_calls:
+                            index = tc.index
+                            while len(tool_calls_list) <= index:
+                                tool_calls_list.append(
+                                    {
+                                        "id": "",
+                                        "function": {"name": "", "arguments": ""},
+                                        "type": "function",
+                                    }
+                                )
 
-            if full_content:
-                await chat.edit_message(conn, placeholder.msg.id, full_content)
+                            if tc.id:
+                                tool_calls_list[index]["id"] = tc.id
+                            if tc.function:
+                                if tc.function.name:
+                                    tool_calls_list[index]["function"][
+                                        "name"
+                                    ] += tc.function.name
+                                if tc.function.arguments:
+                                    tool_calls_list[index]["function"][
+                                        "arguments"
+                                    ] += tc.function.arguments
+
+                if full_content:
+                    await chat.edit_message(conn, placeholder.msg.id, full_content)
+
+            except Exception as exc:
+                await chat.delete_message(conn, placeholder.msg.id)
+                self._append_llm_log(
+                    scope="character_creation",
+                    model=CHARACTER_MODEL,
+                    prompt=list(session.messages),
+                    response=None,
+                    player_id=player.user.id,
+                    error_text=str(exc),
+                )
+                self._schedule_persist()
+                session.use_llm = False
+                session.messages = []
+                return False
+
+            tool_args = None
+            for tc in tool_calls_list:
+                if tc["function"]["name"] == "submit_character_profile":
+                    try:
+                        tool_args = json.loads(tc["function"]["arguments"])
+                    except:
+                        pass
+                    break
+
+            response_text = full_content.strip() or None
 
-        except Exception as exc:
-            await chat.delete_message(conn, placeholder.msg.id)
             self._append_llm_log(
                 scope="character_creation",
                 model=CHARACTER_MODEL,
                 prompt=list(session.messages),
-                response=None,
+                response=tool_args or response_text,
                 player_id=player.user.id,
-                error_text=str(exc),
             )
-            await self._persist_state(conn)
-            session.use_llm = False
-            session.messages = []
-            return False
-
-        tool_args = None
-        for tc in tool_calls_list:
-            if tc["function"]["name"] == "submit_character_profile":
-                try:
-                    tool_args = json.loads(tc["function"]["arguments"])
-                except:
-                    pass
-                break
-
-        response_text = full_content.strip() or None
 
-        self._append_llm_log(
-            scope="character_creation",
-            model=CHARACTER_MODEL,
-            prompt=list(session.messages),
-            response=tool_args or response_text,
-            player_id=player.user.id,
-        )
+            if tool_args:
 
-        if tool_args:
+                def _safe_int(value: object, fallback: int) -> int:
+                    try:
+                        return int(value)
+                    except (TypeError, ValueError):
+                        return fallback
+
+                profile = CharacterProfile(
+                    name=str(tool_args.get("name") or player.user.name or "Безымянный"),
+                    concept=str(tool_args.get("concept") or "Странник"),
+                    strength=max(1, min(10, _safe_int(tool_args.get("strength"), 5))),
+                    dexterity=max(1, min(10, _safe_int(tool_args.get("dexterity"), 5))),
+                    intelligence=max(
+                        1, min(10, _safe_int(tool_args.get("intelligence"), 5))
+                    ),
+                    lore=str(tool_args.get("lore") or "История, которая еще не написана."),
+                )
+                session.completed = True
+                self.character_sessions[player.user.id] = session
+                self._set_character(player.user.id, profile)
+                self._schedule_persist()
+                await self._set_suggestions(chat, [])
+
+                if response_text:
+                    await chat.finalize_draft(conn, placeholder.msg.id)
+                else:
+                    await chat.delete_message(conn, placeholder.msg.id)
 
-            def _safe_int(value: object, fallback: int) -> int:
-                try:
-                    return int(value)
-                except (TypeError, ValueError):
-                    return fallback
-
-            profile = CharacterProfile(
-                name=str(tool_args.get("name") or player.user.name or "Безымянный"),
-                concept=str(tool_args.get("concept") or "Странник"),
-                strength=max(1, min(10, _safe_int(tool_args.get("strength"), 5))),
-                dexterity=max(1, min(10, _safe_int(tool_args.get("dexterity"), 5))),
-                intelligence=max(
-                    1, min(10, _safe_int(tool_args.get("intelligence"), 5))
-                ),
-                lore=str(tool_args.get("lore") or "История, которая еще не написана."),
-            )
-            session.completed = True
-            self.character_sessions[player.user.id] = session
-            self._set_character(player.user.id, profile)
-            await self._persist_state(conn)
-            await chat.clear_suggestions()
+                await chat.send_message(
+                    conn,
+                    MessageKind.CHARACTER_CREATION,
+                    "Персонаж создан. Теперь вы можете отметить готовность.",
+                    sender_id=None,
+                    metadata={"character": profile.to_dict()},
+                )
+                return True
 
-            if not response_text:
-                await chat.delete_message(conn, placeholder.msg.id)
+            if response_text:
+                await chat.finalize_draft(conn, placeholder.msg.id)
+                session.messages.append({"role": "assistant", "content": response_text})
+                await self._set_suggestions(
+                    chat, self._character_suggestions_from_text(response_text)
+                )
+                self._schedule_persist()
+                return True
 
-            await chat.send_message(
-                conn,
-                MessageKind.CHARACTER_CREATION,
-                "Персонаж создан. Теперь вы можете отметить готовность.",
-                sender_id=None,
-                metadata={"character": profile.to_dict()},
+            fallback = "Расскажи мне больше о своем персонаже."
+            session.messages.append({"role": "assistant", "content": fallback})
+            await self._set_suggestions(
+                chat, self._character_suggestions_from_text(fallback)
             )
-            return True
 
-        if response_text:
-            session.messages.append({"role": "assistant", "content": response_text})
-            await chat.clear_suggestions()
-            for suggestion in self._character_suggestions_from_text(response_text):
-                await chat.add_suggestion(suggestion)
-            await self._persist_state(conn)
+            await chat.edit_message(conn, placeholder.msg.id, fallback)
+            await chat.finalize_draft(conn, placeholder.msg.id)
+            self._schedule_persist()
             return True
-
-        fallback = "Расскажи мне больше о своем персонаже."
-        session.messages.append({"role": "assistant", "content": fallback})
-        await chat.clear_suggestions()
-        for suggestion in self._character_suggestions_from_text(fallback):
-            await chat.add_suggestion(suggestion)
-        
-        await chat.edit_message(conn, placeholder.msg.id, fallback)
-        await self._persist_state(conn)
-        return True
+        finally:
+            # Cancelled or failed half way: the placeholder must not linger.
+            await self._discard_drafts(conn, [(chat, placeholder.msg.id)])
 
     async def _load_llm_history(
         self, conn: asyncpg.Connection, chat: ChatSystem, limit: int = 20
@@ -1780,9 +2118,11 @@ class GameSystem(System[GameEvent]):
         if isinstance(segment, ServiceError):
             return history
 
+        llm_messages = await chat.get_llm_messages(
+            conn, [msg.id for msg in segment.messages]
+        )
         for msg in segment.messages:
-            if msg.metadata and "llm_message" in msg.metadata:
-                llm_msg = msg.metadata["llm_message"]
+            if (llm_msg := llm_messages.get(msg.id)) is not None:
                 if llm_msg.get("role") in ("user", "assistant", "tool"):
                     history.append(llm_msg)
             else:
@@ -1838,7 +2178,7 @@ class GameSystem(System[GameEvent]):
             full_history.append({"role": "user", "content": message})
             messages.append({"role": "user", "content": message})
 
-            placeholder = await chat.send_message(
+            placeholder = await chat.start_draft(
                 conn,
                 MessageKind.GENERAL_INFO,
                 "...",
@@ -1847,144 +2187,144 @@ class GameSystem(System[GameEvent]):
             if isinstance(placeholder, ServiceError):
                 return
 
-            full_content = ""
-            tool_calls_list = []
-
             try:
-                stream = await create_chat_completion_stream(
-                    model=PLAYER_MODEL,
-                    messages=full_history,
-                    tools=[ADVICE_ASK_DM_TOOL],
-                    tool_choice="auto",
-                    temperature=0.7,
-                )
+                full_content = ""
+                tool_calls_list = []
+                llm_message = None
 
-                last_update = time.monotonic()
-
-                async for chunk in stream:
-                    if not chunk.choices:
-                        continue
-                    delta = chunk.choices[0].delta
-                    if delta.content:
-                        full_content += delta.content
-                        if time.monotonic() - last_update > 0.3:
-                            await chat.edit_message(
-                                conn, placeholder.msg.id, full_content
-                            )
-                            last_update = time.monotonic()
+                try:
+                    stream = await create_chat_completion_stream(
+                        model=PLAYER_MODEL,
+                        messages=full_history,
+                        tools=[ADVICE_ASK_DM_TOOL],
+                        tool_choice="auto",
+                        temperature=0.7,
+                    )
 
-                    if delta.tool_calls:
-                        for tc in delta.tool_calls:
-                            index = tc.index
-                            while len(tool_calls_list) <= index:
-                                tool_calls_list.append(
-                                    {
-                                        "id": "",
-                                        "function": {"name": "", "arguments": ""},
-                                        "type": "function",
-                                    }
+                    last_update = time.monotonic()
+
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        if delta.content:
+                            full_content += delta.content
+                            if time.monotonic() - last_update > 0.3:
+                                await chat.edit_message(
+                                    conn, placeholder.msg.id, full_content
+                                )
+                                last_update = time.monotonic()
+
+                        if delta.tool_calls:
+                            for tc in delta.tool_calls:
+                                index = tc.index
+                                while len(tool_calls_list) <= index:
+                                    tool_calls_list.append(
+                                        {
+                                            "id": "",
+                                            "function": {"name": "", "arguments": ""},
+                                            "type": "function",
+                                        }
+                                    )
+
+                                if tc.id:
+                                    tool_calls_list[index]["id"] = tc.id
+                                if tc.function:
+                                    if tc.function.name:
+                                        tool_calls_list[index]["function"][
+                                            "name"
+                                        ] += tc.function.name
+                                    if tc.function.arguments:
+                                        tool_calls_list[index]["function"][
+                                            "arguments"
+                                        ] += tc.function.arguments
+
+                    assistant_msg = self._tool_call_message(tool_calls_list, full_content)
+                    if full_content or tool_calls_list:
+                        messages.append(assistant_msg)
+
+                    llm_message = assistant_msg
+                    await chat.edit_message(conn, placeholder.msg.id, full_content)
+
+                    # Handle tool calls
+                    for tc in tool_calls_list:
+                        if tc["function"]["name"] == "ask_dm":
+                            args = {}
+                            try:
+                                args = json.loads(tc["function"]["arguments"])
+                            except:
+                                pass
+
+                            question = args.get("question")
+                            if question:
+                                dm_answer = await self._ask_dm(question)
+                                tool_msg = {
+                                    "role": "tool",
+                                    "tool_call_id": tc["id"],
+                                    "content": dm_answer,
+                                }
+                                messages.append(tool_msg)
+                                full_history.append(assistant_msg)
+                                full_history.append(tool_msg)
+
+                                # Second pass to generate final answer
+                                stream2 = await create_chat_completion_stream(
+                                    model=PLAYER_MODEL,
+                                    messages=full_history,
+                                    temperature=0.7,
                                 )
-
-                            if tc.id:
-                                tool_calls_list[index]["id"] = tc.id
-                            if tc.function:
-                                if tc.function.name:
-                                    tool_calls_list[index]["function"][
-                                        "name"
-                                    ] += tc.function.name
-                                if tc.function.arguments:
-                                    tool_calls_list[index]["function"][
-                                        "arguments"
-                                    ] += tc.function.arguments
-
-                assistant_msg = self._tool_call_message(tool_calls_list, full_content)
-                if full_content or tool_calls_list:
-                    messages.append(assistant_msg)
-
-                await chat.edit_message(
-                    conn,
-                    placeholder.msg.id,
-                    full_content,
-                    metadata={"llm_message": assistant_msg},
-                )
-
-                # Handle tool calls
-                for tc in tool_calls_list:
-                    if tc["function"]["name"] == "ask_dm":
-                        args = {}
-                        try:
-                            args = json.loads(tc["function"]["arguments"])
-                        except:
-                            pass
-
-                        question = args.get("question")
-                        if question:
-                            dm_answer = await self._ask_dm(question)
-                            tool_msg = {
-                                "role": "tool",
-                                "tool_call_id": tc["id"],
-                                "content": dm_answer,
-                            }
-                            messages.append(tool_msg)
-                            full_history.append(assistant_msg)
-                            full_history.append(tool_msg)
-
-                            # Second pass to generate final answer
-                            stream2 = await create_chat_completion_stream(
-                                model=PLAYER_MODEL,
-                                messages=full_history,
-                                temperature=0.7,
-                            )
                             
-                            final_content = ""
-                            async for chunk in stream2:
-                                if not chunk.choices:
-                                    continue
-                                delta = chunk.choices[0].delta
-                                if delta.content:
-                                    final_content += delta.content
-                                    if time.monotonic() - last_update > 0.3:
-                                        await chat.edit_message(
-                                            conn, placeholder.msg.id, final_content
-                                        )
-                                        last_update = time.monotonic()
+                                final_content = ""
+                                async for chunk in stream2:
+                                    if not chunk.choices:
+                                        continue
+                                    delta = chunk.choices[0].delta
+                                    if delta.content:
+                                        final_content += delta.content
+                                        if time.monotonic() - last_update > 0.3:
+                                            await chat.edit_message(
+                                                conn, placeholder.msg.id, final_content
+                                            )
+                                            last_update = time.monotonic()
                             
-                            full_content = final_content
-                            assistant_msg2 = {"role": "assistant", "content": full_content}
-                            messages.append(assistant_msg2)
-                            await chat.edit_message(
-                                conn,
-                                placeholder.msg.id,
-                                full_content,
-                                metadata={"llm_message": assistant_msg2},
-                            )
-                            break  # Only one tool call supported for now
+                                full_content = final_content
+                                assistant_msg2 = {"role": "assistant", "content": full_content}
+                                messages.append(assistant_msg2)
+                                llm_message = assistant_msg2
+                                await chat.edit_message(
+                                    conn, placeholder.msg.id, full_content
+                                )
+                                break  # Only one tool call supported for now
+
+                except Exception as exc:
+                    await chat.delete_message(conn, placeholder.msg.id)
+                    self._append_llm_log(
+                        scope="advice",
+                        model=PLAYER_MODEL,
+                        prompt=full_history,
+                        response=None,
+                        player_id=player_id,
+                        error_text=str(exc),
+                    )
+                    return
 
-            except Exception as exc:
-                await chat.delete_message(conn, placeholder.msg.id)
+                await chat.finalize_draft(
+                    conn, placeholder.msg.id, llm_message=llm_message
+                )
                 self._append_llm_log(
                     scope="advice",
                     model=PLAYER_MODEL,
                     prompt=full_history,
-                    response=None,
+                    response=full_content,
                     player_id=player_id,
-                    error_text=str(exc),
                 )
-                return
 
-            self._append_llm_log(
-                scope="advice",
-                model=PLAYER_MODEL,
-                prompt=full_history,
-                response=full_content,
-                player_id=player_id,
-            )
-
-            # Update suggestions based on final content
-            suggestions = suggest_actions(self.state, character)
-            await chat.clear_suggestions()
-            for suggestion in suggestions:
-                await chat.add_suggestion(suggestion)
+                # Update suggestions based on final content
+                suggestions = suggest_actions(self.state, character)
+                await self._set_suggestions(chat, suggestions)
+            finally:
+                # Cancelled or failed half way: the placeholder must not linger.
+                await self._discard_drafts(conn, [(chat, placeholder.msg.id)])
 
     async def _ask_dm(self, question: str) -> str:
         world = self.state.get("world", {})
@@ -2063,11 +2403,33 @@ class GameSystem(System[GameEvent]):
         conn: asyncpg.Connection,
         actions: list[PendingAction],
     ):
+        # Counted for the whole turn: the lock is released while the models
+        # think, so it does not tell whether a turn is in flight.
+        self.turns_in_flight += 1
+        try:
+            await self._resolve_turn(conn, actions)
+        finally:
+            self.turns_in_flight -= 1
+
+    async def _resolve_turn(
+        self,
+        conn: asyncpg.Connection,
+        actions: list[PendingAction],
+    ):
+        """
+        Resolve a turn in three steps, so that joins, leaves and readiness
+        are not blocked while the models think:
+
+        1. under the lock, snapshot what the turn reads (actions, world);
+        2. without the lock, talk to the models and run tools on the copy;
+        3. under the lock again, apply the outcome, unless the game was
+           stopped or another turn was committed in the meantime.
+        """
         if not actions:
             return
 
         async with self.lock:
-            self.state = ensure_game_state(self.state)
+            self._normalize_state()
             inputs: list[PlayerAction] = []
             for action in actions:
                 player = self.player_states.get(action.player_id)
@@ -2091,88 +2453,129 @@ class GameSystem(System[GameEvent]):
                 return
 
             summaries = [summarize_action(action, self.state) for action in inputs]
+            base_turn = int(self.state.get("turn", 0))
+            world = copy.deepcopy(self.state.get("world", {}))
+
+        # Chat drafts streamed for the turn. They are written when it is
+        # committed; whatever is left of them afterwards is dropped, be the
+        # turn stale, failed or cancelled.
+        drafts: list[tuple[ChatSystem, int]] = []
+        try:
+            outcome = None
             if self._llm_enabled():
-                resolved = await self._resolve_actions_with_llm(
+                outcome = await self._resolve_actions_with_llm(
                     conn,
                     inputs,
                     summaries,
+                    world=world,
+                    turn=base_turn + 1,
+                    drafts=drafts,
+                )
+            if outcome is None:
+                outcome = self._resolve_actions_mechanically(
+                    summaries, world, turn=base_turn + 1
                 )
-                if resolved:
-                    return
-            resolution = resolve_turn(summaries, self.state)
-            self.state = resolution.world_state
-
-            for summary in resolution.summaries:
-                player = self.player_states.get(summary.player_id)
-                if player is None or player.player_chat is None:
-                    continue
-                narrative = resolution.player_narratives.get(summary.player_id, "")
-                metadata = {
-                    "roll": summary.roll,
-                    "target": summary.target,
-                    "stat": summary.stat_used,
-                    "success": summary.success,
-                    "auto": summary.is_auto,
-                }
-                # await player.player_chat.send_message(
-                #     conn,
-                #     MessageKind.PRIVATE_INFO,
-                #     narrative,
-                #     sender_id=None,
-                #     metadata=metadata,
-                # )
-                self._remember_for_player(summary.player_id, narrative)
 
-            # await self.game_chat.send_message(
-            #     conn,
-            #     MessageKind.PUBLIC_INFO,
-            #     resolution.turn_summary,
-            #     sender_id=None,
-            # )
-            await self._persist_state(conn)
+            async with self.lock:
+                if (
+                    self.terminating
+                    or self.status != GameStatus.PLAYING
+                    or int(self.state.get("turn", 0)) != base_turn
+                ):
+                    await gl_log.awarning(
+                        "Discarding turn resolved against a stale state",
+                        game_id=self.id,
+                        turn=outcome.turn,
+                    )
+                    return
+                self._commit_turn(outcome)
+                # One INSERT for everything the turn wrote to chats.
+                await finalize_drafts_bulk(conn, drafts)
+                await self._persist_state(conn)
+        finally:
+            await self._discard_drafts(conn, drafts)
+
+    async def _discard_drafts(
+        self, conn: asyncpg.Connection, drafts: list[tuple[ChatSystem, int]]
+    ):
+        for chat, message_id in drafts:
+            if message_id in chat.drafts:
+                await chat.delete_message(conn, message_id)
+
+    def _commit_turn(self, outcome: TurnOutcome):
+        self.state["world"] = outcome.world
+        self.state["turn"] = outcome.turn
+        self._mark_dirty("world")
+        self._mark_dirty("turn")
+        self._append_to_state(
+            "timeline", {"turn": outcome.turn, "summary": outcome.summary}
+        )
+        for player_id, narrative in outcome.narratives.items():
+            if player_id in self.player_states:
+                self._remember_for_player(player_id, narrative)
+
+    def _resolve_actions_mechanically(
+        self, summaries: list[ActionSummary], world: dict, *, turn: int
+    ) -> TurnOutcome:
+        resolution = resolve_turn(summaries, {"world": world, "turn": turn - 1})
+        narratives = {}
+        for summary in resolution.summaries:
+            player = self.player_states.get(summary.player_id)
+            if player is None or player.player_chat is None:
+                continue
+            narratives[summary.player_id] = resolution.player_narratives.get(
+                summary.player_id, ""
+            )
+        return TurnOutcome(
+            turn=turn,
+            world=resolution.world_state["world"],
+            summary=resolution.turn_summary,
+            narratives=narratives,
+        )
 
     async def _resolve_actions_with_llm(
         self,
         conn: asyncpg.Connection,
         actions: list[PlayerAction],
         summaries: list[ActionSummary],
-    ) -> bool:
-        next_turn = int(self.state.get("turn", 0)) + 1
-        reports = []
+        *,
+        world: dict,
+        turn: int,
+        drafts: list[tuple[ChatSystem, int]],
+    ) -> TurnOutcome:
+        """
+        Resolve a turn with the models. `world` is a private copy of the
+        world state; tools and the DM update it in place. Chat drafts are
+        added to `drafts` as they are started.
+        """
         action_map = {action.player_id: action for action in actions}
-        
-        world = self.state.get("world", {})
-        
-        for action, summary in zip(actions, summaries):
-            report = await self._local_llm_action_report(
-                action,
-                summary,
-                world_state=world,
-                turn=next_turn,
-            )
-            if not report:
-                report = summary.dm_summary()
-            reports.append(
-                {
-                    "player_id": summary.player_id,
-                    "player_name": summary.player_name,
-                    "report": report,
-                }
-            )
 
-        dm_result = await self._dm_resolve_turn_llm(conn, reports, turn=next_turn)
-        
+        texts = await self._action_reports(
+            actions, summaries, world_state=world, turn=turn
+        )
+        reports = [
+            {
+                "player_id": summary.player_id,
+                "player_name": summary.player_name,
+                "report": report,
+            }
+            for summary, report in zip(summaries, texts)
+        ]
+
+        dm_result = await self._dm_resolve_turn_llm(
+            conn, reports, world=world, turn=turn, drafts=drafts
+        )
+
         consequences = {}
         summary_text = ""
 
         if dm_result:
             summary_text = str(dm_result.get("summary", "")).strip()
-            
+
             world_update = dm_result.get("world_update") or {}
             if not isinstance(world_update, dict):
                 world_update = {}
 
-            world = self.state.setdefault("world", {})
             if "scene" in world_update: world["scene"] = str(world_update["scene"])
             if "location" in world_update: world["location"] = str(world_update["location"])
             if "threat" in world_update:
@@ -2183,10 +2586,6 @@ class GameSystem(System[GameEvent]):
             if "npcs" in world_update and isinstance(world_update["npcs"], list):
                 world["npcs"] = [str(npc) for npc in world_update["npcs"] if npc]
 
-            self.state["turn"] = next_turn
-            timeline = self.state.setdefault("timeline", [])
-            timeline.append({"turn": next_turn, "summary": summary_text})
-
             raw_consequences = dm_result.get("player_consequences") or []
             if isinstance(raw_consequences, list):
                 for item in raw_consequences:
@@ -2198,19 +2597,22 @@ class GameSystem(System[GameEvent]):
                     except: pass
         else:
             # DM LLM failed, fallback to mechanical resolution
-            resolution = resolve_turn(summaries, self.state)
-            self.state = resolution.world_state
+            resolution = resolve_turn(summaries, {"world": world, "turn": turn - 1})
+            world = resolution.world_state["world"]
             summary_text = resolution.turn_summary
             # consequences remains empty
 
+        recipients = []
+        jobs = []
         for summary in summaries:
             player = self.player_states.get(summary.player_id)
             if player is None or player.player_chat is None:
                 continue
+            recipients.append(summary)
             action = action_map.get(summary.player_id)
-            consequence = consequences.get(summary.player_id)
-            narrative = None
-            
+            if action is None:
+                continue
+
             metadata = {
                 "roll": summary.roll,
                 "target": summary.target,
@@ -2218,18 +2620,16 @@ class GameSystem(System[GameEvent]):
                 "success": summary.success,
                 "auto": summary.is_auto,
             }
+            consequence = consequences.get(summary.player_id) or summary.dm_summary()
+            jobs.append((player.player_chat, action, consequence, metadata))
 
-            if action is not None:
-                eff_consequence = consequence or summary.dm_summary()
-                narrative = await self._local_llm_narrative(
-                    conn,
-                    player.player_chat,
-                    action,
-                    eff_consequence,
-                    turn=next_turn,
-                    metadata=metadata,
-                )
-            
+        streamed = await self._stream_narratives(
+            conn, jobs, turn=turn, drafts=drafts
+        )
+
+        narratives = {}
+        for summary in recipients:
+            narrative = streamed.get(summary.player_id)
             if not narrative:
                 narrative = self._fallback_narrative(summary)
                 # await player.player_chat.send_message(
@@ -2240,7 +2640,7 @@ class GameSystem(System[GameEvent]):
                 #     metadata=metadata,
                 # )
             
-            self._remember_for_player(summary.player_id, narrative or "")
+            narratives[summary.player_id] = narrative or ""
         
         if summary_text:
             pass
@@ -2251,8 +2651,48 @@ class GameSystem(System[GameEvent]):
             #     sender_id=None,
             # )
 
-        await self._persist_state(conn)
-        return True
+        return TurnOutcome(
+            turn=turn,
+            world=world,
+            summary=summary_text,
+            narratives=narratives,
+        )
+
+    async def _action_reports(
+        self,
+        actions: list[PlayerAction],
+        summaries: list[ActionSummary],
+        *,
+        world_state: dict,
+        turn: int,
+    ) -> list[str]:
+        """
+        Interpret all actions concurrently, at most LLM_ACTION_CONCURRENCY
+        at a time. Reports are in the order of `actions`; an interpretation
+        that fails or times out is replaced by the mechanical summary.
+        """
+        semaphore = asyncio.Semaphore(config.LLM_ACTION_CONCURRENCY)
+
+        async def report(action: PlayerAction, summary: ActionSummary) -> str:
+            async with semaphore:
+                try:
+                    async with asyncio.timeout(config.LLM_ACTION_TIMEOUT_SECONDS):
+                        text = await self._local_llm_action_report(
+                            action, summary, world_state=world_state, turn=turn
+                        )
+                except TimeoutError:
+                    await gl_log.awarning(
+                        "Action interpretation timed out",
+                        game_id=self.id,
+                        player_id=action.player_id,
+                        turn=turn,
+                    )
+                    text = None
+            return text or summary.dm_summary()
+
+        return await asyncio.gather(
+            *(report(action, summary) for action, summary in zip(actions, summaries))
+        )
 
     async def _local_llm_action_report(
         self,
@@ -2316,9 +2756,15 @@ class GameSystem(System[GameEvent]):
         conn: asyncpg.Connection,
         reports: list[dict[str, str | int]],
         *,
+        world: dict,
         turn: int,
+        drafts: list[tuple[ChatSystem, int]],
     ) -> dict | None:
-        world = self.state.get("world", {})
+        """
+        Let the DM resolve the turn. The DM's reply is streamed into a
+        draft in the game chat, which is added to `drafts` when it is
+        started.
+        """
         timeline = self.state.get("timeline", [])
         recent_timeline = timeline[-3:] if timeline else []
         timeline_text = (
@@ -2395,7 +2841,7 @@ class GameSystem(System[GameEvent]):
                     if delta.content:
                         full_content += delta.content
                         if placeholder_msg is None:
-                             res = await self.game_chat.send_message(
+                             res = await self.game_chat.start_draft(
                                 conn,
                                 MessageKind.PUBLIC_INFO,
                                 "...",
@@ -2403,6 +2849,7 @@ class GameSystem(System[GameEvent]):
                             )
                              if not isinstance(res, ServiceError):
                                  placeholder_msg = res
+                                 drafts.append((self.game_chat, res.msg.id))
                         
                         await self.game_chat.edit_message(conn, placeholder_msg.msg.id, full_content)
 
@@ -2507,7 +2954,7 @@ class GameSystem(System[GameEvent]):
                     if placeholder_msg:
                         await self.game_chat.edit_message(conn, placeholder_msg.msg.id, summary_from_args)
                     else:
-                        res = await self.game_chat.send_message(
+                        res = await self.game_chat.start_draft(
                             conn,
                             MessageKind.PUBLIC_INFO,
                             summary_from_args,
@@ -2515,10 +2962,11 @@ class GameSystem(System[GameEvent]):
                         )
                         if not isinstance(res, ServiceError):
                             placeholder_msg = res
+                            drafts.append((self.game_chat, res.msg.id))
                 else:
                     if placeholder_msg:
                         await self.game_chat.delete_message(conn, placeholder_msg.msg.id)
-                
+
                 return tool_args
 
             for call in other_calls:
@@ -2528,7 +2976,7 @@ class GameSystem(System[GameEvent]):
                 if name not in lua_tool_names:
                     tool_result = {"error": f"Unknown tool: {name}"}
                 else:
-                    tool_result = await self._run_lua_tool(name, params)
+                    tool_result = await self._run_lua_tool(name, params, world)
 
                 messages.append(
                     {
@@ -2542,6 +2990,72 @@ class GameSystem(System[GameEvent]):
             await self.game_chat.delete_message(conn, placeholder_msg.msg.id)
         return None
 
+    def cancel_narrative(self, player_id: int):
+        task = self.narrative_tasks.get(player_id)
+        if task is not None:
+            task.cancel()
+
+    async def _stream_narratives(
+        self,
+        conn: asyncpg.Connection,
+        jobs: list[tuple[ChatSystem, PlayerAction, str, dict]],
+        *,
+        turn: int,
+        drafts: list[tuple[ChatSystem, int]],
+    ) -> dict[int, str | None]:
+        """
+        Stream a narrative into a draft in each player's chat concurrently.
+        At most LLM_NARRATIVE_CONCURRENCY narratives stream at once across
+        all games. `cancel_narrative` stops a single player's stream; its
+        result is then None, like a failed one. The drafts holding the
+        narratives are added to `drafts` as soon as each one is done, for
+        the caller to finalize or discard.
+        """
+        semaphore = _narrative_semaphore()
+        # The streams share `conn`, which runs one query at a time.
+        conn_lock = asyncio.Lock()
+
+        async def narrate(chat, action, consequence, metadata):
+            async with semaphore:
+                result = await self._local_llm_narrative(
+                    conn,
+                    chat,
+                    action,
+                    consequence,
+                    turn=turn,
+                    metadata=metadata,
+                    conn_lock=conn_lock,
+                )
+            if result is None:
+                return None
+            narrative, draft_id = result
+            drafts.append((chat, draft_id))
+            return narrative
+
+        tasks = {}
+        for chat, action, consequence, metadata in jobs:
+            task = asyncio.create_task(
+                narrate(chat, action, consequence, metadata),
+                name=f"narrative_game{self.id}_player{action.player_id}",
+            )
+            tasks[action.player_id] = task
+            self.narrative_tasks[action.player_id] = task
+        try:
+            results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        finally:
+            for player_id, task in tasks.items():
+                if self.narrative_tasks.get(player_id) is task:
+                    del self.narrative_tasks[player_id]
+
+        narratives = {}
+        for player_id, result in zip(tasks, results):
+            if isinstance(result, asyncio.CancelledError):
+                result = None
+            elif isinstance(result, BaseException):
+                raise result
+            narratives[player_id] = result
+        return narratives
+
     async def _local_llm_narrative(
         self,
         conn: asyncpg.Connection,
@@ -2551,7 +3065,13 @@ class GameSystem(System[GameEvent]):
         *,
         turn: int,
         metadata: dict | None = None,
-    ) -> str | None:
+        conn_lock: asyncio.Lock,
+    ) -> tuple[str, int] | None:
+        """
+        Stream the narrative into a draft in `chat`. Returns the text and
+        the id of the draft, which is left for the caller to finalize.
+        `conn` is shared with other streams; queries take `conn_lock`.
+        """
         memory = self._format_player_memory(action.player_id)
         prompt = (
             f"Игрок: {action.player_name} (id {action.player_id})\n"
@@ -2563,17 +3083,24 @@ class GameSystem(System[GameEvent]):
             {"role": "system", "content": PLAYER_NARRATIVE_SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ]
-        
-        placeholder = await chat.send_message(
-            conn,
-            MessageKind.PRIVATE_INFO,
-            "...",
-            sender_id=None,
-            metadata=metadata,
-        )
+
+        async with conn_lock:
+            placeholder = await chat.start_draft(
+                conn,
+                MessageKind.PRIVATE_INFO,
+                "...",
+                sender_id=None,
+                metadata=metadata,
+            )
         if isinstance(placeholder, ServiceError):
             return None
-        
+
+        async def discard():
+            # The draft may already be gone; a finalized row is left alone.
+            async with conn_lock:
+                if placeholder.msg.id in chat.drafts:
+                    await chat.delete_message(conn, placeholder.msg.id)
+
         full_content = ""
         try:
             stream = await create_chat_completion_stream(
@@ -2581,7 +3108,7 @@ class GameSystem(System[GameEvent]):
                 messages=messages,
                 temperature=0.7,
             )
-            
+
             last_update = time.monotonic()
             async for chunk in stream:
                 if not chunk.choices:
@@ -2593,15 +3120,18 @@ class GameSystem(System[GameEvent]):
                     if time.monotonic() - last_update > 0.3:
                         await chat.edit_message(conn, placeholder.msg.id, full_content)
                         last_update = time.monotonic()
-            
+
             if full_content:
                 await chat.edit_message(conn, placeholder.msg.id, full_content)
             else:
-                await chat.delete_message(conn, placeholder.msg.id)
+                await discard()
                 return None
-                
+
+        except asyncio.CancelledError:
+            await discard()
+            raise
         except Exception as exc:
-            await chat.delete_message(conn, placeholder.msg.id)
+            await discard()
             self._append_llm_log(
                 scope="player_narrative",
                 model=PLAYER_MODEL,
@@ -2621,7 +3151,7 @@ class GameSystem(System[GameEvent]):
             player_id=action.player_id,
             turn=turn,
         )
-        return full_content
+        return full_content, placeholder.msg.id
 
     def _fallback_narrative(self, summary: ActionSummary) -> str:
         if summary.success:
@@ -2633,27 +3163,25 @@ class GameSystem(System[GameEvent]):
     async def _announce_game_start(self, conn: asyncpg.Connection):
         world = self.state.get("world", {})
         intro = f"Игра началась. {world.get('scene', '')}".strip()
-        await self.game_chat.send_message(
+        players = [
+            player
+            for player in self.player_states.values()
+            if not player.is_spectator and player.player_chat is not None
+        ]
+        await send_messages_bulk(
             conn,
-            MessageKind.SYSTEM,
-            "Игра началась.",
-            sender_id=None,
+            [(self.game_chat, NewMessage(MessageKind.SYSTEM, "Игра началась."))]
+            + [
+                (player.player_chat, NewMessage(MessageKind.PUBLIC_INFO, intro))
+                for player in players
+            ],
         )
-        for player in self.player_states.values():
-            if player.is_spectator or player.player_chat is None:
-                continue
-            await player.player_chat.send_message(
-                conn,
-                MessageKind.PUBLIC_INFO,
-                intro,
-                sender_id=None,
-            )
+        for player in players:
             suggestions = suggest_actions(
                 self.state, self._get_character(player.user.id)
             )
-            await player.player_chat.clear_suggestions()
-            for suggestion in suggestions:
-                await player.player_chat.add_suggestion(suggestion)
+            await player.player_chat.set_suggestions(suggestions)
+        await persist_suggestions(conn, [player.player_chat for player in players])
 
     async def game_loop(self):
         if self.db_pool is None:
@@ -0,0 +1,160 @@
+"""
+Append-only log of the prompts and responses of model calls.
+
+Games hand entries to `llm_log_writer`, which keeps them in memory and
+inserts them in batches from a background task, so logging a call never
+waits for the database. The host reads them back page by page with
+`get_llm_logs`.
+"""
+
+import asyncio
+import collections
+import contextlib
+import datetime
+
+import asyncpg
+
+import config
+from game.logger import gl_log
+from game.logic import LLMLogEntry
+from lstypes.game import LLMLogOut, LLMLogPageOut
+
+
+class LLMLogWriter:
+    def __init__(self):
+        self.pending: collections.deque[dict] = collections.deque()
+        self.dropped = 0
+        self._pool: asyncpg.Pool | None = None
+        self._task: asyncio.Task | None = None
+        self._batch_ready: asyncio.Event | None = None
+
+    def append(self, game_id: int, entry: LLMLogEntry):
+        if self._pool is None:
+            # Nothing would ever write the entry out.
+            self.dropped += 1
+            return
+        self.pending.append(
+            {
+                "game_id": game_id,
+                "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+                **entry.to_dict(),
+                # Callers keep appending to their prompt after logging it.
+                "prompt": list(entry.prompt),
+            }
+        )
+        limit = max(0, config.LLM_LOG_BUFFER_LIMIT)
+        while limit and len(self.pending) > limit:
+            # The database is not keeping up; losing old debug output is
+            # better than growing without bound.
+            self.pending.popleft()
+            self.dropped += 1
+        if self._batch_ready is not None and (
+            len(self.pending) >= config.LLM_LOG_BATCH_SIZE
+        ):
+            self._batch_ready.set()
+
+    async def flush(self, conn: asyncpg.Connection) -> int:
+        """Insert every pending entry. Returns the number of entries taken."""
+        taken = 0
+        while self.pending:
+            batch = [
+                self.pending.popleft()
+                for _ in range(min(len(self.pending), config.LLM_LOG_BATCH_SIZE))
+            ]
+            try:
+                await conn.execute(
+                    """
+                    INSERT INTO llm_logs (
+                        game_id, player_id, turn, scope, model,
+                        prompt, response, error, created_at
+                    )
+                    SELECT l.game_id, l.player_id, l.turn, l.scope, l.model,
+                           l.prompt, l.response, l.error, l.created_at
+                    FROM ROWS FROM (
+                        jsonb_to_recordset($1::jsonb) AS (
+                            game_id INTEGER, player_id INTEGER, turn INTEGER,
+                            scope TEXT, model TEXT, prompt JSONB, response JSONB,
+                            error TEXT, created_at TIMESTAMPTZ
+                        )
+                    ) WITH ORDINALITY AS l(
+                        game_id, player_id, turn, scope, model,
+                        prompt, response, error, created_at, n
+                    )
+                    -- The game may have been deleted in the meantime.
+                    JOIN games g ON g.id = l.game_id
+                    ORDER BY l.n
+                    """,
+                    batch,
+                )
+            except BaseException:
+                self.pending.extendleft(reversed(batch))
+                raise
+            taken += len(batch)
+        return taken
+
+    def start(self, pool: asyncpg.Pool):
+        self._pool = pool
+        if self._task is None or self._task.done():
+            # The event belongs to the loop the writer runs on.
+            self._batch_ready = asyncio.Event()
+            self._task = asyncio.create_task(
+                self._flush_loop(self._batch_ready), name="llm_log_writer"
+            )
+
+    async def stop(self):
+        task = self._task
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._task = None
+                self._batch_ready = None
+        pool, self._pool = self._pool, None
+        if pool is not None and self.pending:
+            try:
+                async with pool.acquire() as conn:
+                    await self.flush(conn)
+            except (asyncpg.PostgresError, OSError) as e:
+                await gl_log.aerror("Failed to flush LLM logs: %s", e)
+
+    async def _flush_loop(self, batch_ready: asyncio.Event):
+        while True:
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(config.LLM_LOG_FLUSH_SECONDS):
+                    await batch_ready.wait()
+            batch_ready.clear()
+            if not self.pending:
+                continue
+            try:
+                async with self._pool.acquire() as conn:
+                    await self.flush(conn)
+            except (asyncpg.PostgresError, OSError) as e:
+                await gl_log.aerror("Failed to flush LLM logs: %s", e)
+
+
+llm_log_writer = LLMLogWriter()
+
+
+async def get_llm_logs(
+    conn: asyncpg.Connection, game_id: int, limit: int, before: int | None = None
+) -> LLMLogPageOut:
+    """Newest entries of the game first, starting below the id `before`."""
+    rows = await conn.fetch(
+        """
+        SELECT id, player_id, turn, scope, model, prompt, response, error, created_at
+        FROM llm_logs
+        WHERE game_id = $1 AND ($2::bigint IS NULL OR id < $2)
+        ORDER BY id DESC
+        LIMIT $3
+        """,
+        game_id,
+        before,
+        limit + 1,
+    )
+    logs = [LLMLogOut(**row) for row in rows[:limit]]
+    return LLMLogPageOut(
+        logs=logs, next_before=logs[-1].id if len(rows) > limit else None
+    )
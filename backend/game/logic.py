@@ -44,7 +44,6 @@ def ensure_game_state(state: dict[str, Any] | None) -> dict[str, Any]:
             "players": {},
             "turn": 0,
             "timeline": [],
-            "llm_logs": [],
             **({"tools": tools_cfg} if tools_cfg is not None else {}),
         }
 
@@ -55,7 +54,8 @@ def ensure_game_state(state: dict[str, Any] | None) -> dict[str, Any]:
     normalized.setdefault("players", {})
     normalized.setdefault("turn", 0)
     normalized.setdefault("timeline", [])
-    normalized.setdefault("llm_logs", [])
+    # LLM logs are kept in their own table now.
+    normalized.pop("llm_logs", None)
     return normalized
 
 
@@ -1,4 +1,11 @@
+import collections
+import contextvars
+import dataclasses
+import enum
+import functools
+import time
 import typing
+import weakref
 import asyncio
 import inspect
 import pytest
@@ -22,7 +29,516 @@ class SystemException(RuntimeError):
         super().__init__(message)
 
 
-_system_index: dict[tuple[type[System], typing.Any], System] = {}
+class SystemQueueFull(SystemException):
+    def __init__(self, system_name: str, capacity: int):
+        super().__init__(
+            f"Event queue of system {system_name} is full (capacity={capacity})"
+        )
+
+
+class Backpressure(enum.Enum):
+    """
+    What a bounded event queue does with a new event when it is full.
+
+    BLOCK waits for the consumer in `emit_wait`. A plain `emit` cannot
+    wait and must not fail after the caller already changed its state,
+    so it falls back to DROP_OLDEST.
+    DROP_OLDEST discards the oldest pending event.
+    COALESCE replaces a pending event with the same coalesce key,
+    falling back to DROP_OLDEST when there is none.
+    FAIL raises `SystemQueueFull`.
+
+    Whenever events are discarded, the consumer gets `SystemLagged`
+    before the next event, so that it knows to resynchronize.
+    """
+
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    FAIL = "fail"
+
+
+@dataclasses.dataclass
+class QueueStats:
+    depth: int
+    capacity: int | None
+    high_water_mark: int
+    dropped: int
+    coalesced: int
+
+
+@dataclasses.dataclass
+class Latency:
+    count: int = 0
+    total: float = 0.0
+    mean: float = 0.0
+    max: float = 0.0
+    last: float = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.mean = self.total / self.count
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+
+@dataclasses.dataclass
+class PipeStats:
+    system: str
+    system_id: typing.Any
+    name: str
+    age_seconds: float
+    running: bool
+    processed: int
+    queue_delay: Latency
+    handling: Latency
+
+
+class PipeHandle:
+    """
+    Supervision record of one pipe task.
+
+    While a pipe reads events from a system, every delivered event is
+    timed twice: how long it waited in the queue since it was emitted
+    (`queue_delay`) and how long the pipe spent on it before asking for
+    the next one (`handling`).
+    """
+
+    def __init__(self, system: System, name: str):
+        # The system keeps its handles in `pipes`; a weak back reference
+        # lets an unreferenced system be freed without waiting for the
+        # cycle collector.
+        self._system = weakref.ref(system)
+        self.system_name = system.name
+        self.system_id = system.id
+        self.name = name
+        self.started_at = time.monotonic()
+        self.task: asyncio.Task | None = None
+        self.processed = 0
+        self.queue_delay = Latency()
+        self.handling = Latency()
+        self._received_at: float | None = None
+
+    @property
+    def system(self) -> System | None:
+        return self._system()
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def delivered(self, emitted_at: float | None):
+        now = time.monotonic()
+        if emitted_at is not None:
+            self.queue_delay.observe(now - emitted_at)
+        self._received_at = now
+
+    def handled(self):
+        if self._received_at is None:
+            return
+        self.handling.observe(time.monotonic() - self._received_at)
+        self.processed += 1
+        self._received_at = None
+
+    def stats(self) -> PipeStats:
+        return PipeStats(
+            system=self.system_name,
+            system_id=self.system_id,
+            name=self.name,
+            age_seconds=time.monotonic() - self.started_at,
+            running=self.running,
+            processed=self.processed,
+            queue_delay=dataclasses.replace(self.queue_delay),
+            handling=dataclasses.replace(self.handling),
+        )
+
+
+_current_pipe: contextvars.ContextVar[PipeHandle | None] = contextvars.ContextVar(
+    "current_pipe", default=None
+)
+
+
+def _pipe_waiting():
+    if (handle := _current_pipe.get()) is not None:
+        handle.handled()
+
+
+def _pipe_delivered(emitted_at: float | None):
+    if (handle := _current_pipe.get()) is not None:
+        handle.delivered(emitted_at)
+
+
+def _is_control(event) -> bool:
+    return isinstance(event, (SystemStopMarker, SystemPipeException))
+
+
+class EventQueue[E]:
+    """
+    FIFO of pending events with an optional capacity.
+
+    Control markers (stop, pipe failures) are always accepted and never
+    dropped, so that stopping a system never waits for its consumer.
+
+    With the COALESCE policy, events that share a key are merged
+    whenever one of them is still pending, not only when the queue is
+    full: the pending event keeps its place and takes the newest value.
+    """
+
+    def __init__(
+        self,
+        capacity: int | None = None,
+        backpressure: Backpressure = Backpressure.BLOCK,
+        coalesce_key: typing.Callable[[E], typing.Hashable | None] | None = None,
+    ):
+        if capacity is not None and capacity < 1:
+            raise ValueError("Queue capacity must be positive")
+        self.capacity = capacity
+        self.backpressure = backpressure
+        # A key method of the owning system would tie the system and its
+        # queue into a reference cycle, so methods are held weakly.
+        self._coalesce_key: typing.Callable[[], typing.Callable | None]
+        if inspect.ismethod(coalesce_key):
+            self._coalesce_key = weakref.WeakMethod(coalesce_key)
+        else:
+            self._coalesce_key = lambda: coalesce_key
+        # Slots are [event, emitted_at] lists, so that a pending event can
+        # be replaced in place when a newer one with the same key arrives.
+        self._slots: collections.deque[list] = collections.deque()
+        self._keyed: dict[typing.Hashable, list] = {}
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.high_water_mark = 0
+        self.dropped = 0
+        self.coalesced = 0
+        # Events dropped since the consumer last got `SystemLagged`.
+        self.missed = 0
+        self.last_emitted_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def full(self) -> bool:
+        return self.capacity is not None and len(self._slots) >= self.capacity
+
+    def stats(self) -> QueueStats:
+        return QueueStats(
+            depth=len(self._slots),
+            capacity=self.capacity,
+            high_water_mark=self.high_water_mark,
+            dropped=self.dropped,
+            coalesced=self.coalesced,
+        )
+
+    def _key(self, event) -> typing.Hashable | None:
+        if self.backpressure != Backpressure.COALESCE or _is_control(event):
+            return None
+        coalesce_key = self._coalesce_key()
+        return coalesce_key(event) if coalesce_key is not None else None
+
+    def _append(self, event, key: typing.Hashable | None = None):
+        slot = [event, time.monotonic()]
+        self._slots.append(slot)
+        if key is not None:
+            self._keyed[key] = slot
+        self.high_water_mark = max(self.high_water_mark, len(self._slots))
+        self._readable.set()
+        if self.full():
+            self._writable.clear()
+
+    def _drop_oldest(self):
+        for i, slot in enumerate(self._slots):
+            if not _is_control(slot[0]):
+                del self._slots[i]
+                self._forget(slot)
+                self.dropped += 1
+                self.missed += 1
+                return
+
+    def _forget(self, slot: list):
+        key = self._key(slot[0])
+        if key is not None and self._keyed.get(key) is slot:
+            del self._keyed[key]
+
+    def put_control(self, marker: SystemStopMarker | SystemPipeException):
+        self._append(marker)
+
+    def put_nowait(self, event: E, system_name: str = "?"):
+        key = self._key(event)
+        if key is not None and key in self._keyed:
+            self._keyed[key][0] = event
+            self.coalesced += 1
+            return
+
+        if self.full():
+            if self.backpressure == Backpressure.FAIL:
+                raise SystemQueueFull(system_name, self.capacity)
+            self._drop_oldest()
+
+        self._append(event, key)
+
+    async def put(self, event: E, system_name: str = "?"):
+        if self.backpressure == Backpressure.BLOCK:
+            while self.full():
+                await self._writable.wait()
+        self.put_nowait(event, system_name)
+
+    async def get(self):
+        while not self._slots:
+            self._readable.clear()
+            await self._readable.wait()
+        if self.missed:
+            # Dropped events were the oldest ones, so the gap is right here.
+            missed, self.missed = self.missed, 0
+            return SystemLagged(missed)
+        slot = self._slots.popleft()
+        self._forget(slot)
+        if not self._slots:
+            self._readable.clear()
+        if not self.full():
+            self._writable.set()
+        self.last_emitted_at = slot[1]
+        return slot[0]
+
+
+@dataclasses.dataclass
+class SystemLagged:
+    """
+    Yielded to a listener that fell so far behind that events it had
+    not read yet were discarded: overwritten in the ring buffer of a
+    broadcast system, or dropped from a full event queue.
+    """
+
+    missed: int
+
+
+class BroadcastBuffer[E]:
+    """
+    Ring buffer of the last `size` events of a broadcast system.
+
+    Every subscriber keeps its own cursor (the sequence number of the
+    next event to read), so any number of subscribers read the same
+    stored events without copying them into per-subscriber queues.
+    Publishing never waits: a subscriber that falls behind by more than
+    `size` events skips to the oldest retained event and gets
+    `SystemLagged` instead of the events it missed.
+    """
+
+    def __init__(self, size: int):
+        if size < 1:
+            raise ValueError("Broadcast buffer size must be positive")
+        self.size = size
+        self._ring: list = [None] * size
+        self._stamps: list[float] = [0.0] * size
+        self.head = 0
+        self._waiters: list[asyncio.Future] = []
+        self._subscriptions: weakref.WeakSet[Subscription] = weakref.WeakSet()
+        self.high_water_mark = 0
+        self.dropped = 0
+        self.closed = False
+
+    @property
+    def tail(self) -> int:
+        return max(0, self.head - self.size)
+
+    def depth(self) -> int:
+        cursors = [sub.cursor for sub in self._subscriptions if not sub.closed]
+        if not cursors:
+            return 0
+        return self.head - max(min(cursors), self.tail)
+
+    def stats(self) -> QueueStats:
+        return QueueStats(
+            depth=self.depth(),
+            capacity=self.size,
+            high_water_mark=self.high_water_mark,
+            dropped=self.dropped,
+            coalesced=0,
+        )
+
+    def _publish(self, event):
+        self._ring[self.head % self.size] = event
+        self._stamps[self.head % self.size] = time.monotonic()
+        self.head += 1
+        self.high_water_mark = max(self.high_water_mark, self.depth())
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def put_control(self, marker: SystemStopMarker | SystemPipeException):
+        self._publish(marker)
+        if isinstance(marker, SystemStopMarker):
+            self.closed = True
+
+    def put_nowait(self, event: E, system_name: str = "?"):
+        self._publish(event)
+
+    async def put(self, event: E, system_name: str = "?"):
+        self._publish(event)
+
+    def subscribe(self, replay: bool = False) -> Subscription[E]:
+        sub = Subscription(self, self.tail if replay else self.head)
+        self._subscriptions.add(sub)
+        return sub
+
+    async def _wait(self, cursor: int):
+        while cursor >= self.head and not self.closed:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+
+class Subscription[E]:
+    """A cursor into a `BroadcastBuffer`, iterated with `async for`."""
+
+    def __init__(self, buffer: BroadcastBuffer[E], cursor: int):
+        self.buffer = buffer
+        self.cursor = cursor
+        self.lagged = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def aclose(self):
+        self.closed = True
+
+    async def __anext__(self) -> E | SystemLagged:
+        if self.closed:
+            raise StopAsyncIteration
+        _pipe_waiting()
+        await self.buffer._wait(self.cursor)
+        if self.cursor >= self.buffer.head:
+            self.closed = True
+            raise StopAsyncIteration
+
+        tail = self.buffer.tail
+        if self.cursor < tail:
+            missed = tail - self.cursor
+            self.cursor = tail
+            self.lagged += missed
+            self.buffer.dropped += missed
+            return SystemLagged(missed)
+
+        event = self.buffer._ring[self.cursor % self.buffer.size]
+        emitted_at = self.buffer._stamps[self.cursor % self.buffer.size]
+        self.cursor += 1
+        if isinstance(event, SystemStopMarker):
+            self.closed = True
+            raise StopAsyncIteration
+        elif isinstance(event, SystemPipeException):
+            self.closed = True
+            raise event from event.cause
+        _pipe_delivered(emitted_at)
+        return event
+
+
+@dataclasses.dataclass
+class SystemInfo:
+    kind: str
+    id: typing.Any
+    name: str
+    age_seconds: float
+    active_pipes: int
+    stopped: bool
+    queue: QueueStats
+
+
+class SystemRegistry:
+    """
+    Index of live systems, sharded by system class.
+
+    Entries are weak: the registry never keeps a system alive by itself.
+    A system that nobody references anymore disappears from the index
+    even if it was never stopped. A class can cap how many of its
+    instances may be registered at once with `registry_limit`, either a
+    number or a function returning one, which is called on every
+    registration so that the cap follows the configuration.
+    """
+
+    def __init__(self):
+        self._shards: dict[type[System], dict[typing.Any, weakref.ref[System]]] = {}
+
+    def add(self, system: System):
+        cls = system.__class__
+        shard = self._shards.setdefault(cls, {})
+        if self._live(shard.get(system.id)) is not None:
+            raise SystemException(
+                f"System {system.name} (id={system.id}) already exists"
+            )
+        limit = cls.registry_limit
+        if callable(limit):
+            limit = limit()
+        if limit is not None and self._count(shard) >= limit:
+            raise SystemException(
+                f"Too many {cls.__name__} systems loaded (limit={limit})"
+            )
+        shard[system.id] = weakref.ref(
+            system, functools.partial(self._collected, cls, system.id)
+        )
+
+    def remove(self, system: System):
+        shard = self._shards.get(system.__class__)
+        if shard is not None and self._live(shard.get(system.id)) is system:
+            del shard[system.id]
+
+    def get(self, cls: type[System], id_: typing.Any) -> System | None:
+        shard = self._shards.get(cls)
+        if shard is None:
+            return None
+        return self._live(shard.get(id_))
+
+    def systems(self, cls: type[System] | None = None) -> list[System]:
+        shards = [self._shards.get(cls, {})] if cls else self._shards.values()
+        return [
+            system
+            for shard in shards
+            for ref in list(shard.values())
+            if (system := ref()) is not None
+        ]
+
+    def counts(self) -> dict[str, int]:
+        counts = {
+            cls.__name__: self._count(shard) for cls, shard in self._shards.items()
+        }
+        return {name: count for name, count in counts.items() if count}
+
+    def pipe_stats(self, cls: type[System] | None = None) -> list[PipeStats]:
+        return [stats for system in self.systems(cls) for stats in system.pipe_stats()]
+
+    def snapshot(self, cls: type[System] | None = None) -> list[SystemInfo]:
+        now = time.monotonic()
+        return [
+            SystemInfo(
+                kind=system.__class__.__name__,
+                id=system.id,
+                name=system.name,
+                age_seconds=now - system.created_at,
+                active_pipes=system.active_pipes,
+                stopped=system.stopped,
+                queue=system.queue_stats(),
+            )
+            for system in self.systems(cls)
+        ]
+
+    @staticmethod
+    def _live(ref: weakref.ref[System] | None) -> System | None:
+        return ref() if ref is not None else None
+
+    @staticmethod
+    def _count(shard: dict[typing.Any, weakref.ref[System]]) -> int:
+        # Entries of collected systems linger until their callback runs.
+        return sum(1 for ref in shard.values() if ref() is not None)
+
+    def _collected(self, cls: type[System], id_: typing.Any, ref: weakref.ref):
+        shard = self._shards.get(cls)
+        if shard is not None and shard.get(id_) is ref:
+            del shard[id_]
+
+
+registry = SystemRegistry()
 
 
 class System[E, I = int]:
@@ -40,18 +556,44 @@ class System[E, I = int]:
     in a non-blocking, async manner.
 
     Events can be piped to other systems using `add_pipe`.
+
+    The event queue is unbounded unless `capacity` is given, in which
+    case `backpressure` decides what happens to events that do not fit.
+
+    With `broadcast` set, the queue is replaced by a ring buffer of that
+    size, and the system can be listened to by any number of
+    subscribers at once (see `BroadcastBuffer`). Backpressure settings
+    do not apply there: slow subscribers lag instead.
+
+    Live systems are looked up by class and id through `registry`.
     """
 
-    def __init__(self, id_: I, name: str | None = None):
+    registry_limit: int | typing.Callable[[], int | None] | None = None
+
+    def __init__(
+        self,
+        id_: I,
+        name: str | None = None,
+        *,
+        capacity: int | None = None,
+        backpressure: Backpressure = Backpressure.BLOCK,
+        coalesce_key: typing.Callable[[E], typing.Hashable | None] | None = None,
+        broadcast: int | None = None,
+    ):
         self.name = name or self.__class__.__name__
-        if (self.__class__, id_) in _system_index:
-            raise SystemException(f"System {self.name} (id={id_}) already exists")
-        _system_index[(self.__class__, id_)] = self
-        self._event_queue: asyncio.Queue[E | SystemPipeException | SystemStopMarker] = (
-            asyncio.Queue()
-        )
-        self.active_pipes = 0
         self.id = id_
+        registry.add(self)
+        self.created_at = time.monotonic()
+        self._event_queue: EventQueue[E] | BroadcastBuffer[E]
+        if broadcast is not None:
+            self._event_queue = BroadcastBuffer(broadcast)
+        else:
+            self._event_queue = EventQueue(capacity, backpressure, coalesce_key)
+        self._coalesce_pending: dict[typing.Hashable, E] = {}
+        self._coalesce_flush: asyncio.TimerHandle | None = None
+        self._coalesced = 0
+        self.active_pipes = 0
+        self.pipes: list[PipeHandle] = []
         self.stopped: bool = False
         self.listened: bool = False
         self.finished_event: asyncio.Event = asyncio.Event()
@@ -59,9 +601,9 @@ class System[E, I = int]:
 
     @classmethod
     def of(cls, id_: I):
-        return _system_index.get((cls, id_))
+        return registry.get(cls, id_)
 
-    def add_pipe(self, coro: typing.Coroutine, name: str | None = None):
+    def add_pipe(self, coro: typing.Coroutine, name: str | None = None) -> PipeHandle:
         if name is None:
             name = coro.__name__
 
@@ -77,35 +619,130 @@ class System[E, I = int]:
             try:
                 await coro
             except Exception as e:
-                await self._event_queue.put(SystemPipeException(e, self.name))
+                self._event_queue.put_control(SystemPipeException(e, self.name))
             finally:
                 self.active_pipes -= 1
-                # print("popped", name, self.active_pipes)
                 if self.active_pipes == 0:
                     self.finished_event.set()
 
-        self.add_raw_pipe(wrapper(), name)
+        return self.add_raw_pipe(wrapper(), name)
 
-    def add_raw_pipe(self, pipe: typing.Coroutine, name: str | None = None):
+    def add_raw_pipe(
+        self, pipe: typing.Coroutine, name: str | None = None
+    ) -> PipeHandle:
+        """
+        Start `pipe` as a supervised task. Events the task reads from
+        any system are accounted to the returned handle.
+        """
+        handle = PipeHandle(self, name or pipe.__name__)
         self.active_pipes += 1
-        # print("pushed", name, self.active_pipes)
         self.finished_event.clear()
-        asyncio.create_task(pipe, name=name)
+
+        context = contextvars.copy_context()
+        context.run(_current_pipe.set, handle)
+        handle.task = asyncio.create_task(pipe, name=handle.name, context=context)
+        self.pipes.append(handle)
+        handle.task.add_done_callback(lambda _: self._pipe_done(handle))
+        return handle
+
+    def _pipe_done(self, handle: PipeHandle):
+        handle.handled()
+        self.pipes.remove(handle)
+
+    def pipe_stats(self) -> list[PipeStats]:
+        return [handle.stats() for handle in self.pipes]
 
     def emit(self, event: E):
         if self.stopped:
             return
-        self._event_queue.put_nowait(event)
+        self._event_queue.put_nowait(event, self.name)
+
+    async def emit_wait(self, event: E):
+        """
+        Like `emit`, but waits for room in the queue instead of dropping
+        events when the system uses `Backpressure.BLOCK`. Pipes should
+        prefer this, so that a slow consumer slows down the producers.
+        """
+        if self.stopped:
+            return
+        await self._event_queue.put(event, self.name)
+
+    def emit_coalesced(self, event: E, key: typing.Hashable, tick: float):
+        """
+        Emit `event` at the end of the current flush tick instead of
+        right away. Events emitted with the same key during one tick
+        collapse into the last of them, so a burst of updates to one
+        thing costs a single event downstream.
+        """
+        if self.stopped:
+            return
+        if key in self._coalesce_pending:
+            self._coalesced += 1
+            del self._coalesce_pending[key]
+        self._coalesce_pending[key] = event
+        if self._coalesce_flush is None:
+            self._coalesce_flush = asyncio.get_running_loop().call_later(
+                tick, self.flush_coalesced
+            )
+
+    def discard_coalesced(self, key: typing.Hashable):
+        """Drop a pending coalesced event, e.g. when its subject is deleted."""
+        if self._coalesce_pending.pop(key, None) is not None:
+            self._coalesced += 1
+
+    def flush_coalesced(self):
+        if self._coalesce_flush is not None:
+            self._coalesce_flush.cancel()
+            self._coalesce_flush = None
+        pending, self._coalesce_pending = self._coalesce_pending, {}
+        for event in pending.values():
+            # An event that does not fit must not cost the rest of the batch.
+            try:
+                self.emit(event)
+            except SystemQueueFull:
+                self._event_queue.dropped += 1
+
+    def queue_stats(self) -> QueueStats:
+        stats = self._event_queue.stats()
+        return dataclasses.replace(stats, coalesced=stats.coalesced + self._coalesced)
 
     async def stop(self):
         if self.stopped:
             return
         await self.finished_event.wait()
+        self.flush_coalesced()
         self.stopped = True
-        del _system_index[(self.__class__, self.id)]
-        await self._event_queue.put(SystemStopMarker())
-
-    async def listen(self) -> typing.AsyncGenerator[E]:
+        registry.remove(self)
+        self._event_queue.put_control(SystemStopMarker())
+
+    @property
+    def broadcast(self) -> bool:
+        return isinstance(self._event_queue, BroadcastBuffer)
+
+    def subscribe(self, replay: bool = False) -> Subscription[E]:
+        """
+        Attach a new subscriber to a broadcast system. The subscriber
+        sees every event emitted after this call (or, with `replay`,
+        every event still in the buffer), so pipes that must not miss
+        early events should subscribe before starting their task.
+        """
+        if not isinstance(self._event_queue, BroadcastBuffer):
+            raise SystemException(
+                f"System {self.name} (id={self.id}) is not a broadcast system"
+            )
+        return self._event_queue.subscribe(replay)
+
+    def listen(self) -> typing.AsyncIterator[E | SystemLagged]:
+        """
+        Iterate over the events of the system. A broadcast system is
+        subscribed to by this call, not by the first iteration, so no
+        event emitted in between is missed.
+        """
+        if isinstance(self._event_queue, BroadcastBuffer):
+            return self.subscribe()
+        return self._listen_queue()
+
+    async def _listen_queue(self) -> typing.AsyncGenerator[E | SystemLagged]:
         if self.listened:
             raise SystemException(
                 f"System {self.name} (id={self.id}) is already being listened to. "
@@ -115,20 +752,35 @@ class System[E, I = int]:
         try:
             self.listened = True
             while True:
+                _pipe_waiting()
                 event = await self._event_queue.get()
-                self._event_queue.task_done()
                 if isinstance(event, SystemStopMarker):
                     break
                 elif isinstance(event, SystemPipeException):
                     raise event from event.cause
+                elif isinstance(event, SystemLagged):
+                    yield event
                 else:
+                    _pipe_delivered(self._event_queue.last_emitted_at)
                     yield event
         finally:
             self.listened = False
 
     async def stop_and_gather_events(self) -> list[E]:
+        if isinstance(self._event_queue, BroadcastBuffer):
+            subscription = self.subscribe(replay=True)
+            await self.stop()
+            return [
+                event
+                async for event in subscription
+                if not isinstance(event, SystemLagged)
+            ]
         await self.stop()
-        return [event async for event in self.listen()]
+        return [
+            event
+            async for event in self.listen()
+            if not isinstance(event, SystemLagged)
+        ]
 
 
 @pytest.mark.asyncio
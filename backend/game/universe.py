@@ -1,23 +1,27 @@
+import asyncio
 import dataclasses
 import datetime
 import random
+import time
 import typing
 from typing import Literal
 
 import asyncpg
 
+import config
+from game.archive import archive_game, find_archivable_games
 from game.chat import ChatSystem
 from game.logger import gl_log
 from game.user import check_user_exists
 from game.utils import get_int_from_filter, get_str_from_filter
 from lstypes.chat import ChatType
-from game.game import GameSystem, GameEvent, GameStatusEvent
+from game.game import GameSystem, GameStatusEvent
 from lstypes.error import ServiceCode, ServiceError, error
 from lstypes.game import GameStatus, GameOut
 from lstypes.player import PlayerOut
 from lstypes.user import UserOut
 from lstypes.world import WorldOut, ShortWorldOut
-from game.system import System
+from game.system import System, Backpressure, registry
 
 
 @dataclasses.dataclass
@@ -25,8 +29,14 @@ class UniverseEvent: ...
 
 
 @dataclasses.dataclass()
-class UniverseGameEvent(UniverseEvent):
-    event: GameEvent
+class UniverseGameLoadedEvent(UniverseEvent):
+    """
+    A game system was loaded, possibly again after it was hibernated.
+    Its events are read from the game itself, so listeners of an older
+    system of the same game have to subscribe to the new one.
+    """
+
+    game_id: int
 
 
 @dataclasses.dataclass()
@@ -39,24 +49,199 @@ class UniverseWorldUpdateEvent(UniverseEvent):
     world: WorldOut
 
 
+def universe_event_key(event: UniverseEvent) -> typing.Hashable | None:
+    if isinstance(event, UniverseGameLoadedEvent):
+        return "loaded", event.game_id
+    return None
+
+
 class Universe(System[UniverseEvent, None]):
     def __init__(self, pg_pool: asyncpg.Pool | None = None):
-        super().__init__(None)
+        super().__init__(
+            None,
+            capacity=config.EVENT_QUEUE_CAPACITY,
+            backpressure=Backpressure.COALESCE,
+            coalesce_key=universe_event_key,
+        )
         self.pg_pool = pg_pool
         self.games = []
+        self._archiver_task: asyncio.Task | None = None
+        self._hibernator_task: asyncio.Task | None = None
+        # Games being loaded or stopped right now, and when games were last
+        # unloaded.
+        self._loading: dict[int, asyncio.Future[None]] = {}
+        self._unloading: dict[int, asyncio.Task] = {}
+        self._unloaded_at: dict[int, float] = {}
 
     async def stop(self):
+        await self.stop_archiver()
+        await self.stop_hibernator()
         for game in self.games:
             await game.stop()
+        if self._unloading:
+            await asyncio.gather(*self._unloading.values(), return_exceptions=True)
         await super().stop()
 
-    def add_game(self, game: GameSystem):
-        async def forward_game_events():
-            async for event in game.listen():
-                self.emit(UniverseGameEvent(event))
+    async def archive_finished_games(
+        self, conn: asyncpg.Connection, limit: int, log=gl_log
+    ) -> int:
+        """
+        Archive up to `limit` finished games that are not loaded. Games
+        unloaded less than GAME_ARCHIVE_COOLDOWN_SECONDS ago are skipped,
+        so one that is still being looked at is not archived and
+        rehydrated over and over.
+        """
+        now = time.monotonic()
+        self._unloaded_at = {
+            game_id: unloaded_at
+            for game_id, unloaded_at in self._unloaded_at.items()
+            if now - unloaded_at < config.GAME_ARCHIVE_COOLDOWN_SECONDS
+        }
+        exclude = [
+            *(game.id for game in registry.systems(GameSystem)),
+            *self._loading,
+            *self._unloading,
+            *self._unloaded_at,
+        ]
+        archived = 0
+        for game_id in await find_archivable_games(conn, limit, exclude=exclude):
+            if await archive_game(conn, game_id, log=log, is_loaded=self.is_loaded):
+                archived += 1
+        return archived
+
+    def is_loaded(self, game_id: int) -> bool:
+        return (
+            game_id in self._loading
+            or game_id in self._unloading
+            or GameSystem.of(game_id) is not None
+        )
+
+    def start_archiver(self):
+        if self.pg_pool is None or config.GAME_ARCHIVE_INTERVAL_SECONDS <= 0:
+            return
+        if self._archiver_task is None or self._archiver_task.done():
+            self._archiver_task = asyncio.create_task(
+                self._archive_loop(), name="game_archiver"
+            )
+
+    async def stop_archiver(self):
+        task = self._archiver_task
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._archiver_task = None
+
+    async def _archive_loop(self):
+        while True:
+            await asyncio.sleep(config.GAME_ARCHIVE_INTERVAL_SECONDS)
+            try:
+                async with self.pg_pool.acquire() as conn:
+                    await self.archive_finished_games(
+                        conn, config.GAME_ARCHIVE_BATCH_SIZE
+                    )
+            except (asyncpg.PostgresError, OSError) as e:
+                await gl_log.aerror("Failed to archive finished games: %s", e)
+
+    async def load_game_system(
+        self, conn: asyncpg.Connection, game: GameOut
+    ) -> GameSystem:
+        """
+        The loaded system of `game`, loading it (again) if needed. Concurrent
+        callers share one load, and a game that is being hibernated is only
+        loaded again once its old system has written its final state.
+        """
+        while (game_system := GameSystem.of(game.id)) is None:
+            pending = self._unloading.get(game.id) or self._loading.get(game.id)
+            if pending is not None:
+                # Whatever its outcome, look again; a failed load is retried.
+                await asyncio.wait([pending])
+                continue
+            loaded = asyncio.get_running_loop().create_future()
+            self._loading[game.id] = loaded
+            try:
+                game_system = await GameSystem.create_new(
+                    conn, game, db_pool=self.pg_pool
+                )
+            except BaseException:
+                loaded.cancel()
+                raise
+            finally:
+                del self._loading[game.id]
+            self.add_game(game_system)
+            self.emit(UniverseGameLoadedEvent(game_system.id))
+            loaded.set_result(None)
+            break
+        game_system.touch()
+        return game_system
+
+    async def hibernate_idle_games(self, idle_seconds: float, log=gl_log) -> int:
+        """
+        Stop the loaded games that are idle (see `GameSystem.is_idle`) and
+        forget them. Their state is written first; `load_game_system` brings
+        them back when they are used again.
+        """
+        hibernated = 0
+        for game in list(self.games):
+            if not game.stopped and not game.is_idle(idle_seconds):
+                continue
+            self.games.remove(game)
+            self._unloaded_at[game.id] = time.monotonic()
+            if game.stopped:
+                continue
+            # Nothing finds the game any more while it is stopping, so no
+            # request changes it behind the final flush.
+            registry.remove(game)
+            stopping = asyncio.create_task(
+                game.stop(), name=f"hibernate_game{game.id}"
+            )
+            self._unloading[game.id] = stopping
+            stopping.add_done_callback(self._stopped)
+            await asyncio.shield(stopping)
+            hibernated += 1
+        if hibernated:
+            await log.ainfo("Hibernated idle games", games=hibernated)
+        return hibernated
+
+    def _stopped(self, task: asyncio.Task):
+        for game_id, stopping in list(self._unloading.items()):
+            if stopping is task:
+                del self._unloading[game_id]
+
+    def start_hibernator(self):
+        if config.GAME_HIBERNATE_INTERVAL_SECONDS <= 0:
+            return
+        if self._hibernator_task is None or self._hibernator_task.done():
+            self._hibernator_task = asyncio.create_task(
+                self._hibernate_loop(), name="game_hibernator"
+            )
+
+    async def stop_hibernator(self):
+        task = self._hibernator_task
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._hibernator_task = None
+
+    async def _hibernate_loop(self):
+        while True:
+            await asyncio.sleep(config.GAME_HIBERNATE_INTERVAL_SECONDS)
+            try:
+                await self.hibernate_idle_games(config.GAME_IDLE_SECONDS)
+            except (asyncpg.PostgresError, OSError) as e:
+                await gl_log.aerror("Failed to hibernate idle games: %s", e)
 
+    def add_game(self, game: GameSystem):
         self.games.append(game)
-        self.add_pipe(forward_game_events())
 
     async def create_world(
         self,
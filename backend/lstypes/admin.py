@@ -0,0 +1,64 @@
+import dataclasses
+import typing
+
+
+@dataclasses.dataclass
+class LatencyOut:
+    count: int
+    total: float
+    mean: float
+    max: float
+    last: float
+
+
+@dataclasses.dataclass
+class QueueStatsOut:
+    depth: int
+    capacity: int | None
+    high_water_mark: int
+    dropped: int
+    coalesced: int
+
+
+@dataclasses.dataclass
+class SystemInfoOut:
+    kind: str
+    id: typing.Any
+    name: str
+    age_seconds: float
+    active_pipes: int
+    stopped: bool
+    queue: QueueStatsOut
+
+
+@dataclasses.dataclass
+class PipeStatsOut:
+    system: str
+    system_id: typing.Any
+    name: str
+    age_seconds: float
+    running: bool
+    processed: int
+    queue_delay: LatencyOut
+    handling: LatencyOut
+
+
+@dataclasses.dataclass
+class StateFlushStatsOut:
+    game_id: int
+    requested: int
+    coalesced: int
+    flushes: int
+    full_writes: int
+    skipped: int
+    failures: int
+    retries: int
+    latency: LatencyOut
+
+
+@dataclasses.dataclass
+class SystemsOut:
+    counts: dict[str, int]
+    systems: list[SystemInfoOut]
+    pipes: list[PipeStatsOut]
+    state_flushes: list[StateFlushStatsOut]
@@ -50,3 +50,18 @@ class ChatSegmentOut:
     next_id: int | None
     suggestions: list[str]
     interface: ChatInterface
+    version: int = 0
+
+
+@dataclasses.dataclass
+class ChatDeltaOut:
+    chat_id: int
+    version: int
+    # The changes since the requested version are not known anymore:
+    # `segment` holds the latest messages and replaces the client's copy.
+    reset: bool
+    messages: list[MessageOut]
+    deleted_ids: list[int]
+    suggestions: list[str]
+    interface: ChatInterface
+    segment: ChatSegmentOut | None = None
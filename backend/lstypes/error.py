@@ -31,6 +31,7 @@ class ServiceCode(str, Enum):
     PLAYER_NOT_READY = "PlayerNotReady"
     CHARACTER_NOT_READY = "CharacterNotReady"
     INVALID_PROVIDER = "InvalidProvider"
+    NOT_FOUND = "NotFound"
 
 
 class ServiceError(BaseModel):
@@ -65,6 +66,7 @@ def status_code_from_service_code(code: ServiceCode) -> int:
             | ServiceCode.PLAYER_NOT_FOUND
             | ServiceCode.MESSAGE_NOT_FOUND
             | ServiceCode.CHAT_NOT_FOUND
+            | ServiceCode.NOT_FOUND
         ):
             return 404
         case ServiceCode.CHARACTER_NOT_READY:
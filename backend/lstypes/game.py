@@ -39,4 +39,24 @@ class StateOut:
     game_chat: ChatSegmentOut | None = None
     player_chats: list[ChatSegmentOut] = dataclasses.field(default_factory=list)
     advice_chats: list[ChatSegmentOut] = dataclasses.field(default_factory=list)
-    llm_logs: list[dict[str, typing.Any]] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class LLMLogOut:
+    id: int
+    player_id: int | None
+    turn: int
+    scope: str
+    model: str
+    prompt: list[dict[str, typing.Any]]
+    response: str | dict[str, typing.Any] | None
+    error: str | None
+    created_at: datetime.datetime
+
+
+@dataclasses.dataclass
+class LLMLogPageOut:
+    # Newest first
+    logs: list[LLMLogOut]
+    # Pass as `before` to get older entries, None if there are no more
+    next_before: int | None
@@ -44,3 +44,19 @@ class MessageOutWithNeighbors:
     msg: MessageOut
     next_id: int | None
     prev_id: int | None
+
+
+@dataclasses.dataclass
+class MessageSearchHit:
+    message: MessageOut
+    rank: float
+    # HTML-escaped message text around the matched words, which are wrapped
+    # in <b></b>
+    headline: str
+
+
+@dataclasses.dataclass
+class MessageSearchOut:
+    hits: list[MessageSearchHit]
+    # Pass as `cursor` to get the next page, None if there are no more hits
+    next_cursor: str | None
@@ -0,0 +1,124 @@
+import pytest
+
+import config
+from game.archive import archive_game, rehydrate_game
+from game.chat import ChatSystem, loaded_chats, search_messages
+from game.game import GameSystem
+from game.llm_log import get_llm_logs, llm_log_writer
+from game.user import create_test_user
+from lstypes.game import GameStatus
+from lstypes.message import MessageKind
+
+
+async def _finished_game(db, universe):
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 1)
+    game_system = GameSystem.of(game.id)
+    await db.execute("UPDATE games SET status = 'finished' WHERE id = $1", game.id)
+    return user, game_system
+
+
+async def _hot_rows(db, game_id):
+    return await db.fetchrow(
+        """
+        SELECT
+            (SELECT count(*) FROM messages m JOIN chats c ON c.id = m.chat_id
+             WHERE c.game_id = $1) AS messages,
+            (SELECT count(*) FROM chat_suggestions s JOIN chats c ON c.id = s.chat_id
+             WHERE c.game_id = $1) AS suggestions,
+            (SELECT count(*) FROM llm_logs WHERE game_id = $1) AS llm_logs,
+            (SELECT state FROM games WHERE id = $1) AS state
+        """,
+        game_id,
+    )
+
+
+@pytest.mark.asyncio
+async def test_archive_and_rehydrate_round_trip(db, universe, monkeypatch):
+    user, game_system = await _finished_game(db, universe)
+    chat = game_system.game_chat
+    sent = await chat.send_message(
+        db, MessageKind.PLAYER, "the dragon wakes", user.id, metadata={"a": 1}
+    )
+    draft = await chat.start_draft(db, MessageKind.GENERAL_INFO, "...", None)
+    await chat.edit_message(db, draft.msg.id, "it roars")
+    await chat.finalize_draft(
+        db, draft.msg.id, llm_message={"role": "assistant", "content": "it roars"}
+    )
+    await chat.set_suggestions(["run", "hide"], conn=db)
+    monkeypatch.setattr(llm_log_writer, "_pool", object())
+    game_system._append_llm_log(
+        scope="dm", model="model", prompt=[{"role": "user"}], response=None
+    )
+    game_system._append_llm_log(
+        scope="dm", model="model", prompt=[], response={"a": 1}, error_text="boom"
+    )
+    await llm_log_writer.flush(db)
+    logs = await get_llm_logs(db, game_system.id, 10)
+    rows_query = "SELECT * FROM messages WHERE chat_id = $1 ORDER BY id"
+    before = await db.fetch(rows_query, chat.id)
+    state = await db.fetchval("SELECT state FROM games WHERE id = $1", game_system.id)
+
+    # The game is loaded, so the sweeper leaves it alone.
+    assert await universe.archive_finished_games(db, 10) == 0
+
+    assert await archive_game(db, game_system.id)
+    assert not await archive_game(db, game_system.id)
+    assert dict(await _hot_rows(db, game_system.id)) == {
+        "messages": 0,
+        "suggestions": 0,
+        "llm_logs": 0,
+        "state": {},
+    }
+
+    assert await rehydrate_game(db, game_system.id)
+    assert not await rehydrate_game(db, game_system.id)
+    assert dict(await _hot_rows(db, game_system.id)) == {
+        "messages": 2,
+        "suggestions": 2,
+        "llm_logs": 2,
+        "state": state,
+    }
+    assert await get_llm_logs(db, game_system.id, 10) == logs
+
+    chat_id = chat.id
+    await universe.stop()
+    fresh = await ChatSystem.load_by_id(db, chat_id)
+    assert await db.fetch(rows_query, chat_id) == before
+    segment = await fresh.get_messages(db, 10)
+    assert [m.text for m in segment.messages] == ["the dragon wakes", "it roars"]
+    assert segment.suggestions == ["run", "hide"]
+    assert await fresh.get_llm_messages(db, [draft.msg.id]) == {
+        draft.msg.id: {"role": "assistant", "content": "it roars"}
+    }
+    hits = await search_messages(db, game_system.id, "dragon", 10)
+    assert [hit.message.id for hit in hits.hits] == [sent.msg.id]
+    await loaded_chats.release(chat_id).stop()
+
+
+@pytest.mark.asyncio
+async def test_only_finished_games_are_archived(db, universe):
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 1)
+    assert not await archive_game(db, game.id)
+    assert not await db.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM game_archives WHERE game_id = $1)", game.id
+    )
+
+
+@pytest.mark.asyncio
+async def test_recently_loaded_games_are_not_archived(db, universe, monkeypatch):
+    _, game_system = await _finished_game(db, universe)
+    game_id = game_system.id
+    game_system.status = GameStatus.FINISHED
+    game_system.last_active -= 100
+
+    # A load that started after the game was picked is seen under the lock.
+    assert not await archive_game(db, game_id, is_loaded=lambda _: True)
+
+    assert await universe.hibernate_idle_games(50) == 1
+    assert await universe.archive_finished_games(db, 10) == 0
+    monkeypatch.setattr(config, "GAME_ARCHIVE_COOLDOWN_SECONDS", 0)
+    assert await universe.archive_finished_games(db, 10) == 1
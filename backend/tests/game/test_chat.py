@@ -0,0 +1,533 @@
+import dataclasses
+import datetime
+
+import pytest
+
+import config
+from game.chat import (
+    ArrayMessageIndex,
+    ChatMessageDeletedEvent,
+    ChatMessageEditEvent,
+    ChatSystem,
+    ChatUpdatedSuggestions,
+    LinkedMessageIndex,
+    NewMessage,
+    StoredMessage,
+    loaded_chats,
+    search_messages,
+    send_messages_bulk,
+)
+from game.game import GameChatEvent, GameSystem
+from game.user import create_test_user
+from lstypes.chat import ChatInterfaceType, ChatType
+from lstypes.message import MessageKind, MessageOut
+
+
+async def _create_game(db, universe):
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 1)
+    return GameSystem.of(game.id)
+
+
+def _chat_events(events, chat_id):
+    return [
+        event.event
+        for event in events
+        if isinstance(event, GameChatEvent) and event.chat_id == chat_id
+    ]
+
+
+@pytest.mark.asyncio
+async def test_streamed_edits_collapse_into_one_event(db, universe):
+    game_system = await _create_game(db, universe)
+    chat = game_system.game_chat
+
+    sent = await chat.send_message(db, MessageKind.PUBLIC_INFO, "...", sender_id=None)
+    text = ""
+    for token in ["Once ", "upon ", "a ", "time"] * 10:
+        text += token
+        await chat.edit_message(db, sent.msg.id, text)
+
+    events = _chat_events(await game_system.stop_and_gather_events(), chat.id)
+    edits = [e for e in events if isinstance(e, ChatMessageEditEvent)]
+    assert len(edits) == 1
+    assert edits[0].message.text == text
+
+
+@pytest.mark.asyncio
+async def test_delete_discards_pending_edit(db, universe):
+    game_system = await _create_game(db, universe)
+    chat = game_system.game_chat
+
+    sent = await chat.send_message(db, MessageKind.PUBLIC_INFO, "...", sender_id=None)
+    await chat.edit_message(db, sent.msg.id, "draft")
+    await chat.delete_message(db, sent.msg.id)
+
+    events = _chat_events(await game_system.stop_and_gather_events(), chat.id)
+    assert not [e for e in events if isinstance(e, ChatMessageEditEvent)]
+    assert [e for e in events if isinstance(e, ChatMessageDeletedEvent)]
+
+
+@pytest.mark.asyncio
+async def test_pending_edits_are_flushed_before_new_messages(db, universe):
+    game_system = await _create_game(db, universe)
+    chat = game_system.game_chat
+
+    first = await chat.send_message(db, MessageKind.PUBLIC_INFO, "...", sender_id=None)
+    await chat.edit_message(db, first.msg.id, "done")
+    second = await chat.send_message(db, MessageKind.PUBLIC_INFO, "!", sender_id=None)
+
+    events = _chat_events(await game_system.stop_and_gather_events(), chat.id)
+    assert [type(e).__name__ for e in events] == [
+        "ChatMessageSentEvent",
+        "ChatMessageEditEvent",
+        "ChatMessageSentEvent",
+    ]
+    assert events[1].message.id == first.msg.id
+    assert events[2].message.msg.id == second.msg.id
+
+
+@pytest.mark.asyncio
+async def test_old_messages_are_paged_in_on_demand(db, universe, monkeypatch):
+    game_system = await _create_game(db, universe)
+    reader = await create_test_user(db)
+    chat = await ChatSystem.create_or_load(
+        db, game_system.id, ChatType.ADVICE, owner_id=reader.id
+    )
+    ids = []
+    for i in range(10):
+        sent = await chat.send_message(db, MessageKind.PUBLIC_INFO, str(i), None)
+        ids.append(sent.msg.id)
+    chat_id = chat.id
+    await chat.stop()
+    del chat
+
+    monkeypatch.setattr(config, "CHAT_WINDOW_SIZE", 3)
+    chat = await ChatSystem.load_by_id(db, chat_id)
+    assert [m.id for m in chat.index.walk_forward(None, 10)] == ids[-3:]
+    assert chat.has_older
+
+    segment = await chat.get_messages(db, 2)
+    assert [m.id for m in segment.messages] == ids[-2:]
+    assert segment.previous_id == ids[-3]
+
+    segment = await chat.get_messages(db, 4, before_message_id=ids[-3])
+    assert [m.id for m in segment.messages] == ids[4:8]
+    assert segment.previous_id == ids[3]
+    assert segment.next_id == ids[8]
+
+    segment = await chat.get_messages(db, 2, after_message_id=ids[0])
+    assert [m.id for m in segment.messages] == ids[1:3]
+    assert segment.previous_id == ids[0]
+    assert not chat.has_older
+    assert [m.id for m in chat.index.walk_forward(None, 100)] == ids
+    await chat.stop()
+
+
+@pytest.mark.asyncio
+async def test_page_size_is_capped(db, universe, monkeypatch):
+    game_system = await _create_game(db, universe)
+    reader = await create_test_user(db)
+    chat = await ChatSystem.create_or_load(
+        db, game_system.id, ChatType.ADVICE, owner_id=reader.id
+    )
+    ids = []
+    for i in range(10):
+        sent = await chat.send_message(db, MessageKind.PUBLIC_INFO, str(i), None)
+        ids.append(sent.msg.id)
+    chat_id = chat.id
+    await chat.stop()
+    del chat
+    monkeypatch.setattr(config, "CHAT_WINDOW_SIZE", 2)
+    monkeypatch.setattr(config, "CHAT_PAGE_MAX_MESSAGES", 3)
+    fresh = await ChatSystem.load_by_id(db, chat_id)
+
+    segment = await fresh.get_messages(db, 1000)
+    assert [m.id for m in segment.messages] == ids[-3:]
+    # The page plus one message to know `previous_id`, not the whole chat.
+    assert [m.id for m in fresh.index.walk_forward(None, 100)] == ids[-4:]
+    assert fresh.has_older
+    await loaded_chats.release(chat_id).stop()
+
+
+def _message(id_: int) -> StoredMessage:
+    return StoredMessage(
+        id_,
+        None,
+        MessageKind.PUBLIC_INFO,
+        str(id_),
+        None,
+        datetime.datetime.now(),
+        None,
+    )
+
+
+@pytest.mark.parametrize("index_class", [LinkedMessageIndex, ArrayMessageIndex])
+def test_message_index_walks(index_class):
+    index = index_class()
+    index.prepend_many([_message(i) for i in range(10, 20)])
+    index.prepend_many([_message(i) for i in range(5, 10)])
+    for i in range(20, 200):
+        index.append(_message(i))
+    for i in range(6, 190, 2):
+        assert index.delete(i) is not None
+    assert index.delete(6) is None
+
+    odd = [5] + list(range(7, 190, 2)) + list(range(190, 200))
+    assert len(index) == len(odd)
+    assert [m.id for m in index.walk_forward(None, 1000)] == odd
+    assert [m.id for m in index.walk_forward(7, 3)] == [9, 11, 13]
+    assert [m.id for m in index.walk_backward(13, 3)] == [13, 11, 9]
+    assert [m.id for m in index.walk_backward(None, 2)] == [199, 198]
+    assert list(index.walk_forward(8, 3)) == []
+    assert list(index.walk_backward(8, 3)) == []
+    assert index.prev_id(9) == 7
+    assert index.prev_id(5) is None
+    assert index.next_id(189) == 190
+    assert index.next_id(199) is None
+    assert 9 in index and 8 not in index
+
+    assert index.edit(_message(9))
+    assert not index.edit(_message(8))
+
+    if isinstance(index, ArrayMessageIndex):
+        index.compact()
+        assert [m.id for m in index.walk_forward(None, 1000)] == odd
+
+
+def test_stored_message_round_trip():
+    metadata = {"llm_message": {"role": "assistant", "content": "hi"}}
+    msg = MessageOut(
+        id=1,
+        chat_id=7,
+        sender_id=100500,
+        kind=MessageKind.PLAYER,
+        text="hi",
+        special="narration",
+        sent_at=datetime.datetime.now(),
+        metadata=metadata,
+    )
+    stored = StoredMessage.from_out(msg)
+    assert isinstance(stored._metadata, str)
+    assert stored.to_out(7) == msg
+
+    other = StoredMessage.from_out(dataclasses.replace(msg, id=2))
+    assert other.special is stored.special
+    row = {**dataclasses.asdict(msg), "kind": "player", "metadata": None}
+    assert StoredMessage.from_row(row).kind is MessageKind.PLAYER
+
+
+@pytest.mark.asyncio
+async def test_chat_header_is_served_from_memory(db, universe):
+    game_system = await _create_game(db, universe)
+    chat = game_system.game_chat
+
+    await db.execute(
+        "UPDATE chats SET interface_type = 'readonly' WHERE id = $1", chat.id
+    )
+    segment = await chat.get_messages(db, 10)
+    assert segment.interface.type == ChatInterfaceType.FULL
+
+    chat.invalidate_header()
+    segment = await chat.get_messages(db, 10)
+    assert segment.interface.type == ChatInterfaceType.READONLY
+
+
+@pytest.mark.asyncio
+async def test_draft_is_written_once_when_finalized(db, universe):
+    game_system = await _create_game(db, universe)
+    chat = game_system.game_chat
+
+    async def stored_text(id_):
+        return await db.fetchval("SELECT text FROM messages WHERE id = $1", id_)
+
+    draft = await chat.start_draft(db, MessageKind.PUBLIC_INFO, "...", None)
+    for text in ["Once", "Once upon", "Once upon a time"]:
+        await chat.edit_message(db, draft.msg.id, text)
+    assert await stored_text(draft.msg.id) is None
+
+    later = await chat.send_message(db, MessageKind.PUBLIC_INFO, "later", None)
+    assert later.prev_id == draft.msg.id
+
+    segment = await chat.get_messages(db, 10)
+    assert [m.text for m in segment.messages][-2:] == ["Once upon a time", "later"]
+
+    await chat.finalize_draft(db, draft.msg.id)
+    assert await stored_text(draft.msg.id) == "Once upon a time"
+    assert await chat.finalize_draft(db, draft.msg.id) is None
+
+    discarded = await chat.start_draft(db, MessageKind.PUBLIC_INFO, "...", None)
+    await chat.edit_message(db, discarded.msg.id, "oops")
+    await chat.delete_message(db, discarded.msg.id)
+    assert discarded.msg.id not in chat.index
+    assert await chat.finalize_draft(db, discarded.msg.id) is None
+    assert await stored_text(discarded.msg.id) is None
+
+    events = _chat_events(await game_system.stop_and_gather_events(), chat.id)
+    assert [e.message.text for e in events if isinstance(e, ChatMessageEditEvent)] == [
+        "Once upon a time"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_messages_bulk_spans_chats(db, universe):
+    game_system = await _create_game(db, universe)
+    game_chat = game_system.game_chat
+    reader = await create_test_user(db)
+    advice = await ChatSystem.create_or_load(
+        db, game_system.id, ChatType.ADVICE, owner_id=reader.id
+    )
+
+    sent = await send_messages_bulk(
+        db,
+        [
+            (game_chat, NewMessage(MessageKind.SYSTEM, "one")),
+            (advice, NewMessage(MessageKind.PUBLIC_INFO, "two", metadata={"a": 1})),
+            (game_chat, NewMessage(MessageKind.SYSTEM, "three")),
+        ],
+    )
+    assert [m.msg.text for m in sent] == ["one", "two", "three"]
+    assert sent[0].msg.id < sent[1].msg.id < sent[2].msg.id
+    assert sent[2].prev_id == sent[0].msg.id
+
+    rows = await db.fetch(
+        "SELECT chat_id, text, metadata FROM messages WHERE id = ANY($1) ORDER BY id",
+        [m.msg.id for m in sent],
+    )
+    assert [(r["chat_id"], r["text"]) for r in rows] == [
+        (game_chat.id, "one"),
+        (advice.id, "two"),
+        (game_chat.id, "three"),
+    ]
+    assert rows[1]["metadata"] == {"a": 1}
+
+    segment = await advice.get_messages(db, 10)
+    assert [m.text for m in segment.messages] == ["two"]
+    await advice.stop()
+
+
+@pytest.mark.asyncio
+async def test_chats_loaded_by_id_are_evicted_and_stopped(db, universe, monkeypatch):
+    game_system = await _create_game(db, universe)
+    monkeypatch.setattr(loaded_chats, "max_chats", 2)
+
+    chat_ids = []
+    for _ in range(3):
+        reader = await create_test_user(db)
+        chat = await ChatSystem.create_or_load(
+            db, game_system.id, ChatType.ADVICE, owner_id=reader.id
+        )
+        chat_ids.append(chat.id)
+        await chat.stop()
+    del chat
+
+    first = await ChatSystem.load_by_id(db, chat_ids[0])
+    assert await ChatSystem.load_by_id(db, chat_ids[0]) is first
+    await ChatSystem.load_by_id(db, chat_ids[1])
+    await ChatSystem.load_by_id(db, chat_ids[0])
+    await ChatSystem.load_by_id(db, chat_ids[2])
+
+    assert chat_ids[0] in loaded_chats
+    assert chat_ids[1] not in loaded_chats
+    assert chat_ids[2] in loaded_chats
+    assert ChatSystem.of(chat_ids[1]) is None
+
+    # A game taking over a chat removes it from the cache.
+    owner = await db.fetchval("SELECT owner_id FROM chats WHERE id = $1", chat_ids[2])
+    adopted = await ChatSystem.create_or_load(
+        db, game_system.id, ChatType.ADVICE, owner_id=owner
+    )
+    assert adopted is ChatSystem.of(chat_ids[2])
+    assert chat_ids[2] not in loaded_chats
+
+    for chat_id in chat_ids:
+        if (chat := loaded_chats.release(chat_id)) is not None:
+            await chat.stop()
+    await adopted.stop()
+
+
+@pytest.mark.asyncio
+async def test_set_suggestions_emits_once_and_persists(db, universe):
+    game_system = await _create_game(db, universe)
+    reader = await create_test_user(db)
+    chat = await ChatSystem.create_or_load(
+        db, game_system.id, ChatType.ADVICE, owner_id=reader.id
+    )
+
+    assert await chat.set_suggestions(["look", "listen", "wait"], conn=db)
+    assert not await chat.set_suggestions(["look", "listen", "wait"], conn=db)
+    chat_id = chat.id
+    events = await chat.stop_and_gather_events()
+    assert events == [ChatUpdatedSuggestions(chat_id, ["look", "listen", "wait"])]
+    del chat
+
+    chat = await ChatSystem.load_by_id(db, chat_id)
+    assert chat.suggestions == ["look", "listen", "wait"]
+    await chat.set_suggestions([], conn=db)
+    assert not await db.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM chat_suggestions WHERE chat_id = $1)", chat_id
+    )
+    await loaded_chats.release(chat_id).stop()
+
+
+@pytest.mark.asyncio
+async def test_changes_since_version(db, universe, monkeypatch):
+    game_system = await _create_game(db, universe)
+    chat = game_system.game_chat
+
+    kept = await chat.send_message(db, MessageKind.PUBLIC_INFO, "a", None)
+    dropped = await chat.send_message(db, MessageKind.PUBLIC_INFO, "b", None)
+    segment = await chat.get_messages(db, 50)
+    since = segment.version
+
+    delta = await chat.get_changes(db, since, 50)
+    assert not delta.reset
+    assert delta.version == since
+    assert delta.messages == [] and delta.deleted_ids == []
+
+    await chat.edit_message(db, kept.msg.id, "a2")
+    await chat.delete_message(db, dropped.msg.id)
+    added = await chat.send_message(db, MessageKind.PUBLIC_INFO, "c", None)
+
+    delta = await chat.get_changes(db, since, 50)
+    assert not delta.reset
+    assert delta.version == since + 3
+    assert [(m.id, m.text) for m in delta.messages] == [
+        (kept.msg.id, "a2"),
+        (added.msg.id, "c"),
+    ]
+    assert delta.deleted_ids == [dropped.msg.id]
+
+    delta = await chat.get_changes(db, since, 1)
+    assert delta.reset
+    assert [m.id for m in delta.segment.messages] == [added.msg.id]
+
+    # Streamed edits of one message take a single entry of the log.
+    logged = len(chat._changes)
+    for text in ("x", "xy", "xyz"):
+        await chat.edit_message(db, kept.msg.id, text)
+    assert len(chat._changes) == logged
+    delta = await chat.get_changes(db, since, 50)
+    assert [(m.id, m.text) for m in delta.messages] == [
+        (kept.msg.id, "xyz"),
+        (added.msg.id, "c"),
+    ]
+
+    # Once the oldest change is evicted, older versions get a reset.
+    monkeypatch.setattr(config, "CHAT_CHANGE_LOG_SIZE", logged)
+    await chat.send_message(db, MessageKind.PUBLIC_INFO, "d", None)
+    assert (await chat.get_changes(db, since, 50)).reset
+
+    # Versions from before the chat was (re)loaded cannot be answered.
+    delta = await chat.get_changes(db, chat.base_version - 1, 50)
+    assert delta.reset
+
+
+@pytest.mark.asyncio
+async def test_search_messages_ranks_and_pages(db, universe):
+    game_system = await _create_game(db, universe)
+    user = await create_test_user(db)
+    reader = await create_test_user(db)
+    private = await ChatSystem.create_or_load(
+        db, game_system.id, ChatType.ADVICE, owner_id=user.id
+    )
+    chat = game_system.game_chat
+
+    texts = [
+        "the dragon sleeps",
+        "a dragon, another dragon and a third dragon",
+        "nothing to see here",
+        "dragon",
+    ]
+    ids = [
+        (await chat.send_message(db, MessageKind.PUBLIC_INFO, text, None)).msg.id
+        for text in texts
+    ]
+    hidden = await private.send_message(db, MessageKind.PUBLIC_INFO, "dragon", None)
+
+    result = await search_messages(db, game_system.id, "dragon", 10)
+    assert {hit.message.id for hit in result.hits} == {*ids[:2], ids[3], hidden.msg.id}
+    assert result.hits[0].message.id == ids[1]
+    assert "<b>dragon</b>" in result.hits[0].headline
+    assert result.next_cursor is None
+
+    pages = []
+    cursor = None
+    while True:
+        page = await search_messages(
+            db, game_system.id, "dragon", 1, reader_id=reader.id, cursor=cursor
+        )
+        pages.extend(hit.message.id for hit in page.hits)
+        if (cursor := page.next_cursor) is None:
+            break
+    assert pages == [
+        hit.message.id for hit in result.hits if hit.message.id != hidden.msg.id
+    ]
+
+    result = await search_messages(
+        db, game_system.id, "dragon -sleeps", 10, chat_id=chat.id
+    )
+    assert ids[0] not in {hit.message.id for hit in result.hits}
+    await private.stop()
+
+
+@pytest.mark.asyncio
+async def test_search_headline_escapes_message_text(db, universe):
+    game_system = await _create_game(db, universe)
+    chat = game_system.game_chat
+    await chat.send_message(
+        db,
+        MessageKind.PUBLIC_INFO,
+        "<img src=x onerror=alert(1)><i>dragon</i> & 'co'",
+        None,
+    )
+
+    [hit] = (await search_messages(db, game_system.id, "dragon", 10)).hits
+    assert "<img" not in hit.headline
+    assert "&lt;i&gt;<b>dragon</b>&lt;/i&gt;" in hit.headline
+    assert "&amp; &#39;co&#39;" in hit.headline
+
+
+@pytest.mark.asyncio
+async def test_llm_message_is_kept_out_of_segments(db, universe):
+    game_system = await _create_game(db, universe)
+    user = await create_test_user(db)
+    chat = game_system.game_chat
+    llm_message = {
+        "role": "assistant",
+        "content": "Ask the DM",
+        "tool_calls": [{"id": "1", "type": "function", "function": {"name": "ask_dm"}}],
+    }
+
+    await chat.send_message(db, MessageKind.PLAYER, "What now?", user.id)
+    draft = await chat.start_draft(db, MessageKind.GENERAL_INFO, "...", None)
+    await chat.edit_message(db, draft.msg.id, "Ask the DM")
+    await chat.finalize_draft(db, draft.msg.id, llm_message=llm_message)
+
+    segment = await chat.get_messages(db, 10)
+    assert [m.metadata for m in segment.messages] == [None, None]
+    assert await game_system._load_llm_history(db, chat) == [
+        {"role": "user", "content": "What now?"},
+        llm_message,
+    ]
+    await universe.stop()
+
+
+@pytest.mark.asyncio
+async def test_create_or_load_many_creates_a_repeated_chat_once(db, universe):
+    game_system = await _create_game(db, universe)
+    user = await create_test_user(db)
+    spec = (ChatType.ADVICE, user.id, ChatInterfaceType.FOREIGN)
+    first, second = await ChatSystem.create_or_load_many(
+        db, game_system.id, [spec, spec]
+    )
+    assert first is second
+    count = await db.fetchval(
+        "SELECT count(*) FROM chats WHERE game_id = $1 AND chat_type = $2"
+        " AND owner_id = $3",
+        game_system.id,
+        ChatType.ADVICE,
+        user.id,
+    )
+    assert count == 1
@@ -1,9 +1,16 @@
 import asyncio
+import contextlib
+import types
 
 import pytest
 
+import config
+
+from game.chat import ChatSystem, finalize_drafts_bulk
 from game.game import (
     GameSystem,
+    PendingAction,
+    TurnOutcome,
     GameStatusEvent,
     PlayerReadyEvent,
     PlayerJoinedEvent,
@@ -11,11 +18,13 @@ from game.game import (
     PlayerPromotedEvent,
     PlayerSpectatorEvent,
 )
-from game.logic import default_character_profile
+from game.logic import PlayerAction, default_character_profile, summarize_action
 from lstypes.game import GameStatus, GameOut
-from game.universe import UniverseGameEvent
+from game.universe import UniverseGameLoadedEvent
 from game.user import create_test_user
+from lstypes.chat import ChatType
 from lstypes.error import ServiceCode
+from lstypes.message import MessageKind
 
 
 @pytest.mark.asyncio
@@ -34,11 +43,7 @@ async def test_game_set_ready(db, universe):
         await game_system.set_ready(db, -123, False)
     ).code == ServiceCode.PLAYER_NOT_FOUND
 
-    events = [
-        event.event
-        for event in await universe.stop_and_gather_events()
-        if isinstance(event, UniverseGameEvent)
-    ]
+    events = await game_system.stop_and_gather_events()
     assert events == [
         GameStatusEvent(game_id=game.id, new_status=GameStatus.WAITING),
         PlayerReadyEvent(game_id=game.id, player_id=user.id, ready=True),
@@ -152,11 +157,7 @@ async def test_player_join_and_leave(db, universe):
     assert not game_system.player_states
     assert game_system.status == GameStatus.ARCHIVED
 
-    events = [
-        event.event
-        for event in await universe.stop_and_gather_events()
-        if isinstance(event, UniverseGameEvent)
-    ]
+    events = await game_system.stop_and_gather_events()
 
     joined_events = [e for e in events if isinstance(e, PlayerJoinedEvent)]
     assert len(joined_events) == 1
@@ -191,11 +192,7 @@ async def test_host_migration(db, universe):
     assert user1.id not in game_system.player_states
     assert game_system.host_id == user2.id
 
-    events = [
-        event.event
-        for event in await universe.stop_and_gather_events()
-        if isinstance(event, UniverseGameEvent)
-    ]
+    events = await game_system.stop_and_gather_events()
 
     promoted_events = [e for e in events if isinstance(e, PlayerPromotedEvent)]
     assert len(promoted_events) == 1
@@ -293,3 +290,540 @@ async def test_game_terminates_when_empty2(db, universe):
     assert (
         await game_system.get_player(db, user1.id)
     ).code == ServiceCode.PLAYER_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_game_start_announces_in_every_chat(db, universe):
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 1)
+
+    game_system = GameSystem.of(game.id)
+    game_system._set_character(user.id, default_character_profile(user.name))
+    await game_system._persist_state(db)
+    assert await game_system.set_ready(db, user.id, True) is None
+    assert await game_system.start_game(db, requester_id=user.id) is None
+
+    game_chat = await game_system.game_chat.get_messages(db, 10)
+    assert [m.text for m in game_chat.messages] == ["Игра началась."]
+
+    player_chat = game_system.player_states[user.id].player_chat
+    segment = await player_chat.get_messages(db, 10)
+    assert segment.messages[-1].text.startswith("Игра началась.")
+    assert segment.messages[-1].id > game_chat.messages[-1].id
+
+
+@pytest.mark.asyncio
+async def test_action_reports_run_concurrently_in_order(db, universe, monkeypatch):
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 1)
+    game_system = GameSystem.of(game.id)
+
+    monkeypatch.setattr(config, "LLM_ACTION_CONCURRENCY", 2)
+    monkeypatch.setattr(config, "LLM_ACTION_TIMEOUT_SECONDS", 0.2)
+    delays = [0.05, 0.01, 10, 0.03, 0.02]
+    running = 0
+    peak = 0
+
+    async def fake_report(action, summary, *, world_state, turn):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            await asyncio.sleep(delays[action.player_id])
+        finally:
+            running -= 1
+        return None if action.player_id == 3 else f"report {action.player_id}"
+
+    monkeypatch.setattr(game_system, "_local_llm_action_report", fake_report)
+    profile = default_character_profile("hero")
+    actions = [
+        PlayerAction(player_id=i, player_name=f"p{i}", text="act", character=profile)
+        for i in range(len(delays))
+    ]
+    summaries = [summarize_action(action, game_system.state) for action in actions]
+
+    started = asyncio.get_running_loop().time()
+    reports = await game_system._action_reports(
+        actions, summaries, world_state={}, turn=1
+    )
+    assert asyncio.get_running_loop().time() - started < 0.5
+    assert peak == 2
+    assert reports == [
+        "report 0",
+        "report 1",
+        summaries[2].dm_summary(),
+        summaries[3].dm_summary(),
+        "report 4",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_narratives_stream_concurrently(db, universe, monkeypatch):
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 1)
+    game_system = GameSystem.of(game.id)
+
+    monkeypatch.setattr(config, "LLM_NARRATIVE_CONCURRENCY", 2)
+    started = []
+
+    async def fake_stream(*, model, messages, temperature):
+        player = messages[-1]["content"].split("\n")[0]
+        started.append(player)
+
+        async def chunks():
+            for word in ["It ", "happens ", player]:
+                await asyncio.sleep(0.02)
+                yield types.SimpleNamespace(
+                    choices=[
+                        types.SimpleNamespace(delta=types.SimpleNamespace(content=word))
+                    ]
+                )
+
+        return chunks()
+
+    monkeypatch.setattr("game.game.create_chat_completion_stream", fake_stream)
+    profile = default_character_profile("hero")
+    jobs = []
+    for _ in range(3):
+        player = await create_test_user(db)
+        chat = await ChatSystem.create_or_load(
+            db, game.id, ChatType.GAME, owner_id=player.id
+        )
+        action = PlayerAction(player.id, player.name, "act", profile)
+        jobs.append((chat, action, "consequence", {}))
+
+    async def cancel_last():
+        while jobs[2][1].player_id not in game_system.narrative_tasks:
+            await asyncio.sleep(0)
+        while len(started) < 2:
+            await asyncio.sleep(0.001)
+        # The third stream waits for a free slot.
+        assert len(started) == 2
+        game_system.cancel_narrative(jobs[2][1].player_id)
+
+    drafts = []
+    narratives, _ = await asyncio.gather(
+        game_system._stream_narratives(db, jobs, turn=1, drafts=drafts),
+        cancel_last(),
+    )
+    assert {chat for chat, _ in drafts} == {jobs[0][0], jobs[1][0]}
+
+    queries = []
+    db.add_query_logger(queries.append)
+    await finalize_drafts_bulk(db, drafts)
+    await asyncio.sleep(0)
+    db.remove_query_logger(queries.append)
+    # Both finished narratives are written with a single INSERT.
+    assert sum("INSERT INTO messages" in q.query for q in queries) == 1
+    first, second, third = (action.player_id for _, action, _, _ in jobs)
+    assert narratives[first].startswith("It happens")
+    assert narratives[second].startswith("It happens")
+    assert narratives[third] is None
+    assert game_system.narrative_tasks == {}
+
+    for chat, action, _, _ in jobs:
+        segment = await chat.get_messages(db, 10)
+        texts = [m.text for m in segment.messages]
+        assert texts == (
+            [] if action.player_id == third else [narratives[action.player_id]]
+        )
+        rows = await db.fetch("SELECT text FROM messages WHERE chat_id = $1", chat.id)
+        assert [row["text"] for row in rows] == texts
+        await chat.stop()
+
+
+async def _started_game(db, universe):
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 2)
+    game_system = GameSystem.of(game.id)
+    game_system._set_character(user.id, default_character_profile(user.name))
+    await game_system._persist_state(db)
+    assert await game_system.set_ready(db, user.id, True) is None
+    assert await game_system.start_game(db, requester_id=user.id) is None
+    return user, game_system
+
+
+@pytest.mark.asyncio
+async def test_turn_resolution_does_not_hold_the_lock(db, universe, monkeypatch):
+    user, game_system = await _started_game(db, universe)
+    thinking = asyncio.Event()
+    answer = asyncio.Event()
+
+    async def slow_llm(conn, actions, summaries, *, world, turn, drafts):
+        world["scene"] = "A new scene"
+        draft = await game_system.game_chat.start_draft(
+            conn, MessageKind.PUBLIC_INFO, "done", None
+        )
+        drafts.append((game_system.game_chat, draft.msg.id))
+        thinking.set()
+        await answer.wait()
+        return TurnOutcome(
+            turn=turn,
+            world=world,
+            summary="done",
+            narratives={user.id: "I did it"},
+        )
+
+    monkeypatch.setattr(game_system, "_llm_enabled", lambda: True)
+    monkeypatch.setattr(game_system, "_resolve_actions_with_llm", slow_llm)
+
+    resolving = asyncio.create_task(
+        game_system._resolve_actions(db, [PendingAction(user.id, "look")])
+    )
+    await thinking.wait()
+    assert not game_system.lock.locked()
+    assert game_system.turns_in_flight == 1
+    assert await game_system.update_settings(db, name="renamed") is None
+    assert game_system.state["world"]["scene"] != "A new scene"
+
+    answer.set()
+    await resolving
+    assert game_system.turns_in_flight == 0
+    assert game_system.state["turn"] == 1
+    assert game_system.state["world"]["scene"] == "A new scene"
+    assert game_system.state["timeline"][-1] == {"turn": 1, "summary": "done"}
+    assert game_system.state["players"][str(user.id)]["memory"][-1] == "I did it"
+    assert not game_system.game_chat.drafts
+    assert (
+        await db.fetchval(
+            "SELECT text FROM messages WHERE chat_id = $1 ORDER BY id DESC LIMIT 1",
+            game_system.game_chat.id,
+        )
+        == "done"
+    )
+
+
+@pytest.mark.asyncio
+async def test_stale_turn_resolution_is_discarded(db, universe, monkeypatch):
+    user, game_system = await _started_game(db, universe)
+
+    chat = game_system.game_chat
+
+    async def racing_llm(conn, actions, summaries, *, world, turn, drafts):
+        draft = await chat.start_draft(conn, MessageKind.PUBLIC_INFO, "late", None)
+        drafts.append((chat, draft.msg.id))
+        # Another turn gets committed while this one is being resolved.
+        game_system.state["turn"] = turn
+        return TurnOutcome(turn=turn, world=world, summary="late", narratives={})
+
+    monkeypatch.setattr(game_system, "_llm_enabled", lambda: True)
+    monkeypatch.setattr(game_system, "_resolve_actions_with_llm", racing_llm)
+
+    await game_system._resolve_actions(db, [PendingAction(user.id, "look")])
+    assert all(item["summary"] != "late" for item in game_system.state["timeline"])
+    # Nothing the discarded turn streamed is left in the chat.
+    assert not chat.drafts
+    segment = await chat.get_messages(db, 50)
+    assert "late" not in [m.text for m in segment.messages]
+
+
+@pytest.mark.asyncio
+async def test_failed_or_cancelled_turn_resolution_drops_its_drafts(
+    db, universe, monkeypatch
+):
+    user, game_system = await _started_game(db, universe)
+    chat = game_system.game_chat
+    streaming = asyncio.Event()
+
+    async def broken_llm(conn, actions, summaries, *, world, turn, drafts):
+        draft = await chat.start_draft(conn, MessageKind.PUBLIC_INFO, "...", None)
+        drafts.append((chat, draft.msg.id))
+        streaming.set()
+        if turn == 1:
+            raise RuntimeError("model went away")
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(game_system, "_llm_enabled", lambda: True)
+    monkeypatch.setattr(game_system, "_resolve_actions_with_llm", broken_llm)
+
+    with pytest.raises(RuntimeError):
+        await game_system._resolve_actions(db, [PendingAction(user.id, "look")])
+    assert not chat.drafts
+
+    game_system.state["turn"] = 1
+    streaming.clear()
+    resolving = asyncio.create_task(
+        game_system._resolve_actions(db, [PendingAction(user.id, "look")])
+    )
+    await streaming.wait()
+    assert chat.drafts
+    resolving.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await resolving
+    assert not chat.drafts
+    assert game_system.turns_in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_turn_resolution_without_llm(db, universe, monkeypatch):
+    user, game_system = await _started_game(db, universe)
+    monkeypatch.setattr(game_system, "_llm_enabled", lambda: False)
+
+    await game_system._resolve_actions(db, [PendingAction(user.id, "look")])
+    assert game_system.state["turn"] == 1
+    assert game_system.state["timeline"][-1]["turn"] == 1
+    [memory] = game_system.state["players"][str(user.id)]["memory"]
+    assert memory.startswith("Вы пытаетесь: look.")
+    stored = await db.fetchval("SELECT state FROM games WHERE id = $1", game_system.id)
+    assert stored["turn"] == 1
+
+
+@pytest.mark.asyncio
+async def test_persist_state_patches_changed_subtrees(db, universe):
+    user, game_system = await _started_game(db, universe)
+    await game_system._persist_state(db)
+    query = "SELECT state FROM games WHERE id = $1"
+    assert await db.fetchval(query, game_system.id) == game_system.state
+
+    # Keys the game did not touch are left as they are in the database.
+    await db.execute(
+        "UPDATE games SET state = state || '{\"marker\": 1}'::jsonb WHERE id = $1",
+        game_system.id,
+    )
+    for turn in (1, 2):
+        game_system._commit_turn(
+            TurnOutcome(
+                turn=turn,
+                world={"scene": f"scene {turn}"},
+                summary=f"turn {turn}",
+                narratives={user.id: f"memory {turn}"},
+            )
+        )
+        await game_system._persist_state(db)
+    await game_system._persist_state(db)
+
+    stored = await db.fetchval(query, game_system.id)
+    assert stored.pop("marker") == 1
+    assert stored == game_system.state
+    assert [item["summary"] for item in stored["timeline"]] == ["turn 1", "turn 2"]
+
+    # Without the parent of a changed path the whole state is written.
+    await db.execute(
+        "UPDATE games SET state = '{}'::jsonb WHERE id = $1", game_system.id
+    )
+    game_system._remember_for_player(user.id, "memory 3")
+    await game_system._persist_state(db)
+    assert await db.fetchval(query, game_system.id) == game_system.state
+
+
+@pytest.mark.asyncio
+async def test_scheduled_state_writes_are_coalesced(db, universe, monkeypatch):
+    user, game_system = await _started_game(db, universe)
+    await game_system._persist_state(db)
+
+    @contextlib.asynccontextmanager
+    async def acquire():
+        yield db
+
+    monkeypatch.setattr(config, "GAME_STATE_FLUSH_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(game_system, "db_pool", types.SimpleNamespace(acquire=acquire))
+    stats = game_system.state_flushes
+    flushes = stats.flushes
+
+    async def stored_memory():
+        state = await db.fetchval(
+            "SELECT state FROM games WHERE id = $1", game_system.id
+        )
+        return state["players"][str(user.id)]["memory"]
+
+    for text in ("one", "two", "three"):
+        game_system._remember_for_player(user.id, text)
+        game_system._schedule_persist()
+    assert (stats.requested, stats.coalesced) == (3, 2)
+    assert await stored_memory() == []
+    await game_system._flush_task
+    assert await stored_memory() == ["one", "two", "three"]
+    assert stats.flushes == flushes + 1
+
+    # A durability point writes right away and makes the scheduled write moot.
+    game_system._remember_for_player(user.id, "four")
+    game_system._schedule_persist()
+    await game_system._persist_state(db)
+    assert game_system._flush_task is None
+    assert (await stored_memory())[-1] == "four"
+
+    # So does stopping the game.
+    game_system._remember_for_player(user.id, "five")
+    game_system._schedule_persist()
+    await game_system._flush_pending_state()
+    assert (await stored_memory())[-1] == "five"
+    assert stats.flushes == flushes + 3
+    assert stats.latency.count == stats.flushes
+
+    # Suggestions are stored with the same coalesced writes.
+    chat = game_system.game_chat
+
+    async def stored_suggestions():
+        return await db.fetch(
+            "SELECT suggestion FROM chat_suggestions WHERE chat_id = $1 ORDER BY id",
+            chat.id,
+        )
+
+    await game_system._set_suggestions(chat, ["a"])
+    await game_system._set_suggestions(chat, ["b", "c"])
+    assert chat.suggestions == ["b", "c"]
+    assert await stored_suggestions() == []
+    await game_system._flush_task
+    assert [row["suggestion"] for row in await stored_suggestions()] == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_failed_scheduled_state_writes_are_retried(db, universe, monkeypatch):
+    user, game_system = await _started_game(db, universe)
+    await game_system._persist_state(db)
+    outages = 2
+
+    @contextlib.asynccontextmanager
+    async def acquire():
+        nonlocal outages
+        if outages:
+            outages -= 1
+            raise OSError("database is down")
+        yield db
+
+    monkeypatch.setattr(config, "GAME_STATE_FLUSH_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(game_system, "db_pool", types.SimpleNamespace(acquire=acquire))
+    stats = game_system.state_flushes
+    flushes = stats.flushes
+
+    game_system._remember_for_player(user.id, "kept")
+    game_system._schedule_persist()
+    while stats.flushes == flushes:
+        await game_system._flush_task
+    assert (stats.failures, stats.retries) == (2, 2)
+    assert game_system._flush_task is None
+    state = await db.fetchval("SELECT state FROM games WHERE id = $1", game_system.id)
+    assert state["players"][str(user.id)]["memory"] == ["kept"]
+
+
+@pytest.mark.asyncio
+async def test_idle_games_are_hibernated_and_loaded_again(db, universe, monkeypatch):
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 1)
+    game_system = GameSystem.of(game.id)
+
+    @contextlib.asynccontextmanager
+    async def acquire():
+        yield db
+
+    monkeypatch.setattr(game_system, "db_pool", types.SimpleNamespace(acquire=acquire))
+    game_system._set_character(user.id, default_character_profile(user.name))
+    game_system.last_active -= 100
+
+    # The host is still in the lobby.
+    assert await universe.hibernate_idle_games(50) == 0
+    await db.execute("UPDATE games SET status = 'finished' WHERE id = $1", game.id)
+    game_system.status = GameStatus.FINISHED
+    assert await universe.hibernate_idle_games(500) == 0
+
+    assert await universe.hibernate_idle_games(50) == 1
+    assert game_system.stopped
+    assert GameSystem.of(game.id) is None
+    assert game_system not in universe.games
+    state = await db.fetchval("SELECT state FROM games WHERE id = $1", game.id)
+    assert state == game_system.state
+
+    game_out = await universe.get_game(db, game.id, requester_id=user.id)
+    loaded = await universe.load_game_system(db, game_out)
+    assert loaded is not game_system
+    assert GameSystem.of(game.id) is loaded
+    assert universe.games == [loaded]
+    assert loaded.state == game_system.state
+    assert await universe.load_game_system(db, game_out) is loaded
+    assert not loaded.is_idle(50)
+
+    events = await universe.stop_and_gather_events()
+    assert [e for e in events if isinstance(e, UniverseGameLoadedEvent)] == [
+        UniverseGameLoadedEvent(game.id)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_wait_for_hibernation_and_share_one_load(
+    db, universe, monkeypatch
+):
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 1)
+    game_system = GameSystem.of(game.id)
+    game_out = await universe.get_game(db, game.id, requester_id=user.id)
+
+    @contextlib.asynccontextmanager
+    async def acquire():
+        yield db
+
+    monkeypatch.setattr(game_system, "db_pool", types.SimpleNamespace(acquire=acquire))
+    flushing = asyncio.Event()
+    flush = game_system._flush_pending_state
+
+    async def slow_flush():
+        flushing.set()
+        await asyncio.sleep(0.05)
+        await flush()
+
+    monkeypatch.setattr(game_system, "_flush_pending_state", slow_flush)
+    game_system.status = GameStatus.FINISHED
+    game_system.last_active -= 100
+
+    hibernating = asyncio.create_task(universe.hibernate_idle_games(50))
+    await flushing.wait()
+    # The stopping system is no longer handed out.
+    assert GameSystem.of(game.id) is None
+    assert universe.is_loaded(game.id)
+
+    first, second = await asyncio.gather(
+        universe.load_game_system(db, game_out),
+        universe.load_game_system(db, game_out),
+    )
+    assert await hibernating == 1
+    assert game_system.stopped
+    assert first is second is GameSystem.of(game.id)
+    assert first is not game_system
+    assert universe.games == [first]
+
+
+@pytest.mark.asyncio
+async def test_cold_load_costs_constant_queries(db, universe):
+    host = await create_test_user(db, "host")
+    world = await universe.create_world(db, "world", host.id, True)
+    game = await universe.create_game(db, host.id, world.id, "room", True, 4)
+    game_system = GameSystem.of(game.id)
+    for name in ("p1", "p2", "p3"):
+        player = await create_test_user(db, name)
+        await game_system.connect_player(db, player.id)
+    player_chat = game_system.player_states[player.id].player_chat
+    await player_chat.send_message(db, MessageKind.PUBLIC_INFO, "hello", None)
+    room_chat_id = game_system.game_chat.id
+    chat_ids = {
+        chat.id
+        for player in game_system.player_states.values()
+        for chat in (player.character_chat, player.player_chat, player.advice_chat)
+    }
+
+    await game_system.stop()
+    universe.games.remove(game_system)
+    del game_system, player_chat
+
+    queries = []
+    db.add_query_logger(queries.append)
+    game_out = await universe.get_game(db, game.id, requester_id=host.id)
+    queries.clear()
+    loaded = await universe.load_game_system(db, game_out)
+    await asyncio.sleep(0)
+    db.remove_query_logger(queries.append)
+
+    # Chats, their recent messages and the game state.
+    assert len(queries) == 3
+    assert loaded.game_chat.id == room_chat_id
+    assert {
+        chat.id
+        for player in loaded.player_states.values()
+        for chat in (player.character_chat, player.player_chat, player.advice_chat)
+    } == chat_ids
+    segment = await loaded.player_states[player.id].player_chat.get_messages(db, 10)
+    assert [m.text for m in segment.messages] == ["hello"]
@@ -0,0 +1,60 @@
+import pytest
+
+from game.game import GameSystem
+from game.llm_log import get_llm_logs, llm_log_writer
+from game.logic import LLMLogEntry
+from game.user import create_test_user
+
+
+@pytest.mark.asyncio
+async def test_llm_logs_are_batched_out_of_the_state(db, universe, monkeypatch):
+    # Accept entries without a background task; the test flushes them itself.
+    monkeypatch.setattr(llm_log_writer, "_pool", object())
+    user = await create_test_user(db)
+    world = await universe.create_world(db, "world", user.id, True)
+    game = await universe.create_game(db, user.id, world.id, "room", True, 1)
+    game_system = GameSystem.of(game.id)
+
+    prompt = [{"role": "user", "content": "hello"}]
+    for i in range(3):
+        game_system._append_llm_log(
+            scope="dm", model="model", prompt=prompt, response=f"answer {i}"
+        )
+    prompt.append({"role": "assistant", "content": "answer 2"})
+    game_system._append_llm_log(
+        scope="player_action",
+        model="model",
+        prompt=prompt,
+        response=None,
+        player_id=user.id,
+        error_text="boom",
+    )
+    await game_system._persist_state(db)
+    state = await db.fetchval("SELECT state FROM games WHERE id = $1", game.id)
+    assert "llm_logs" not in state
+    assert (await get_llm_logs(db, game.id, 10)).logs == []
+
+    assert await llm_log_writer.flush(db) >= 4
+    assert not llm_log_writer.pending
+
+    first = await get_llm_logs(db, game.id, 3)
+    assert [log.response for log in first.logs] == [None, "answer 2", "answer 1"]
+    assert first.logs[0].error == "boom"
+    assert first.logs[0].player_id == user.id
+    assert len(first.logs[0].prompt) == 2
+    assert len(first.logs[1].prompt) == 1
+
+    second = await get_llm_logs(db, game.id, 3, before=first.next_before)
+    assert [log.response for log in second.logs] == ["answer 0"]
+    assert second.next_before is None
+
+
+@pytest.mark.asyncio
+async def test_llm_logs_are_dropped_while_the_writer_is_stopped():
+    entry = LLMLogEntry(
+        scope="dm", model="model", prompt=[], response=None, player_id=None, turn=0
+    )
+    dropped = llm_log_writer.dropped
+    llm_log_writer.append(1, entry)
+    assert not llm_log_writer.pending
+    assert llm_log_writer.dropped == dropped + 1
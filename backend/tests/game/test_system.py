@@ -0,0 +1,227 @@
+import asyncio
+import weakref
+
+import pytest
+
+import config
+from game.chat import ChatSystem
+from game.system import (
+    Backpressure,
+    PipeHandle,
+    System,
+    SystemException,
+    SystemLagged,
+    SystemQueueFull,
+    SystemStopMarker,
+    registry,
+)
+
+
+class NumberSystem(System[int]):
+    _next_id = 0
+
+    def __init__(self, **kwargs):
+        NumberSystem._next_id += 1
+        super().__init__(NumberSystem._next_id, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_queue_bounded():
+    system = NumberSystem(capacity=3, backpressure=Backpressure.DROP_OLDEST)
+    for i in range(10):
+        system.emit(i)
+
+    stats = system.queue_stats()
+    assert stats.depth == 3
+    assert stats.high_water_mark == 3
+    assert stats.dropped == 7
+    assert await system.stop_and_gather_events() == [7, 8, 9]
+
+
+@pytest.mark.asyncio
+async def test_dropped_events_are_signalled_to_listener():
+    system = NumberSystem(capacity=2, backpressure=Backpressure.BLOCK)
+    for i in range(5):
+        system.emit(i)
+    system._event_queue.put_control(SystemStopMarker())
+    # The stop marker is never dropped to make room for events.
+    system.emit(5)
+
+    assert system.queue_stats().dropped == 4
+    assert [x async for x in system.listen()] == [SystemLagged(missed=4), 4]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_replaces_pending_event_with_same_key():
+    system = NumberSystem(
+        capacity=10,
+        backpressure=Backpressure.COALESCE,
+        coalesce_key=lambda x: x % 2 if x >= 100 else None,
+    )
+    system.emit(1)
+    system.emit(100)
+    system.emit(2)
+    system.emit(102)
+    system.emit(104)
+    system.emit(101)
+
+    assert system.queue_stats().coalesced == 2
+    assert await system.stop_and_gather_events() == [1, 104, 2, 101]
+
+
+@pytest.mark.asyncio
+async def test_fail_raises_when_full():
+    system = NumberSystem(capacity=2, backpressure=Backpressure.FAIL)
+    system.emit(1)
+    system.emit(2)
+    with pytest.raises(SystemQueueFull):
+        system.emit(3)
+    assert await system.stop_and_gather_events() == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_flush_coalesced_keeps_going_when_queue_is_full():
+    system = NumberSystem(capacity=1, backpressure=Backpressure.FAIL)
+    for key in range(3):
+        system.emit_coalesced(key, key=key, tick=60)
+    system.flush_coalesced()
+
+    assert system.queue_stats().dropped == 2
+    assert await system.stop_and_gather_events() == [0]
+
+
+@pytest.mark.asyncio
+async def test_block_waits_for_consumer():
+    system = NumberSystem(capacity=1, backpressure=Backpressure.BLOCK)
+    await system.emit_wait(1)
+
+    blocked = asyncio.create_task(system.emit_wait(2))
+    await asyncio.sleep(0)
+    assert not blocked.done()
+
+    listener = system.listen()
+    assert await anext(listener) == 1
+    await blocked
+    assert await anext(listener) == 2
+    await listener.aclose()
+
+    assert system.queue_stats().high_water_mark == 1
+    await system.stop()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_delivers_to_every_subscriber():
+    system = NumberSystem(broadcast=8)
+    first = system.subscribe()
+    second = system.subscribe()
+    for i in range(3):
+        system.emit(i)
+    await system.stop()
+
+    assert [x async for x in first] == [0, 1, 2]
+    assert [x async for x in second] == [0, 1, 2]
+    assert [x async for x in system.listen()] == []
+
+
+@pytest.mark.asyncio
+async def test_broadcast_signals_lagging_subscriber():
+    system = NumberSystem(broadcast=4)
+    slow = system.subscribe()
+    for i in range(10):
+        system.emit(i)
+    assert system.queue_stats().depth == 4
+    await system.stop()
+
+    events = [x async for x in slow]
+    assert events == [SystemLagged(missed=7), 7, 8, 9]
+    assert slow.lagged == 7
+
+
+@pytest.mark.asyncio
+async def test_registry_drops_unreferenced_systems():
+    system = NumberSystem()
+    id_ = system.id
+    assert NumberSystem.of(id_) is system
+    assert registry.counts()["NumberSystem"] >= 1
+
+    del system
+    assert NumberSystem.of(id_) is None
+
+
+@pytest.mark.asyncio
+async def test_registry_snapshot_and_limit(monkeypatch):
+    monkeypatch.setattr(NumberSystem, "registry_limit", 1)
+    system = NumberSystem(capacity=4)
+    system.emit(1)
+    with pytest.raises(SystemException):
+        NumberSystem()
+
+    [info] = registry.snapshot(NumberSystem)
+    assert info.id == system.id
+    assert info.queue.depth == 1
+    assert info.active_pipes == 0
+    assert not info.stopped
+
+    await system.stop()
+    assert registry.snapshot(NumberSystem) == []
+
+
+@pytest.mark.asyncio
+async def test_registry_limit_follows_config(monkeypatch):
+    monkeypatch.setattr(config, "MAX_LOADED_CHATS", 0)
+    assert ChatSystem.registry_limit() == 0
+    with pytest.raises(SystemException):
+        ChatSystem(-1)
+
+
+def test_pipes_and_key_methods_do_not_keep_system_alive():
+    class KeyedSystem(NumberSystem):
+        def __init__(self):
+            super().__init__(
+                capacity=4,
+                backpressure=Backpressure.COALESCE,
+                coalesce_key=self.key,
+            )
+
+        def key(self, event: int) -> int:
+            return event
+
+    system = KeyedSystem()
+    system.emit(1)
+    system.emit(1)
+    assert system.queue_stats().coalesced == 1
+    system.pipes.append(PipeHandle(system, "pipe"))
+    ref = weakref.ref(system)
+
+    del system
+    assert ref() is None
+
+
+@pytest.mark.asyncio
+async def test_pipe_supervisor_tracks_processed_events():
+    source = NumberSystem(broadcast=8)
+    sink = NumberSystem()
+
+    async def forward():
+        async for x in source.listen():
+            await asyncio.sleep(0.01)
+            sink.emit(x)
+
+    handle = sink.add_pipe(forward())
+    await asyncio.sleep(0)
+    [stats] = sink.pipe_stats()
+    assert stats.name == "forward"
+    assert stats.running
+
+    for i in range(3):
+        source.emit(i)
+    await source.stop()
+    assert await sink.stop_and_gather_events() == [0, 1, 2]
+
+    assert not handle.running
+    assert handle.processed == 3
+    assert handle.queue_delay.count == 3
+    assert handle.handling.count == 3
+    assert handle.handling.mean >= 0.01
+    await asyncio.sleep(0)
+    assert sink.pipe_stats() == []
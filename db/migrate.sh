@@ -7,6 +7,7 @@ until pg_isready -U "$POSTGRES_USER" -d "$POSTGRES_DB" >/dev/null 2>&1; do
   sleep 1
 done
 
+# Files are named NNN-description.sql, so the glob applies them in order.
 for f in /migrations/*.sql; do
   echo "Applying migration: $(basename "$f")"
   psql -v ON_ERROR_STOP=1 -U "$POSTGRES_USER" -d "$POSTGRES_DB" -f "$f"
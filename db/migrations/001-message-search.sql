@@ -0,0 +1,7 @@
+-- Game language is whatever the world is written in, so no stemming.
+ALTER TABLE messages
+    ADD COLUMN search tsvector GENERATED ALWAYS AS (to_tsvector('simple', text)) STORED;
+
+CREATE INDEX idx_messages_search ON messages USING GIN (search);
+
+UPDATE meta SET version = 1;
@@ -0,0 +1,16 @@
+-- LLM transcript entries (assistant messages with tool calls and the like)
+-- are only read to rebuild a model's context, so keep them off the
+-- messages table every chat load reads from.
+CREATE TABLE llm_messages (
+    message_id INTEGER PRIMARY KEY REFERENCES messages(id) ON DELETE CASCADE,
+    payload JSONB NOT NULL
+);
+
+INSERT INTO llm_messages (message_id, payload)
+SELECT id, metadata->'llm_message' FROM messages WHERE metadata ? 'llm_message';
+
+UPDATE messages
+SET metadata = NULLIF(metadata - 'llm_message', '{}'::jsonb)
+WHERE metadata ? 'llm_message';
+
+UPDATE meta SET version = 2;
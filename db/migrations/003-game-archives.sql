@@ -0,0 +1,10 @@
+-- Finished games are moved out of the hot tables: their messages (with
+-- LLM transcript entries and suggestions) and state are kept here as one
+-- zlib-compressed JSON document per game until the game is read again.
+CREATE TABLE game_archives (
+    game_id INTEGER PRIMARY KEY REFERENCES games(id) ON DELETE CASCADE,
+    data BYTEA NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL
+);
+
+UPDATE meta SET version = 3;
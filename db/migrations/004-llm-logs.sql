@@ -0,0 +1,39 @@
+-- Prompts and responses of every model call, kept for the host to inspect.
+-- They used to live in games.state and were rewritten with it on every
+-- turn; here they are only ever appended.
+CREATE TABLE llm_logs (
+    id BIGSERIAL PRIMARY KEY,
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    player_id INTEGER,
+    turn INTEGER NOT NULL,
+    scope TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt JSONB NOT NULL,
+    response JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX idx_llm_logs_game ON llm_logs (game_id, id);
+
+INSERT INTO llm_logs (
+    game_id, player_id, turn, scope, model, prompt, response, error, created_at
+)
+SELECT g.id, l.player_id, COALESCE(l.turn, 0), l.scope, l.model,
+       COALESCE(l.prompt, '[]'::jsonb), l.response, l.error,
+       COALESCE(l.created_at, now())
+FROM games g
+CROSS JOIN LATERAL ROWS FROM (
+    jsonb_to_recordset(g.state->'llm_logs') AS (
+        player_id INTEGER, turn INTEGER, scope TEXT, model TEXT,
+        prompt JSONB, response JSONB, error TEXT, created_at TIMESTAMPTZ
+    )
+) WITH ORDINALITY AS l(
+    player_id, turn, scope, model, prompt, response, error, created_at, n
+)
+WHERE jsonb_typeof(g.state->'llm_logs') = 'array'
+ORDER BY g.id, l.n;
+
+UPDATE games SET state = state - 'llm_logs' WHERE state ? 'llm_logs';
+
+UPDATE meta SET version = 4;
@@ -97,6 +97,42 @@ type Message = {
     metadata: any,
 }
 
+type MessageSearchHit = {
+    message: Message,
+    rank: number,
+    // Текст сообщения вокруг найденных слов, сами слова обернуты в <b></b>.
+    // Текст экранирован, так что его можно вставлять как HTML.
+    headline: string,
+}
+
+type MessageSearch = {
+    hits: MessageSearchHit[],
+    // null, если результатов больше нет
+    nextCursor: string | null,
+}
+
+type LLMLog = {
+    id: number,
+    // null, если вызов не относится к конкретному игроку (например, ход мастера)
+    playerId: number | null,
+    turn: number,
+    // Для чего вызывалась модель: "dm", "player_action", "player_narrative",
+    // "advice" или "character_creation"
+    scope: string,
+    model: string,
+    prompt: object[],
+    response: string | object | null,
+    error: string | null,
+    createdAt: string,
+}
+
+type LLMLogPage = {
+    // Сначала самые новые
+    logs: LLMLog[],
+    // null, если записей больше нет
+    nextBefore: number | null,
+}
+
 type ChatInterface = {
     // Тип взаимодействия с пользователем
     // readonly - пользователь только читает сообщения (но поле ввода доступно - их можно будет отправлять позже)
@@ -122,6 +158,22 @@ type ChatSegment = {
     // Список предложений для сообщения в этом чате
     suggestions: string[],
     interface: ChatInterface,
+    // Версия чата, растет при любом изменении сообщений, предложений или интерфейса
+    version: number,
+}
+
+// Изменения чата после версии, переданной в `since`
+type ChatDelta = {
+    chatId: number,
+    version: number,
+    // Изменения с запрошенной версии неизвестны, нужно заменить чат на `segment`
+    reset: boolean,
+    // Новые и отредактированные сообщения в их текущем виде
+    messages: Message[],
+    deletedIds: number[],
+    suggestions: string[],
+    interface: ChatInterface,
+    segment: ChatSegment | null,
 }
 
 type GameStateWaiting = GameStateBase & {